@@ -0,0 +1,108 @@
+"""
+Measure the import time of each Lambda handler module, as paid on a cold start.
+
+Each handler is imported in a fresh interpreter with `-X importtime`, several times,
+and the median is reported along with the slowest of its imports and whether boto3
+was loaded. The handlers only import boto3 on the routes which use it (see
+multiplayer_helpers/db.py), so it should not appear for the multiplayer server.
+
+    python backend/benchmarks/cold_start.py
+"""
+
+import os
+import re
+import sys
+import subprocess
+from statistics import median
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), "..", "src")
+
+HANDLERS = (
+    "multiplayer_server",
+    "singleplayer_server",
+    "update_airports",
+    "warm_feed_cache",
+    "sweep_lobbies",
+)
+
+RUNS = 5
+
+# Lines look like "import time:       391 |      31197 | multiplayer_server", with
+# the self and cumulative times in microseconds and the module indented by depth
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+ENVIRONMENT = {
+    "AWS_DEFAULT_REGION": "eu-west-2",
+    "MULTIPLAYER_ENDPOINT": "wss://multiplayer.example.com/test",
+}
+
+
+def import_module(module: str) -> tuple[list[tuple], bool]:
+    """
+    Import `module` in a new interpreter. Returns the (depth, module, cumulative_us)
+    of each import, and whether boto3 was imported.
+    """
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import sys, {module}; print('boto3' in sys.modules)",
+        ],
+        cwd=SRC_DIR,
+        env={**os.environ, **ENVIRONMENT},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            _, cumulative_us, indent, name = match.groups()
+            imports.append((len(indent) // 2, name, int(cumulative_us)))
+
+    return imports, result.stdout.strip() == "True"
+
+
+def measure(module: str, runs: int = RUNS) -> dict:
+    """The median import time of `module` in ms, and its slowest direct imports"""
+    totals = []
+    for _ in range(runs):
+        imports, uses_boto3 = import_module(module)
+        total_us = next(us for _, name, us in imports if name == module)
+        totals.append(total_us)
+
+    # Imports are listed after the modules they import, so the module's own imports
+    # are those one level below it since the previous top level import
+    end = next(i for i, (_, name, _) in enumerate(imports) if name == module)
+    start = end
+    while start > 0 and imports[start - 1][0] > 0:
+        start -= 1
+    direct = sorted(
+        ((us, name) for depth, name, us in imports[start:end] if depth == 1),
+        reverse=True,
+    )
+    return {
+        "total_ms": median(totals) / 1000,
+        "boto3": uses_boto3,
+        "slowest": [(name, us / 1000) for us, name in direct[:3]],
+    }
+
+
+def main():
+    print(f"Median of {RUNS} imports, each in a new interpreter\n")
+    print("handler               import (ms)  boto3  slowest imports (ms)")
+    for module in HANDLERS:
+        result = measure(module)
+        slowest = ", ".join(f"{name} {ms:.1f}" for name, ms in result["slowest"])
+        print(
+            f"{module:20}  {result['total_ms']:11.1f}  "
+            f"{'yes' if result['boto3'] else 'no':>5}  {slowest}"
+        )
+
+
+if __name__ == "__main__":
+    main()
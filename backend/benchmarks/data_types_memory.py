@@ -0,0 +1,162 @@
+"""
+Measure the memory used by the classes in helpers.data_types, against equivalent
+dataclasses without slots, using tracemalloc on a 5000-row zone feed.
+
+Flights are built from the feed with make_guess.read_feed_row, as the candidate
+lookups in find_closest_flight do, once with each set of classes. The airports are
+served from a local index rather than downloaded.
+
+    python backend/benchmarks/data_types_memory.py
+"""
+
+import os
+import sys
+import copy
+import random
+import timeit
+import tracemalloc
+from dataclasses import fields, make_dataclass
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from helpers import make_guess  # noqa: E402
+from helpers.data_types import AirportInfo, Flight, Position  # noqa: E402
+
+FEED_ROWS = 5000
+AIRPORT_CODES = ("LHR", "CDG", "AMS", "FRA", "MAD", "DUB")
+
+
+def without_slots(cls):
+    """An equivalent dataclass with a __dict__ per instance, as the classes used to be"""
+    return make_dataclass(
+        cls.__name__, [(field.name, field.type) for field in fields(cls)]
+    )
+
+
+def make_feed(count: int = FEED_ROWS, seed: int = 1) -> dict:
+    """A zone feed in FR24's row format, with every flight on a known route"""
+    rng = random.Random(seed)
+    feed = {"full_count": count, "version": 4}
+    for i in range(count):
+        origin, destination = rng.sample(AIRPORT_CODES, 2)
+        feed[f"{i:08x}"] = [
+            f"{rng.getrandbits(24):06X}",
+            rng.uniform(45, 55),
+            rng.uniform(-5, 10),
+            rng.randrange(360),
+            rng.randrange(0, 40000, 25),
+            rng.randrange(100, 500),
+            f"{rng.randrange(10000):04d}",
+            "F-EGLL1",
+            "B738",
+            f"G-{rng.getrandbits(16):04X}",
+            1_760_000_000,
+            origin,
+            destination,
+            f"BA{i}",
+            0,
+            0,
+            f"BAW{i}",
+            0,
+            "BAW",
+        ]
+    return feed
+
+
+def make_airport_index(airport_info_cls, position_cls) -> dict:
+    return {
+        iata: airport_info_cls(
+            name=f"{iata} Airport",
+            city=None,
+            iata=iata,
+            icao=f"E{iata}",
+            position=position_cls(lat=50.0 + i, lon=float(i)),
+        )
+        for i, iata in enumerate(AIRPORT_CODES)
+    }
+
+
+def read_feed(feed: dict, flight_cls, position_cls, airport_index: dict) -> list:
+    with mock.patch.object(make_guess, "Flight", flight_cls), mock.patch.object(
+        make_guess, "Position", position_cls
+    ), mock.patch.object(make_guess, "get_airport", airport_index.get):
+        return [
+            make_guess.read_feed_row(key, row)
+            for key, row in feed.items()
+            if isinstance(row, list)
+        ]
+
+
+def traced(function) -> tuple[object, int, int]:
+    """Call `function`, returning its result and the bytes retained and at peak"""
+    tracemalloc.start()
+    try:
+        result = function()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current, peak
+
+
+def measure(feed: dict, flight_cls, position_cls, airport_info_cls) -> dict:
+    airport_index = make_airport_index(airport_info_cls, position_cls)
+    rows = [row for row in feed.values() if isinstance(row, list)]
+
+    flights, flights_retained, flights_peak = traced(
+        lambda: read_feed(feed, flight_cls, position_cls, airport_index)
+    )
+    _, positions_retained, _ = traced(
+        lambda: [position_cls(lat=row[1], lon=row[2]) for row in rows]
+    )
+    return {
+        "flights": flights,
+        "flights_retained": flights_retained,
+        "flights_peak": flights_peak,
+        "positions_retained": positions_retained,
+    }
+
+
+def time_per_call(function, number: int) -> float:
+    """The fastest of five runs, in microseconds per call"""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    feed = make_feed()
+    before = measure(
+        feed, without_slots(Flight), without_slots(Position), without_slots(AirportInfo)
+    )
+    after = measure(feed, Flight, Position, AirportInfo)
+
+    print(f"Allocations for a {FEED_ROWS}-row feed (KiB)\n")
+    print("case                      without slots  slotted")
+    for label, key in (
+        ("flights, retained", "flights_retained"),
+        ("flights, peak", "flights_peak"),
+        ("positions, retained", "positions_retained"),
+    ):
+        print(f"{label:24}  {before[key] / 1024:13.0f}  {after[key] / 1024:7.0f}")
+
+    # get_flight copies the cached flight for each caller. It used a deep copy when
+    # every class was mutable, and now a shallow one as only Flight is.
+    before_copy = time_per_call(lambda: copy.deepcopy(before["flights"][0]), 10_000)
+    after_copy = time_per_call(lambda: copy.copy(after["flights"][0]), 10_000)
+    print("\ncase                      before (us)  after (us)")
+    print(f"{'copy a cached flight':24}  {before_copy:11.2f}  {after_copy:10.2f}")
+
+    # Callers holding bare coordinates no longer need to build Positions to score them
+    with_positions = time_per_call(
+        lambda: make_guess.calculate_points(
+            Position(lat=51.47, lon=-0.45), Position(lat=48.86, lon=2.35)
+        ),
+        100_000,
+    )
+    with_coords = time_per_call(
+        lambda: make_guess.calculate_points_coords(51.47, -0.45, 48.86, 2.35), 100_000
+    )
+    print(f"{'score coordinates':24}  {with_positions:11.2f}  {with_coords:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Measure how far the feed rows served from the cache are from where the aircraft
+really are, with and without dead-reckoning (see make_guess.project_flights), and how
+often the nearest flight picked from them is the one which is really nearest.
+
+Aircraft are simulated with known true positions, some of them turning. A feed
+snapshot is recorded from them, with each row reporting a position which is a few
+seconds old, as FR24's rows do. The snapshot is then used at increasing cache ages,
+and players at random positions pick their nearest flight from it.
+
+    python backend/benchmarks/feed_extrapolation.py
+"""
+
+import os
+import sys
+import random
+from statistics import mean, quantiles
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from helpers.data_types import Position  # noqa: E402
+from helpers.fr24_api import FEED_CACHE, FEED_MAX_EXTRAPOLATION_S  # noqa: E402
+from helpers.make_guess import (  # noqa: E402
+    find_nearest_flights,
+    haversine,
+    move_position,
+    project_flights,
+    project_row,
+)
+
+FETCHED_AT = 1_760_000_000
+MAX_REPORT_LAG_S = 10
+CACHE_AGES_S = (0, 5, 10, 15, 20, 30, 45, 60)
+
+
+def simulate_tracks(count: int, duration_s: int, seed: int = 1) -> list[list[tuple]]:
+    """
+    Simulate aircraft at one second intervals from MAX_REPORT_LAG_S seconds before the
+    snapshot is fetched. Each position is a (lat, lon, track, speed_kt) tuple. A fifth
+    of the aircraft are turning at up to the standard rate of 3 degrees per second.
+    """
+    rng = random.Random(seed)
+    tracks = []
+    for _ in range(count):
+        lat = rng.uniform(45, 55)
+        lon = rng.uniform(-5, 10)
+        track = rng.uniform(0, 360)
+        speed_kt = rng.uniform(250, 500)
+        turn_rate = rng.uniform(-3, 3) if rng.random() < 0.2 else 0.0
+
+        states = []
+        for _ in range(MAX_REPORT_LAG_S + duration_s + 1):
+            states.append((lat, lon, track, speed_kt))
+            lat, lon = move_position(lat, lon, track, speed_kt * 1.852 / 3600)
+            track = (track + turn_rate) % 360
+        tracks.append(states)
+
+    return tracks
+
+
+def record_feed(tracks: list[list[tuple]], seed: int = 1) -> list[list]:
+    """Record a feed row for each aircraft, as last reported before the fetch"""
+    rng = random.Random(seed)
+    rows = []
+    for states in tracks:
+        lag_s = rng.randint(0, MAX_REPORT_LAG_S)
+        lat, lon, track, speed_kt = states[MAX_REPORT_LAG_S - lag_s]
+        rows.append(
+            ["", lat, lon, track, 35000, speed_kt, "", "", "", "", FETCHED_AT - lag_s]
+        )
+    return rows
+
+
+def simulate_players(count: int, seed: int = 2) -> list[Position]:
+    """Players spread over the same area as the aircraft"""
+    rng = random.Random(seed)
+    return [
+        Position(lat=rng.uniform(45, 55), lon=rng.uniform(-5, 10)) for _ in range(count)
+    ]
+
+
+def measure_picks(
+    tracks: list[list[tuple]],
+    rows: list[list],
+    players: list[Position],
+    cache_age_s: int,
+) -> dict:
+    """
+    Compare the nearest flight picked from the rows, with and without projection, with
+    the one which is really nearest once the snapshot is `cache_age_s` old. Players
+    with no flight in range are not counted.
+    """
+    now = FETCHED_AT + cache_age_s
+    truth_feed = {}
+    for i, states in enumerate(tracks):
+        lat, lon, _, _ = states[MAX_REPORT_LAG_S + cache_age_s]
+        truth_feed[str(i)] = ["", lat, lon]
+    raw_feed = {str(i): row for i, row in enumerate(rows)}
+    projected_feed = project_flights(raw_feed, now)
+
+    def pick(position: Position, feed: dict):
+        nearest = find_nearest_flights(position, feed, k=1)
+        return nearest[0][1] if nearest else None
+
+    counted = raw_correct = projected_correct = 0
+    for position in players:
+        truth = pick(position, truth_feed)
+        if truth is None:
+            continue
+
+        counted += 1
+        raw_correct += pick(position, raw_feed) == truth
+        projected_correct += pick(position, projected_feed) == truth
+
+    return {
+        "raw_pick": raw_correct / counted,
+        "projected_pick": projected_correct / counted,
+    }
+
+
+def measure(tracks: list[list[tuple]], rows: list[list], cache_age_s: int) -> dict:
+    """
+    Compare the rows with the true positions once the snapshot is `cache_age_s` old.
+    Distances are in km. Projected rows which are too old to use are counted as dropped.
+    """
+    now = FETCHED_AT + cache_age_s
+    raw_errors = []
+    projected_errors = []
+    dropped = 0
+
+    for states, row in zip(tracks, rows):
+        lat, lon, _, _ = states[MAX_REPORT_LAG_S + cache_age_s]
+        truth = Position(lat=lat, lon=lon)
+        raw_errors.append(haversine(truth, Position(lat=row[1], lon=row[2])))
+
+        projected = project_row(row, now)
+        if projected is None:
+            dropped += 1
+        else:
+            projected_errors.append(
+                haversine(truth, Position(lat=projected[1], lon=projected[2]))
+            )
+
+    return {
+        "raw_mean": mean(raw_errors),
+        "raw_p95": quantiles(raw_errors, n=20)[-1],
+        "projected_mean": mean(projected_errors) if projected_errors else None,
+        "projected_p95": (
+            quantiles(projected_errors, n=20)[-1] if projected_errors else None
+        ),
+        "dropped": dropped / len(rows),
+    }
+
+
+def main():
+    tracks = simulate_tracks(count=2000, duration_s=max(CACHE_AGES_S))
+    rows = record_feed(tracks)
+    players = simulate_players(count=500)
+
+    print(
+        f"Feed cache TTL {FEED_CACHE.ttl_s:.0f} s, "
+        f"extrapolation bound {FEED_MAX_EXTRAPOLATION_S:.0f} s\n"
+    )
+    print(
+        "age (s)  raw mean/p95 (km)  projected mean/p95 (km)  dropped"
+        "  correct pick raw/projected"
+    )
+    for cache_age_s in CACHE_AGES_S:
+        result = measure(tracks, rows, cache_age_s)
+        picks = measure_picks(tracks, rows, players, cache_age_s)
+        projected = (
+            "-"
+            if result["projected_mean"] is None
+            else f"{result['projected_mean']:6.2f} / {result['projected_p95']:5.2f}"
+        )
+        print(
+            f"{cache_age_s:7d}  {result['raw_mean']:6.2f} / {result['raw_p95']:5.2f}"
+            f"     {projected:>15}          {result['dropped']:6.1%}"
+            f"       {picks['raw_pick']:6.1%} / {picks['projected_pick']:6.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Compare encoding responses with helpers.serialization against the previous
+`json.dumps(asdict(...))` path, for a guess result, the guessing player's
+flight_details event and a lobby_update sent to every player in a lobby.
+
+    python backend/benchmarks/serialization.py
+"""
+
+import os
+import sys
+import json
+import timeit
+from dataclasses import asdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from helpers.data_types import (  # noqa: E402
+    AirportInfo,
+    Flight,
+    GuessResult,
+    Points,
+    Position,
+)
+from helpers.serialization import shallow_asdict, to_json, to_json_bytes  # noqa: E402
+
+LOBBY_SIZES = (2, 4, 8)
+REPEATS = 5
+
+
+def make_guess_result() -> GuessResult:
+    return GuessResult(
+        points=Points(origin=1800, destination=2000, total=3800),
+        flight=Flight(
+            id="3a9f2c41",
+            flight_number="BA117",
+            callsign="BAW117",
+            airline="British Airways",
+            aircraft_type="Boeing 777-336(ER)",
+            aircraft_registration="G-STBA",
+            image_src="https://cdn.jetphotos.com/400/6/12345_1700000000.jpg",
+            origin=AirportInfo(
+                name="London Heathrow Airport",
+                city="London",
+                iata="LHR",
+                icao="EGLL",
+                position=Position(lat=51.4706, lon=-0.461941),
+            ),
+            destination=AirportInfo(
+                name="New York John F. Kennedy International Airport",
+                city="New York",
+                iata="JFK",
+                icao="KJFK",
+                position=Position(lat=40.639751, lon=-73.778925),
+            ),
+            position=Position(lat=51.52, lon=-1.12),
+        ),
+    )
+
+
+def make_lobby_update(lobby_size: int) -> dict:
+    return {
+        "event": "lobby_update",
+        "players": [
+            {
+                "player_name": f"player-{i}",
+                "score": 1000 * i,
+                "guess_count": i,
+                "connection_id": f"connection-{i}",
+            }
+            for i in range(lobby_size)
+        ],
+    }
+
+
+def time_per_call(function, number: int) -> float:
+    """The fastest of REPEATS runs, in microseconds per call"""
+    return min(timeit.repeat(function, number=number, repeat=REPEATS)) / number * 1e6
+
+
+def main():
+    guess_result = make_guess_result()
+
+    assert to_json(guess_result) == json.dumps(asdict(guess_result))
+
+    print("case                       before (us)  serialization (us)  speed-up")
+
+    before = time_per_call(lambda: json.dumps(asdict(guess_result)), 20_000)
+    after = time_per_call(lambda: to_json(guess_result), 20_000)
+    print(f"{'guess result':25}  {before:11.1f}  {after:18.1f}  {before / after:7.1f}x")
+
+    after_dropped = time_per_call(
+        lambda: to_json(guess_result, drop_nulls=True), 20_000
+    )
+    print(f"{'guess result, drop nulls':25}  {'-':>11}  {after_dropped:18.1f}")
+
+    # The guessing player's result, merged into the event's fields
+    status = {"event": "flight_details", "status": "Success", "score": 3800}
+    before = time_per_call(
+        lambda: json.dumps({**status, **asdict(guess_result)}).encode("utf-8"), 20_000
+    )
+    after = time_per_call(
+        lambda: to_json_bytes({**status, **shallow_asdict(guess_result)}), 20_000
+    )
+    print(
+        f"{'flight_details event':25}  {before:11.1f}  {after:18.1f}  {before / after:7.1f}x"
+    )
+
+    # Lobby updates used to be encoded again for every recipient, where broadcast() now
+    # encodes them once and sends the same bytes to each player
+    for lobby_size in LOBBY_SIZES:
+        event = make_lobby_update(lobby_size)
+
+        def encode_per_recipient():
+            for _ in range(lobby_size):
+                json.dumps(event).encode("utf-8")
+
+        before = time_per_call(encode_per_recipient, 5_000)
+        after = time_per_call(lambda: to_json_bytes(event), 5_000)
+        case = f"lobby_update, {lobby_size} players"
+        print(f"{case:25}  {before:11.1f}  {after:18.1f}  {before / after:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
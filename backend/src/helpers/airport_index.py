@@ -0,0 +1,85 @@
+import os
+import time
+from threading import Lock
+from typing import Optional
+from helpers.data_types import AirportInfo, Position
+from helpers.http_client import ConnectionPool
+
+# The airport data published by update_airports.py
+AIRPORTS_ENDPOINT = os.getenv("AIRPORTS_ENDPOINT")
+
+# The airport data is served by CloudFront rather than FR24, so it is requested on its
+# own connections, outside of FR24's rate limit and circuit breaker
+AIRPORTS_POOL = ConnectionPool({})
+
+# The published data is refreshed daily, so there is no need to reload it more often
+AIRPORT_INDEX_TTL_S = 24 * 60 * 60
+
+# How long to wait before trying again when the data could not be loaded. Until then,
+# lookups fail straight away rather than each waiting for another download.
+AIRPORT_INDEX_RETRY_S = 60
+
+_airport_index = None
+_airport_index_expiry = 0.0
+_airport_index_error = None
+_airport_index_lock = Lock()
+
+
+def get_airport(iata: Optional[str]) -> Optional[AirportInfo]:
+    """Look up an airport by its IATA code, or return None if it is not known"""
+    if not iata:
+        return None
+
+    index = get_airport_index()
+    return index.get(iata)
+
+
+def get_airport_index() -> dict:
+    if _airport_index_expiry <= time.monotonic():
+        # The candidate flights in make_guess are resolved concurrently, and should
+        # share a single download
+        with _airport_index_lock:
+            if _airport_index_expiry <= time.monotonic():
+                reload_airport_index()
+
+    if _airport_index is None:
+        raise ValueError(f"The airport data is unavailable: {_airport_index_error}")
+
+    return _airport_index
+
+
+def reload_airport_index():
+    global _airport_index, _airport_index_expiry, _airport_index_error
+
+    try:
+        airports = fetch_airports()
+    except Exception as exc:
+        # Airports rarely change, so any previous copy is still usable
+        print(f"[WARNING] Could not load the airport data: {exc}")
+        _airport_index_error = exc
+        _airport_index_expiry = time.monotonic() + AIRPORT_INDEX_RETRY_S
+        return
+
+    _airport_index = build_airport_index(airports)
+    _airport_index_expiry = time.monotonic() + AIRPORT_INDEX_TTL_S
+
+
+def fetch_airports() -> list:
+    return AIRPORTS_POOL.get_json(AIRPORTS_ENDPOINT)
+
+
+def build_airport_index(airports: list) -> dict:
+    return {
+        airport["iata"]: AirportInfo(
+            name=airport["name"],
+            city=airport.get("city"),
+            iata=airport["iata"],
+            icao=airport["icao"],
+            position=Position(
+                lat=airport["position"]["lat"],
+                lon=airport["position"]["lon"],
+            ),
+        )
+        for airport in airports
+        if airport.get("iata")
+    }
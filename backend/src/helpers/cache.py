@@ -0,0 +1,48 @@
+import time
+from threading import Lock
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    A bounded in-process cache. Entries expire after `ttl_s` seconds, and the least
+    recently used entry is evicted once `max_size` is exceeded.
+    """
+
+    def __init__(self, max_size: int, ttl_s: float):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._items[key]
+                return None
+
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_s: Optional[float] = None):
+        """Store a value, optionally for less than the cache's default `ttl_s`"""
+        ttl_s = self.ttl_s if ttl_s is None else min(ttl_s, self.ttl_s)
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl_s, value)
+            self._items.move_to_end(key)
+
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
@@ -1,20 +1,24 @@
 from typing import Optional
 from dataclasses import dataclass
 
+# Many of these are created for each request, so they are slotted to avoid a __dict__
+# per instance. All but Flight are frozen, so that they can be shared without copying,
+# for example between the cached flights and the airport index.
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class Position:
     lat: float
     lon: float
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class AirportGuess:
     position: Position
     enabled: bool
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class AirportInfo:
     name: str
     city: Optional[str]
@@ -23,7 +27,7 @@ class AirportInfo:
     position: Position
 
 
-@dataclass
+@dataclass(slots=True)
 class Flight:
     id: str
     flight_number: str
@@ -37,20 +41,22 @@ class Flight:
     position: Position
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Points:
     origin: int
     destination: int
     total: int
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class GuessResult:
     points: Points
     flight: Flight
+    # Whether the flight was found in recorded data, because FR24 was unavailable
+    approximate: bool = False
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class GameRules:
     use_origin: bool
     use_destination: bool
@@ -1,24 +1,65 @@
-import json
-from urllib.request import Request, urlopen
+import os
+import math
+import time
 from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+from helpers import snapshots
+from helpers.cache import TTLCache
+from helpers.http_client import ConnectionPool
+from helpers.resilience import (
+    CircuitBreaker,
+    LatencyTracker,
+    TokenBucket,
+    call_hedged,
+    is_upstream_failure,
+)
+from helpers.utils import HandledException
+from helpers.shared_cache import get_shared_cache
+from helpers.single_flight import SingleFlight
 
 HEADERS = {
     "cache-control": "max-age=0",
     "user-agent": "Mozilla/5.0 (Windows NT 6.1)",
 }
 
+HTTP_POOL = ConnectionPool(
+    HEADERS,
+    connect_timeout_s=float(os.getenv("FR24_CONNECT_TIMEOUT", "3")),
+    read_timeout_s=float(os.getenv("FR24_READ_TIMEOUT", "5")),
+)
 
-def get_all_flights(position, serach_area_deg=0.2):
-    bounds = ",".join(
-        [
-            str(position.lat + serach_area_deg),
-            str(position.lat - serach_area_deg),
-            str(position.lon + serach_area_deg),
-            str(position.lon - serach_area_deg),
-        ]
-    )
+# Every request to FR24 from this container shares one rate limit. Requests wait for
+# up to FR24_RATE_LIMIT_WAIT_S before they are refused.
+FR24_RATE_LIMIT = TokenBucket(
+    rate=float(os.getenv("FR24_RATE_LIMIT", "10")),
+    burst=int(os.getenv("FR24_RATE_BURST", "20")),
+)
+FR24_RATE_LIMIT_WAIT_S = float(os.getenv("FR24_RATE_LIMIT_WAIT", "2"))
+
+# Requests fail fast while FR24 is failing, rather than each waiting for a timeout
+FR24_BREAKER = CircuitBreaker(
+    failure_threshold=int(os.getenv("FR24_BREAKER_THRESHOLD", "5")),
+    reset_timeout_s=float(os.getenv("FR24_BREAKER_RESET", "30")),
+)
+
+# If set, a second request is sent when the first takes longer than this percentile of
+# recent request durations, and whichever finishes first is used
+FR24_HEDGE_PERCENTILE = os.getenv("FR24_HEDGE_PERCENTILE")
+FR24_LATENCY = LatencyTracker()
+HEDGE_EXECUTOR = ThreadPoolExecutor(max_workers=8)
 
-    params = {
+# The tiles covering an area are fetched concurrently, so that a search usually costs a
+# single round trip. get_tiles returns up to four tiles for an area, unless the area is
+# wider than the largest tiles, whose extra tiles then wait for a free worker.
+TILE_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
+# Feed rows are dead-reckoned forward to the current time before they are used, but
+# never from further back than this
+FEED_MAX_EXTRAPOLATION_S = float(os.getenv("FEED_MAX_EXTRAPOLATION", "60"))
+
+FEED_PROFILES = {
+    # Everything the feed can provide, including ground traffic and statistics
+    "full": {
         "faa": 1,
         "satellite": 1,
         "mlat": 1,
@@ -32,17 +73,315 @@ def get_all_flights(position, serach_area_deg=0.2):
         "gliders": 1,
         "stats": 1,
         "limit": 5000,
-        "bounds": bounds,
-    }
+    },
+    # Only recently seen airborne aircraft, which are what the game can score
+    "slim": {
+        "faa": 1,
+        "satellite": 1,
+        "mlat": 1,
+        "flarm": 1,
+        "adsb": 1,
+        "gnd": 0,
+        "air": 1,
+        "vehicles": 0,
+        "estimated": 0,
+        "maxage": int(FEED_MAX_EXTRAPOLATION_S),
+        "gliders": 0,
+        "stats": 0,
+        "limit": 5000,
+    },
+}
+FEED_PARAMS = FEED_PROFILES[os.getenv("FEED_PROFILE", "slim")]
+
+# The feed is requested for fixed grid tiles rather than for a box centred on the
+# player, so that nearby guesses can share cached responses. Tiles at level n are
+# 2^n times the size of the base tile, so that wide searches need only a few requests.
+FEED_TILE_SIZE_DEG = 0.5
+FEED_MAX_TILE_LEVEL = 4
+
+# Rows too old to project are dropped rather than used (see make_guess.project_flights),
+# so tiles are only cached for half of FEED_MAX_EXTRAPOLATION_S. Over that time,
+# projected rows stay closer to the true positions, and pick the nearest flight more
+# often, than unprojected rows cached for 10 s did. This is measured by
+# benchmarks/feed_extrapolation.py.
+FEED_CACHE = TTLCache(
+    max_size=int(os.getenv("FEED_CACHE_MAX_TILES", "256")),
+    ttl_s=float(os.getenv("FEED_CACHE_TTL", str(FEED_MAX_EXTRAPOLATION_S / 2))),
+)
+
+# How long feed tiles and flight details are served from the shared cache before they
+# are refreshed, and for how long beyond that they may still be served while they are.
+# Stale tiles are not kept for longer than the local cache would keep them.
+SHARED_TILE_FRESH_S = float(os.getenv("SHARED_TILE_FRESH", "15"))
+SHARED_TILE_STALE_S = float(os.getenv("SHARED_TILE_STALE", str(FEED_CACHE.ttl_s)))
+SHARED_FLIGHT_FRESH_S = float(os.getenv("SHARED_FLIGHT_FRESH", "600"))
+SHARED_FLIGHT_STALE_S = float(os.getenv("SHARED_FLIGHT_STALE", "1800"))
+
+TILE_KEY_PREFIX = "tile:"
+FLIGHT_KEY_PREFIX = "flight:"
+
+# Concurrent lookups of the same tile or flight, for example from the threads in
+# make_guess.find_closest_flight, share one upstream request. They are keyed in the
+# same way as the shared cache.
+IN_FLIGHT = SingleFlight()
+
+
+def get_all_flights(position, lat_span_deg=0.2, lon_span_deg=0.2, from_snapshots=False):
+    """
+    Get the feed rows of every flight around a position. `from_snapshots` reads them
+    from recorded data instead of FR24, for when it is unavailable.
+    """
+    get_tile = get_snapshot_tile_flights if from_snapshots else get_tile_flights
+    max_lat, min_lat, max_lon, min_lon = get_bounds(
+        position, lat_span_deg, lon_span_deg
+    )
+
+    tiles = get_tiles(max_lat, min_lat, max_lon, min_lon)
+    if len(tiles) == 1:
+        tile_results = [get_tile(tiles[0])]
+    else:
+        tile_results = TILE_EXECUTOR.map(get_tile, tiles)
+
+    all_flights = {}
+    if min_lon >= -180 and max_lon <= 180:
+        for tile_flights in tile_results:
+            for key, data in tile_flights.items():
+                if min_lat <= data[1] <= max_lat and min_lon <= data[2] <= max_lon:
+                    all_flights[key] = data
+    else:
+        # The box crosses the antimeridian, so longitudes are compared modulo 360
+        centre_lon = (max_lon + min_lon) / 2
+        lon_span_deg = (max_lon - min_lon) / 2
+        for tile_flights in tile_results:
+            for key, data in tile_flights.items():
+                if (
+                    min_lat <= data[1] <= max_lat
+                    and abs((data[2] - centre_lon + 180) % 360 - 180) <= lon_span_deg
+                ):
+                    all_flights[key] = data
 
-    url = f"https://data-cloud.flightradar24.com/zones/fcgi/feed.js?{urlencode(params)}"
-    all_flights = make_request(url)
     return all_flights
 
 
+def is_area_cached(position, lat_span_deg=0.2, lon_span_deg=0.2) -> bool:
+    """Whether every feed tile around a position can be read from the local cache"""
+    tiles = get_tiles(*get_bounds(position, lat_span_deg, lon_span_deg))
+    return all(get_cached_tile_flights(tile) is not None for tile in tiles)
+
+
+def get_bounds(position, lat_span_deg, lon_span_deg):
+    return (
+        position.lat + lat_span_deg,
+        position.lat - lat_span_deg,
+        position.lon + lon_span_deg,
+        position.lon - lon_span_deg,
+    )
+
+
+def get_tile_size(level):
+    return FEED_TILE_SIZE_DEG * 2**level
+
+
+def get_tiles(max_lat, min_lat, max_lon, min_lon):
+    """
+    List the (level, lat, lon) indices of the feed tiles covering the given bounds,
+    using the smallest tiles for which at most two are needed along each axis.
+    """
+    box_size = max(max_lat - min_lat, max_lon - min_lon)
+    level = 0
+    while get_tile_size(level) < box_size and level < FEED_MAX_TILE_LEVEL:
+        level += 1
+
+    tile_size = get_tile_size(level)
+    lat_range = range(
+        math.floor(min_lat / tile_size),
+        math.floor(max_lat / tile_size) + 1,
+    )
+    lon_range = range(
+        math.floor(min_lon / tile_size),
+        math.floor(max_lon / tile_size) + 1,
+    )
+    # Tiles past the antimeridian are the same as those on the other side of it
+    tiles = (wrap_tile((level, lat, lon)) for lat in lat_range for lon in lon_range)
+    return list(dict.fromkeys(tiles))
+
+
+def wrap_tile(tile):
+    """Get the index of a tile which starts in the longitudes [-180, 180)"""
+    level, lat_idx, lon_idx = tile
+    tile_size = get_tile_size(level)
+    lon = (lon_idx * tile_size + 180) % 360 - 180
+    return level, lat_idx, round(lon / tile_size)
+
+
+def get_child_tiles(tile):
+    level, lat_idx, lon_idx = tile
+    return [
+        wrap_tile((level - 1, 2 * lat_idx + d_lat, 2 * lon_idx + d_lon))
+        for d_lat in (0, 1)
+        for d_lon in (0, 1)
+    ]
+
+
+def get_cached_tile_flights(tile):
+    """
+    Read a tile from the cache, or assemble it from cached smaller tiles.
+    Returns None if any part of the tile is missing.
+    """
+    tile_flights = FEED_CACHE.get(tile)
+    if tile_flights is not None or tile[0] == 0:
+        return tile_flights
+
+    tile_flights = {}
+    for child in get_child_tiles(tile):
+        child_flights = get_cached_tile_flights(child)
+        if child_flights is None:
+            return None
+        tile_flights.update(child_flights)
+
+    return tile_flights
+
+
+def get_tile_key(tile) -> str:
+    return TILE_KEY_PREFIX + ":".join(str(i) for i in tile)
+
+
+def parse_tile_key(key: str):
+    return tuple(int(i) for i in key.removeprefix(TILE_KEY_PREFIX).split(":"))
+
+
+def get_tile_flights(tile):
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        shared_cache.record_request(get_tile_key(tile))
+
+    tile_flights = get_cached_tile_flights(tile)
+    if tile_flights is not None:
+        return tile_flights
+
+    return IN_FLIGHT.do(get_tile_key(tile), lambda: load_tile_flights(tile))
+
+
+def load_tile_flights(tile):
+    """Load a tile from the shared cache or the upstream API into the local cache"""
+    shared_cache = get_shared_cache()
+    age_s = 0.0
+    if shared_cache is None:
+        tile_flights = fetch_tile_flights(tile)
+    else:
+        tile_flights, age_s = shared_cache.get_or_fetch(
+            get_tile_key(tile),
+            lambda: fetch_tile_flights(tile),
+            SHARED_TILE_FRESH_S,
+            SHARED_TILE_STALE_S,
+        )
+
+    # Shared tiles may already be part way through their lifetime
+    ttl_s = FEED_CACHE.ttl_s - age_s
+    FEED_CACHE.set(tile, tile_flights, ttl_s)
+
+    # A complete response also holds everything for the next level down. If the
+    # row limit was reached then the smaller tiles may be missing flights.
+    level, lat_idx, lon_idx = tile
+    if level > 0 and len(tile_flights) < FEED_PARAMS["limit"]:
+        child_size = get_tile_size(level - 1)
+        children = {child: {} for child in get_child_tiles(tile)}
+        for key, data in tile_flights.items():
+            child = (
+                level - 1,
+                min(
+                    max(math.floor(data[1] / child_size), 2 * lat_idx), 2 * lat_idx + 1
+                ),
+                min(
+                    max(math.floor(data[2] / child_size), 2 * lon_idx), 2 * lon_idx + 1
+                ),
+            )
+            children[child][key] = data
+
+        for child, child_flights in children.items():
+            FEED_CACHE.set(child, child_flights, ttl_s)
+
+    return tile_flights
+
+
+def fetch_tile_flights(tile) -> dict:
+    """Request a feed tile from the upstream API, bypassing every cache"""
+    level, lat_idx, lon_idx = tile
+    tile_size = get_tile_size(level)
+    bounds = ",".join(
+        [
+            str((lat_idx + 1) * tile_size),
+            str(lat_idx * tile_size),
+            str((lon_idx + 1) * tile_size),
+            str(lon_idx * tile_size),
+        ]
+    )
+
+    params = {**FEED_PARAMS, "bounds": bounds}
+
+    url = f"https://data-cloud.flightradar24.com/zones/fcgi/feed.js?{urlencode(params)}"
+    tile_flights = read_feed_rows(make_request(url))
+    snapshots.record_tile(tile, tile_flights)
+    return tile_flights
+
+
+def get_snapshot_tile_flights(tile):
+    """
+    Read the most recently recorded copy of a tile, or of the smallest tile which
+    contains it. Local snapshots are preferred, then the shared cache's old entries.
+    """
+    level, lat_idx, lon_idx = tile
+    shared_cache = get_shared_cache()
+
+    for shift in range(FEED_MAX_TILE_LEVEL - level + 1):
+        ancestor = wrap_tile((level + shift, lat_idx >> shift, lon_idx >> shift))
+        tile_flights = snapshots.read_tile_snapshot(ancestor)
+        if tile_flights is None and shared_cache is not None:
+            tile_flights = shared_cache.get_retained(get_tile_key(ancestor))
+        if tile_flights is not None:
+            return tile_flights
+
+    return {}
+
+
+def read_feed_rows(feed: dict) -> dict:
+    """Keep only the flight rows of a zone feed response, dropping its metadata"""
+    return {key: data for key, data in feed.items() if isinstance(data, list)}
+
+
 def get_flight_details(flight_id):
+    key = FLIGHT_KEY_PREFIX + flight_id
+    return IN_FLIGHT.do(key, lambda: load_flight_details(flight_id))
+
+
+def load_flight_details(flight_id):
+    shared_cache = get_shared_cache()
+    if shared_cache is None:
+        return fetch_flight_details(flight_id)
+
+    flight_details, _ = shared_cache.get_or_fetch(
+        FLIGHT_KEY_PREFIX + flight_id,
+        lambda: fetch_flight_details(flight_id),
+        SHARED_FLIGHT_FRESH_S,
+        SHARED_FLIGHT_STALE_S,
+    )
+    return flight_details
+
+
+def fetch_flight_details(flight_id):
     url = f"https://data-live.flightradar24.com/clickhandler/?flight={flight_id}"
     flight_details = make_request(url)
+    snapshots.record_details(flight_id, flight_details)
+    return flight_details
+
+
+def get_snapshot_flight_details(flight_id):
+    """Read the most recently recorded details of a flight, or None if there are none"""
+    flight_details = snapshots.read_details_snapshot(flight_id)
+    shared_cache = get_shared_cache()
+    if flight_details is None and shared_cache is not None:
+        flight_details = shared_cache.get_retained(FLIGHT_KEY_PREFIX + flight_id)
+
     return flight_details
 
 
@@ -53,9 +392,48 @@ def get_all_airports():
 
 
 def make_request(url):
-    req = Request(url, headers=HEADERS)
+    return call_upstream(lambda: HTTP_POOL.get_json(url))
+
+
+def call_upstream(request):
+    """Make a request to FR24 within the rate limit, unless the circuit is open"""
+    if not FR24_RATE_LIMIT.acquire(FR24_RATE_LIMIT_WAIT_S):
+        raise HandledException(
+            "Too many players are guessing right now, please try again shortly", 503
+        )
+
+    if not FR24_BREAKER.allow():
+        raise HandledException(
+            "Flight data is temporarily unavailable, please try again later", 503
+        )
+
+    started = time.monotonic()
+    try:
+        hedge_after_s = get_hedge_delay()
+        if hedge_after_s is None:
+            result = request()
+        else:
+            result = call_hedged(
+                HEDGE_EXECUTOR,
+                request,
+                hedge_after_s,
+                can_hedge=FR24_RATE_LIMIT.acquire,
+            )
+    except Exception as exc:
+        # Errors such as a 404 still show that FR24 is responding
+        if is_upstream_failure(exc):
+            FR24_BREAKER.record_failure()
+        else:
+            FR24_BREAKER.record_success()
+        raise
+
+    FR24_BREAKER.record_success()
+    FR24_LATENCY.record(time.monotonic() - started)
+    return result
+
 
-    with urlopen(req) as fr_response:
-        response = json.loads(fr_response.read().decode())
+def get_hedge_delay():
+    if FR24_HEDGE_PERCENTILE is None:
+        return None
 
-    return response
+    return FR24_LATENCY.percentile(float(FR24_HEDGE_PERCENTILE))
@@ -0,0 +1,110 @@
+import gzip
+import json
+from threading import Lock
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+
+
+class ConnectionPool:
+    """
+    Keeps HTTP(S) connections alive between requests, so that warm Lambda invocations
+    can skip the TCP and TLS handshakes. Connections are never shared between threads.
+    """
+
+    def __init__(
+        self,
+        headers: dict,
+        connect_timeout_s: float = 3,
+        read_timeout_s: float = 5,
+        max_idle_per_host: int = 4,
+    ):
+        self.headers = {**headers, "accept-encoding": "gzip"}
+        self.connect_timeout_s = connect_timeout_s
+        self.read_timeout_s = read_timeout_s
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = {}
+        self._lock = Lock()
+
+    def get_json(self, url: str):
+        """Make a GET request and parse the JSON response body"""
+        return json.loads(self.get_bytes(url))
+
+    def get_bytes(self, url: str) -> bytes:
+        """Make a GET request and return the decompressed response body"""
+        parts = urlsplit(url)
+        host_key = (parts.scheme, parts.netloc)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        conn, reused = self._acquire(host_key)
+        try:
+            status, reason, headers, body = self._send(conn, path)
+        except (HTTPException, ConnectionError):
+            conn.close()
+            if not reused:
+                raise
+            # The server may have closed an idle connection, so retry once on a new one
+            conn, _ = self._acquire(host_key, fresh=True)
+            try:
+                status, reason, headers, body = self._send(conn, path)
+            except Exception:
+                conn.close()
+                raise
+        except Exception:
+            conn.close()
+            raise
+
+        if headers.get("connection", "").lower() == "close":
+            conn.close()
+        else:
+            self._release(host_key, conn)
+
+        if status >= 400:
+            raise HTTPError(url, status, reason, headers, None)
+
+        if headers.get("content-encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+
+        return body
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def _send(self, conn, path: str):
+        if conn.sock is None:
+            conn.connect()
+            conn.sock.settimeout(self.read_timeout_s)
+
+        conn.request("GET", path, headers=self.headers)
+        response = conn.getresponse()
+        body = response.read()
+        headers = {key.lower(): value for key, value in response.getheaders()}
+
+        return response.status, response.reason, headers, body
+
+    def _acquire(self, host_key: tuple, fresh: bool = False):
+        if not fresh:
+            with self._lock:
+                conns = self._idle.get(host_key)
+                if conns:
+                    return conns.pop(), True
+
+        scheme, netloc = host_key
+        conn_type = HTTPSConnection if scheme == "https" else HTTPConnection
+        return conn_type(netloc, timeout=self.connect_timeout_s), False
+
+    def _release(self, host_key: tuple, conn):
+        with self._lock:
+            conns = self._idle.setdefault(host_key, [])
+            if len(conns) < self.max_idle_per_host:
+                conns.append(conn)
+                return
+
+        conn.close()
@@ -1,6 +1,19 @@
+import os
 import math
-from typing import Optional
-from helpers.fr24_api import get_all_flights, get_flight_details
+import time
+import copy
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+from helpers.cache import TTLCache
+from helpers.airport_index import get_airport
+from helpers.fr24_api import (
+    get_all_flights,
+    get_flight_details,
+    is_area_cached,
+    get_snapshot_flight_details,
+    FEED_MAX_EXTRAPOLATION_S,
+)
 from helpers.data_types import (
     Position,
     GameRules,
@@ -9,16 +22,61 @@ from helpers.data_types import (
     Points,
     GuessResult,
 )
+from helpers.resilience import is_upstream_failure
 from helpers.utils import get_nested, HandledException
 
+EARTH_RADIUS_KM = 6378
+KM_PER_NAUTICAL_MILE = 1.852
+MAX_FLIGHT_DIST_KM = 120
+
+# The search is widened through these radii until a flight is found, so that busy
+# areas only need a small feed area while sparse areas still find distant flights
+SEARCH_RINGS_KM = (15, 40, MAX_FLIGHT_DIST_KM)
+
+# The most feed round trips one search may make. Each ring which is not already cached
+# costs one, however many tiles it covers.
+SEARCH_MAX_ROUND_TRIPS = int(os.getenv("SEARCH_MAX_ROUND_TRIPS", "2"))
+
+# "details" fetches every guessed flight from the clickhandler API. "feed" builds the
+# flight from its feed row and the local airport index, and only falls back to the
+# clickhandler API when that is not possible.
+FLIGHT_LOOKUP_MODE = os.getenv("FLIGHT_LOOKUP_MODE", "details")
+
+# The number of nearest flights to consider when the closest cannot be scored
+CANDIDATE_COUNT = int(os.getenv("CANDIDATE_COUNT", "3"))
+
+# The candidates of every ring of a search can be resolved at once, since those which
+# are not waited for are still running when the next ring is searched
+CANDIDATE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=CANDIDATE_COUNT * len(SEARCH_RINGS_KM)
+)
+
+# Flights whose identity is hidden by FR24 all share this id, which clients recognise
+BLOCKED_CALLSIGN = "Blocked"
+BLOCKED_FLIGHT_ID = "Blocked-None-None"
+INVALID_FLIGHT_IDS = {BLOCKED_FLIGHT_ID}
+
+# Always use the recorded snapshots (see helpers/snapshots.py) instead of FR24, so that
+# load tests can run offline against a fixed dataset
+SNAPSHOT_REPLAY = os.getenv("SNAPSHOT_REPLAY", "false").lower() == "true"
+
+FLIGHT_CACHE = TTLCache(
+    max_size=int(os.getenv("FLIGHT_CACHE_MAX_SIZE", "256")),
+    ttl_s=float(os.getenv("FLIGHT_CACHE_TTL", "120")),
+)
+
 
 def make_guess(
     player_pos: Position,
     origin_guess_pos: Position,
     destination_guess_pos: Position,
     rules: GameRules,
+    full_details: bool = False,
+    guessed_flights: Iterable[str] = (),
 ) -> GuessResult:
-    flight = find_closest_flight(player_pos)
+    flight, approximate = find_closest_flight(
+        player_pos, rules, guessed_flights, full_details
+    )
 
     if flight is None:
         raise HandledException(
@@ -41,10 +99,22 @@ def make_guess(
         total=origin_points + destination_points,
     )
 
-    return GuessResult(points=points, flight=flight)
+    return GuessResult(points=points, flight=flight, approximate=approximate)
+
 
+def get_flight_id(flight_key: str, callsign, flight_number) -> str:
+    """
+    Build a flight's id from its FR24 flight key, which is known whether the flight is
+    read from its feed row or its details. Both paths must give the same id, as it is
+    what players' guess histories hold.
+    """
+    if callsign == BLOCKED_CALLSIGN and flight_number is None:
+        return BLOCKED_FLIGHT_ID
 
-def read_flight_details(raw: dict) -> Flight:
+    return "-".join(str(x) for x in [callsign, flight_number, flight_key])
+
+
+def read_flight_details(flight_key: str, raw: dict) -> Flight:
     def parse_airport(data):
         if data:
             return AirportInfo(
@@ -61,11 +131,9 @@ def read_flight_details(raw: dict) -> Flight:
 
     callsign = get_nested(raw, "identification", "callsign")
     flight_number = get_nested(raw, "identification", "number", "default")
-    departure_time = get_nested(raw, "time", "real", "departure")
-    unique_id = "-".join(str(x) for x in [callsign, flight_number, departure_time])
 
     return Flight(
-        id=unique_id,
+        id=get_flight_id(flight_key, callsign, flight_number),
         flight_number=flight_number,
         callsign=callsign,
         airline=get_nested(raw, "airline", "name"),
@@ -81,50 +149,436 @@ def read_flight_details(raw: dict) -> Flight:
     )
 
 
-def find_closest_flight(position: Position) -> Optional[Flight]:
-    all_flights = get_all_flights(position)
+def read_feed_row(
+    flight_key: str, row: list, require_route: bool = True
+) -> Optional[Flight]:
+    """
+    Build a flight from its zone feed row, resolving the route with the local airport
+    index. Returns None if the flight cannot be identified. Flights whose route is
+    unknown, or cannot be looked up, are also skipped unless `require_route` is False,
+    when they are returned without the unknown airports.
+    """
+    if len(row) < 17:
+        return None
 
-    max_dist_km = 120
+    callsign = row[16] or None
+    flight_number = row[13] or None
+    if callsign is None and flight_number is None:
+        return None
 
-    closest_flight_dist = float("inf")
-    closest_flight_key = None
-    closest_flight_data = None
+    origin_iata = row[11] or None
+    destination_iata = row[12] or None
+    try:
+        origin = get_airport(origin_iata)
+        destination = get_airport(destination_iata)
+    except Exception as exc:
+        print(f"[WARNING] Could not look up the route of flight {flight_key}: {exc}")
+        if require_route:
+            return None
+        origin, destination = None, None
 
-    for key, data in all_flights.items():
-        if not isinstance(data, list):
-            continue  # Skip metadata keys
+    route_unknown = (origin_iata and origin is None) or (
+        destination_iata and destination is None
+    )
+    if require_route and route_unknown:
+        return None
 
-        dist = haversine(position, Position(lat=data[1], lon=data[2]))
+    return Flight(
+        id=get_flight_id(flight_key, callsign, flight_number),
+        flight_number=flight_number,
+        callsign=callsign,
+        airline=None,
+        aircraft_type=row[8] or None,
+        aircraft_registration=row[9] or None,
+        image_src=None,
+        origin=origin,
+        destination=destination,
+        position=Position(lat=row[1], lon=row[2]),
+    )
 
-        if dist < closest_flight_dist and dist <= max_dist_km:
-            closest_flight_dist = dist
-            closest_flight_key = key
 
-    if closest_flight_key is None:
-        return None
+def find_closest_flight(
+    position: Position,
+    rules: Optional[GameRules] = None,
+    guessed_flights: Iterable[str] = (),
+    full_details: bool = False,
+) -> tuple[Optional[Flight], bool]:
+    """
+    Find the nearest flight which can be scored under the given rules, and which is not
+    in `guessed_flights`. The nearest flight overall is returned if none are scoreable.
+
+    If FR24 is unavailable, the flight is found in the recorded snapshots instead. The
+    second value returned is whether this happened, as the flight is then approximate.
+    """
+    approximate = SNAPSHOT_REPLAY
+    try:
+        flight = search_flights(
+            position, rules, guessed_flights, full_details, approximate
+        )
+    except Exception as exc:
+        if not is_upstream_unavailable(exc):
+            raise
+
+        print(f"[WARNING] Searching the snapshots, as FR24 is unavailable: {exc}")
+        try:
+            flight = search_flights(
+                position, rules, guessed_flights, full_details, from_snapshots=True
+            )
+        except Exception as snapshot_exc:
+            print(f"[WARNING] Could not search the snapshots: {snapshot_exc}")
+            flight = None
+
+        if flight is None:
+            raise exc
+        approximate = True
+
+    return flight, approximate
+
+
+def search_flights(
+    position: Position,
+    rules: Optional[GameRules] = None,
+    guessed_flights: Iterable[str] = (),
+    full_details: bool = False,
+    from_snapshots: bool = False,
+) -> Optional[Flight]:
+    """
+    Search the feed in widening rings around a position. The nearest few candidates in
+    each ring are resolved concurrently, and the search stops at the first ring with a
+    scoreable flight. Otherwise the nearest flight which could be resolved is returned.
+    """
+    resolve = resolve_snapshot_flight if from_snapshots else resolve_flight
+    round_trips_left = SEARCH_MAX_ROUND_TRIPS
+    tried_keys = set()
+    fallback_flight = None
+    first_error = None
+
+    for i, radius_km in enumerate(SEARCH_RINGS_KM):
+        lat_margin, lon_margin = get_search_margins(position, radius_km)
+
+        # Rings which are not cached are skipped when fetching them would leave no
+        # round trip for the widest ring. Fetching a ring also caches those within it.
+        is_widest = i == len(SEARCH_RINGS_KM) - 1
+        if not from_snapshots and not is_area_cached(position, lat_margin, lon_margin):
+            if round_trips_left <= 1 and not is_widest:
+                continue
+            round_trips_left -= 1
+
+        all_flights = get_all_flights(position, lat_margin, lon_margin, from_snapshots)
+        # Recorded rows are too old to project, and are used as they are
+        if not from_snapshots:
+            all_flights = project_flights(all_flights)
+
+        # Flights outside of the box can only be closer than those found within it if
+        # they are further away than this ring's radius.
+        nearest_flights = find_nearest_flights(
+            position,
+            all_flights,
+            k=CANDIDATE_COUNT,
+            max_dist_km=radius_km,
+            exclude=tried_keys,
+        )
+        tried_keys.update(key for _, key in nearest_flights)
+
+        for flight, error in resolve_candidates(
+            resolve, all_flights, nearest_flights, full_details
+        ):
+            if error is not None:
+                first_error = first_error or error
+            elif is_scoreable(flight, rules, guessed_flights):
+                return flight
+            else:
+                fallback_flight = fallback_flight or flight
+
+    if fallback_flight is None and first_error is not None:
+        raise first_error
+
+    return fallback_flight
+
+
+def resolve_candidates(
+    resolve, all_flights: dict, nearest_flights: list, full_details: bool
+):
+    """
+    Resolve candidate flights concurrently, yielding (flight, error) pairs nearest
+    first. Lookups which are not waited for are left to finish in the background,
+    which still populates the cache.
+    """
+    if len(nearest_flights) == 0:
+        return
+
+    futures = [
+        CANDIDATE_EXECUTOR.submit(resolve, key, all_flights[key], full_details)
+        for _, key in nearest_flights
+    ]
+
+    for future in futures:
+        try:
+            yield future.result(), None
+        except Exception as exc:
+            yield None, exc
+
+
+def is_upstream_unavailable(exc: Exception) -> bool:
+    # The rate limit and circuit breaker in fr24_api raise 503s
+    if isinstance(exc, HandledException):
+        return exc.status_code == 503
+
+    return is_upstream_failure(exc)
+
+
+def resolve_flight(flight_key: str, row: list, full_details: bool = False) -> Flight:
+    # Prefer full details when they are already cached, since they cost nothing extra
+    use_feed_row = (
+        FLIGHT_LOOKUP_MODE == "feed"
+        and not full_details
+        and FLIGHT_CACHE.get(flight_key) is None
+    )
+    if use_feed_row:
+        # Falls back to the clickhandler API if the route cannot be resolved locally
+        flight = read_feed_row(flight_key, row)
+        if flight is not None:
+            return flight
+
+    flight = get_flight(flight_key)
 
-    closest_flight_data = read_flight_details(get_flight_details(closest_flight_key))
+    # Details may have been cached locally or in the shared cache long before the feed
+    # row was fetched and projected, so their trail position is never used
+    flight.position = Position(lat=row[1], lon=row[2])
 
-    position_missing = (
-        closest_flight_data.position.lon is None
-        or closest_flight_data.position.lat is None
+    return flight
+
+
+def resolve_snapshot_flight(
+    flight_key: str, row: list, full_details: bool = False
+) -> Flight:
+    """Build a flight from the cache or the snapshots, without contacting FR24"""
+    flight = FLIGHT_CACHE.get(flight_key)
+    if flight is None:
+        flight_details = get_snapshot_flight_details(flight_key)
+        if flight_details is not None:
+            flight = read_flight_details(flight_key, flight_details)
+
+    if flight is None:
+        # The airport data may be unavailable too, so the route is not required
+        flight = read_feed_row(flight_key, row, require_route=False)
+        if flight is None:
+            raise ValueError(f"There are no details for flight {flight_key}")
+        return flight
+
+    flight = copy.copy(flight)
+    flight.position = Position(lat=row[1], lon=row[2])
+    return flight
+
+
+def is_scoreable(
+    flight: Flight, rules: Optional[GameRules], guessed_flights: Iterable[str] = ()
+) -> bool:
+    if flight.id is None or flight.id in INVALID_FLIGHT_IDS:
+        return False
+
+    if flight.id in guessed_flights:
+        return False
+
+    if rules is None:
+        return True
+
+    return (rules.use_origin and flight.origin is not None) or (
+        rules.use_destination and flight.destination is not None
+    )
+
+
+def find_nearest_flights(
+    position: Position,
+    all_flights: dict,
+    k: int = 1,
+    max_dist_km: float = MAX_FLIGHT_DIST_KM,
+    exclude: Iterable[str] = (),
+) -> list[tuple[float, str]]:
+    """
+    Find the k nearest flights in a feed response which are within `max_dist_km` of
+    the given position, other than those in `exclude`. Returns (distance, flight key)
+    pairs, nearest first.
+    """
+    keys, lats, lons = read_feed_columns(all_flights)
+
+    # Discard rows outside a bounding box around the search radius before doing
+    # any trigonometry.
+    lat_margin, lon_margin = get_search_margins(position, max_dist_km)
+    min_lat = position.lat - lat_margin
+    max_lat = position.lat + lat_margin
+    min_lon = position.lon - lon_margin
+    max_lon = position.lon + lon_margin
+
+    if min_lon >= -180 and max_lon <= 180:
+        candidates = [
+            i
+            for i, (lat, lon) in enumerate(zip(lats, lons))
+            if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon
+        ]
+    else:
+        # The box crosses the antimeridian, so longitudes are compared modulo 360
+        candidates = [
+            i
+            for i, (lat, lon) in enumerate(zip(lats, lons))
+            if min_lat <= lat <= max_lat
+            and abs((lon - position.lon + 180) % 360 - 180) <= lon_margin
+        ]
+
+    dists = haversine_many(
+        position.lat,
+        position.lon,
+        [lats[i] for i in candidates],
+        [lons[i] for i in candidates],
+    )
+
+    in_range = (
+        (dist, keys[i])
+        for i, dist in zip(candidates, dists)
+        if dist <= max_dist_km and keys[i] not in exclude
+    )
+    return heapq.nsmallest(k, in_range)
+
+
+def project_flights(all_flights: dict, now: Optional[float] = None) -> dict:
+    """
+    Dead-reckon each feed row from its timestamp to the current time using its track and
+    ground speed. Rows older than FEED_MAX_EXTRAPOLATION_S are dropped, since they can
+    no longer be placed accurately.
+    """
+    now = time.time() if now is None else now
+    projected_flights = {}
+    for key, row in all_flights.items():
+        projected = project_row(row, now)
+        if projected is not None:
+            projected_flights[key] = projected
+
+    return projected_flights
+
+
+def project_row(row: list, now: float) -> Optional[list]:
+    try:
+        track, speed_kt, timestamp = row[3], row[5], row[10]
+        elapsed_s = max(now - timestamp, 0)
+        if elapsed_s > FEED_MAX_EXTRAPOLATION_S:
+            return None
+
+        dist_km = speed_kt * KM_PER_NAUTICAL_MILE * elapsed_s / 3600
+        lat, lon = move_position(row[1], row[2], track, dist_km)
+    except (IndexError, TypeError):
+        return row  # Rows without a usable track or timestamp are left as they are
+
+    projected = list(row)
+    projected[1] = lat
+    projected[2] = lon
+    return projected
+
+
+def move_position(
+    lat: float, lon: float, bearing_deg: float, dist_km: float
+) -> tuple[float, float]:
+    """Find the position reached by travelling a distance along a great circle"""
+    if dist_km == 0:
+        return lat, lon
+
+    phi1 = math.radians(lat)
+    theta = math.radians(bearing_deg)
+    delta = dist_km / EARTH_RADIUS_KM
+
+    phi2 = math.asin(
+        math.sin(phi1) * math.cos(delta)
+        + math.cos(phi1) * math.sin(delta) * math.cos(theta)
     )
-    if position_missing:
-        closest_flight_data.position.lat = all_flights[closest_flight_key][1]
-        closest_flight_data.position.lon = all_flights[closest_flight_key][2]
+    d_lambda = math.atan2(
+        math.sin(theta) * math.sin(delta) * math.cos(phi1),
+        math.cos(delta) - math.sin(phi1) * math.sin(phi2),
+    )
+
+    lon_2 = (lon + math.degrees(d_lambda) + 540) % 360 - 180
+    return math.degrees(phi2), lon_2
+
+
+def get_search_margins(position: Position, radius_km: float) -> tuple[float, float]:
+    """
+    Get the latitude and longitude spans, in degrees, of a box which contains every
+    point within `radius_km` of the given position.
+    """
+    lat_margin = math.degrees(radius_km / EARTH_RADIUS_KM)
+    edge_cos = math.cos(math.radians(min(abs(position.lat) + lat_margin, 90)))
+    lon_margin = min(lat_margin / edge_cos, 180) if edge_cos > 0 else 180
+    return lat_margin, lon_margin
+
+
+def read_feed_columns(all_flights: dict) -> tuple[list, list, list]:
+    """Split the flight rows of a feed response into key, latitude and longitude columns"""
+    rows = [
+        (key, data[1], data[2])
+        for key, data in all_flights.items()
+        if isinstance(data, list)  # Skip metadata keys
+    ]
+    if len(rows) == 0:
+        return [], [], []
 
-    return closest_flight_data
+    keys, lats, lons = zip(*rows)
+    return list(keys), list(lats), list(lons)
+
+
+def haversine_many(lat: float, lon: float, lats: list, lons: list) -> list[float]:
+    """
+    Calculate the distance in km from one position to each of many positions.
+    This gives the same results as `haversine`, but avoids building a Position per row.
+    """
+    sin, cos, asin, sqrt, radians = (
+        math.sin,
+        math.cos,
+        math.asin,
+        math.sqrt,
+        math.radians,
+    )
+
+    phi1 = radians(lat)
+    cos_phi1 = cos(phi1)
+
+    dists = []
+    for lat_2, lon_2 in zip(lats, lons):
+        phi2 = radians(lat_2)
+        a = (
+            sin((phi2 - phi1) / 2) ** 2
+            + cos_phi1 * cos(phi2) * sin(radians(lon_2 - lon) / 2) ** 2
+        )
+        dists.append(2 * EARTH_RADIUS_KM * asin(sqrt(min(a, 1.0))))
+
+    return dists
+
+
+def get_flight(flight_key: str) -> Flight:
+    """
+    Get the parsed details of a flight, from the cache if possible. A copy is returned
+    so that callers may modify it without affecting the cached entry. Only Flight is
+    mutable, so the copy can share its airports and position.
+    """
+    flight = FLIGHT_CACHE.get(flight_key)
+    if flight is None:
+        flight = read_flight_details(flight_key, get_flight_details(flight_key))
+        FLIGHT_CACHE.set(flight_key, flight)
+
+    return copy.copy(flight)
 
 
 def haversine(pos_1: Position, pos_2: Position) -> float:
     """
     Calculate the distance in km between two longitude and latitude positions
     """
-    earth_radius = 6378
-    phi1 = math.radians(pos_1.lat)
-    phi2 = math.radians(pos_2.lat)
-    d_phi = math.radians(pos_2.lat - pos_1.lat)
-    d_lambda = math.radians(pos_2.lon - pos_1.lon)
+    return haversine_coords(pos_1.lat, pos_1.lon, pos_2.lat, pos_2.lon)
+
+
+def haversine_coords(lat_1: float, lon_1: float, lat_2: float, lon_2: float) -> float:
+    """The same as `haversine`, for coordinates which are not held in a Position"""
+    earth_radius = EARTH_RADIUS_KM
+    phi1 = math.radians(lat_1)
+    phi2 = math.radians(lat_2)
+    d_phi = math.radians(lat_2 - lat_1)
+    d_lambda = math.radians(lon_2 - lon_1)
 
     a = (
         math.sin(d_phi / 2) ** 2
@@ -135,6 +589,12 @@ def haversine(pos_1: Position, pos_2: Position) -> float:
 
 
 def calculate_points(pos_1: Position, pos_2: Position) -> int:
-    distance = haversine(pos_1, pos_2)
+    return calculate_points_coords(pos_1.lat, pos_1.lon, pos_2.lat, pos_2.lon)
+
+
+def calculate_points_coords(
+    lat_1: float, lon_1: float, lat_2: float, lon_2: float
+) -> int:
+    distance = haversine_coords(lat_1, lon_1, lat_2, lon_2)
     points = math.floor(100 * math.exp(-distance / 250))
     return points
@@ -0,0 +1,145 @@
+import time
+from threading import Lock
+from collections import deque
+from http.client import HTTPException
+from urllib.error import HTTPError
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional
+
+
+class TokenBucket:
+    """Limits a rate of calls to `rate` per second, allowing bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = Lock()
+
+    def acquire(self, timeout_s: float = 0) -> bool:
+        """Take a token, waiting up to `timeout_s` for one. Returns whether one was taken"""
+        deadline = time.monotonic() + timeout_s
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._tokens + (now - self._updated_at) * self.rate, self.burst
+                )
+                self._updated_at = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+
+                wait_s = (1 - self._tokens) / self.rate
+
+            if now + wait_s > deadline:
+                return False
+            time.sleep(wait_s)
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing dependency. After `failure_threshold` consecutive failures
+    the circuit opens, and calls are refused for `reset_timeout_s`. A single trial call
+    is then let through, which closes the circuit if it succeeds and reopens it if not.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout_s: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+
+            if self._trial_running:
+                return False
+
+            if time.monotonic() - self._opened_at < self.reset_timeout_s:
+                return False
+
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+
+class LatencyTracker:
+    """Tracks a window of recent call durations, to estimate their percentiles"""
+
+    def __init__(self, window: int = 200):
+        self._durations = deque(maxlen=window)
+        self._lock = Lock()
+
+    def record(self, duration_s: float):
+        with self._lock:
+            self._durations.append(duration_s)
+
+    def percentile(self, p: float, min_samples: int = 20) -> Optional[float]:
+        """Get the p-th percentile duration, or None if too few calls have been seen"""
+        with self._lock:
+            durations = sorted(self._durations)
+
+        if len(durations) < min_samples:
+            return None
+
+        return durations[min(int(len(durations) * p / 100), len(durations) - 1)]
+
+
+def is_upstream_failure(exc: Exception) -> bool:
+    """Whether an error suggests the upstream is unhealthy, rather than the request"""
+    if isinstance(exc, HTTPError):
+        return exc.code == 429 or exc.code >= 500
+
+    return isinstance(exc, (OSError, HTTPException))
+
+
+def call_hedged(
+    executor: ThreadPoolExecutor,
+    request: Callable[[], Any],
+    hedge_after_s: float,
+    can_hedge: Callable[[], bool] = lambda: True,
+) -> Any:
+    """
+    Make a request, and if it has not completed after `hedge_after_s` then make a
+    second identical one, returning whichever succeeds first. `can_hedge` is checked
+    before the second request is sent, for example against a rate limit.
+    """
+    first = executor.submit(request)
+    done, _ = wait([first], timeout=hedge_after_s)
+    if done or not can_hedge():
+        return first.result()
+
+    pending = {first, executor.submit(request)}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                return future.result()
+            except Exception as exc:
+                error = error or exc
+
+    raise error
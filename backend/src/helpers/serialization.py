@@ -0,0 +1,47 @@
+import json
+from dataclasses import fields, is_dataclass
+
+# The field names of each dataclass, so that they are not looked up for every instance
+FIELD_NAMES = {}
+
+
+def to_json(body, drop_nulls: bool = False) -> str:
+    """
+    Encode a response body which may contain the classes from `helpers.data_types`.
+    Unlike `dataclasses.asdict`, nested dataclasses are not deep-copied first, as the
+    encoder reads their fields directly. `drop_nulls` omits dataclass fields which
+    are None.
+    """
+    encoder = JSON_ENCODER_DROP_NULLS if drop_nulls else JSON_ENCODER
+    return encoder.encode(body)
+
+
+def to_json_bytes(body, drop_nulls: bool = False) -> bytes:
+    return to_json(body, drop_nulls).encode("utf-8")
+
+
+def shallow_asdict(obj, drop_nulls: bool = False) -> dict:
+    """Read a dataclass's fields into a dict, without converting any nested values"""
+    cls = type(obj)
+    names = FIELD_NAMES.get(cls)
+    if names is None:
+        names = FIELD_NAMES[cls] = tuple(field.name for field in fields(cls))
+
+    values = {name: getattr(obj, name) for name in names}
+    if drop_nulls:
+        return {name: value for name, value in values.items() if value is not None}
+
+    return values
+
+
+def encode_dataclass(obj, drop_nulls: bool = False) -> dict:
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return shallow_asdict(obj, drop_nulls)
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+JSON_ENCODER = json.JSONEncoder(default=encode_dataclass)
+JSON_ENCODER_DROP_NULLS = json.JSONEncoder(
+    default=lambda obj: encode_dataclass(obj, drop_nulls=True)
+)
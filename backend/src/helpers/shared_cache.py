@@ -0,0 +1,364 @@
+import os
+import gzip
+import json
+import time
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from helpers.cache import TTLCache
+
+# A cache shared by every Lambda container, which sits between each container's own
+# in-process caches and the upstream API. It is disabled unless a table is configured.
+SHARED_CACHE_TABLE_NAME = os.getenv("SHARED_CACHE_TABLE_NAME")
+
+# DynamoDB rejects items over 400 KB, so larger values are only cached locally
+MAX_VALUE_BYTES = 350 * 1024
+
+# Only one container refreshes a stale entry at a time. The lease lapses after this
+# long, in case the container holding it is frozen or fails.
+REFRESH_LEASE_S = 10
+
+# When another container is already fetching a missing value, it is waited for for up
+# to this long before it is fetched again
+COALESCE_WAIT_S = 1.0
+COALESCE_POLL_S = 0.1
+
+# Each container records a request for a key at most this often, which is enough for
+# the warmer to tell which keys are popular
+REQUEST_RECORD_INTERVAL_S = 60
+
+# Entries are deleted by DynamoDB's TTL once they have gone this long unused
+ENTRY_RETENTION_S = 24 * 60 * 60
+
+# Requests for a key are counted in a separate small item under this prefix, so that
+# the warmer can find popular keys without reading the cached values. These are the
+# only items in the sparse RequestIndex, which is keyed by the requested key's kind:
+# the part up to and including its first colon, such as "tile:".
+REQUEST_KEY_PREFIX = "requests:"
+REQUEST_INDEX_NAME = "RequestIndex"
+
+_shared_cache = None
+_shared_cache_lock = Lock()
+
+
+class SharedCache:
+    """
+    Caches JSON values in a `store` with stale-while-revalidate semantics. A value is
+    served as it is until it is `fresh_s` old. Until it is `stale_s` old, it is still
+    served while it is refreshed in the background, and after that it is refetched.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._recorded = TTLCache(max_size=1024, ttl_s=REQUEST_RECORD_INTERVAL_S)
+        self._executor = ThreadPoolExecutor(max_workers=4)
+
+    def get_or_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Any],
+        fresh_s: float,
+        stale_s: float,
+    ) -> tuple[Any, float]:
+        """Get a value and its age in seconds, calling `fetch` if it is not cached"""
+        entry = self._read(key)
+        now = time.time()
+
+        if entry is not None and now < entry["stale_until"]:
+            if now >= entry["fresh_until"] and self._lease(key):
+                self._executor.submit(self._refresh, key, fetch, fresh_s, stale_s)
+            return decode_value(entry["value"]), max(now - entry["fetched_at"], 0)
+
+        # The lease also coalesces misses, so that only one container fetches a value
+        # which many need at once
+        if not self._lease(key, default=True):
+            entry = self._wait_for(key)
+            if entry is not None:
+                now = time.time()
+                return decode_value(entry["value"]), max(now - entry["fetched_at"], 0)
+
+        try:
+            value = fetch()
+        except Exception:
+            self._release_lease(key)
+            raise
+
+        self.set(key, value, fresh_s, stale_s)
+        return value, 0.0
+
+    def get_retained(self, key: str) -> Optional[Any]:
+        """Get a value however old it is, for when it cannot be fetched again"""
+        entry = self._read(key)
+        return None if entry is None else decode_value(entry["value"])
+
+    def set(self, key: str, value: Any, fresh_s: float, stale_s: float):
+        data = encode_value(value)
+        if len(data) > MAX_VALUE_BYTES:
+            # Not stored, so nobody waits for it either
+            self._release_lease(key)
+            return
+
+        now = time.time()
+        try:
+            self.store.put(key, data, now, now + fresh_s, now + stale_s)
+        except Exception as e:
+            print(f"[WARNING] Failed to write {key} to the shared cache: {e}")
+
+    def record_request(self, key: str):
+        """Count a request for a key in the background, for use by the warmer"""
+        if self._recorded.get(key) is not None:
+            return
+
+        self._recorded.set(key, True)
+        self._executor.submit(self._record_request, key)
+
+    def _read(self, key: str) -> Optional[dict]:
+        try:
+            return self.store.get(key)
+        except Exception as e:
+            print(f"[WARNING] Failed to read {key} from the shared cache: {e}")
+            return None
+
+    def _lease(self, key: str, default: bool = False) -> bool:
+        try:
+            return self.store.try_lease(key, REFRESH_LEASE_S)
+        except Exception as e:
+            print(f"[WARNING] Failed to lease {key} in the shared cache: {e}")
+            return default
+
+    def _release_lease(self, key: str):
+        try:
+            self.store.release_lease(key)
+        except Exception as e:
+            print(f"[WARNING] Failed to release the lease on {key}: {e}")
+
+    def _wait_for(self, key: str) -> Optional[dict]:
+        """Wait for another container to store a usable value for a key"""
+        deadline = time.time() + COALESCE_WAIT_S
+        while time.time() < deadline:
+            time.sleep(COALESCE_POLL_S)
+            entry = self._read(key)
+            if entry is not None and time.time() < entry["stale_until"]:
+                return entry
+
+        return None
+
+    def _refresh(self, key: str, fetch: Callable[[], Any], fresh_s, stale_s):
+        try:
+            self.set(key, fetch(), fresh_s, stale_s)
+        except Exception as e:
+            print(f"[WARNING] Failed to refresh {key} in the shared cache: {e}")
+            self._release_lease(key)
+
+    def _record_request(self, key: str):
+        try:
+            self.store.record_request(key)
+        except Exception as e:
+            print(f"[WARNING] Failed to record a request for {key}: {e}")
+
+
+class DynamoDBStore:
+    """
+    Stores shared cache entries in a DynamoDB table with a `cache_key` hash key. The
+    low-level client is used, as unlike the resource it is safe to share between the
+    request and background refresh threads.
+    """
+
+    def __init__(self, table_name: str):
+        import boto3
+
+        self.table_name = table_name
+        self.client = boto3.client("dynamodb")
+
+    def get(self, key: str) -> Optional[dict]:
+        item = self.client.get_item(
+            TableName=self.table_name,
+            Key={"cache_key": {"S": key}},
+            ProjectionExpression="cache_value, fetched_at, fresh_until, stale_until",
+        ).get("Item")
+
+        # Items which have only been leased have no value yet
+        if item is None or "cache_value" not in item:
+            return None
+
+        return {
+            "value": item["cache_value"]["B"],
+            "fetched_at": float(item["fetched_at"]["N"]),
+            "fresh_until": float(item["fresh_until"]["N"]),
+            "stale_until": float(item["stale_until"]["N"]),
+        }
+
+    def put(self, key, value: bytes, fetched_at, fresh_until, stale_until):
+        # Replacing the item also releases any lease on it
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                "cache_key": {"S": key},
+                "cache_value": {"B": value},
+                "fetched_at": {"N": str(fetched_at)},
+                "fresh_until": {"N": str(fresh_until)},
+                "stale_until": {"N": str(stale_until)},
+                "expires_at": {"N": str(int(stale_until + ENTRY_RETENTION_S))},
+            },
+        )
+
+    def try_lease(self, key: str, duration_s: float) -> bool:
+        now = time.time()
+        try:
+            self.client.update_item(
+                TableName=self.table_name,
+                Key={"cache_key": {"S": key}},
+                UpdateExpression=(
+                    "SET refreshing_until = :until, "
+                    "expires_at = if_not_exists(expires_at, :e)"
+                ),
+                ConditionExpression=(
+                    "attribute_not_exists(refreshing_until) OR refreshing_until < :now"
+                ),
+                ExpressionAttributeValues={
+                    ":until": {"N": str(now + duration_s)},
+                    ":now": {"N": str(now)},
+                    ":e": {"N": str(int(now + ENTRY_RETENTION_S))},
+                },
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+        return True
+
+    def release_lease(self, key: str):
+        self.client.update_item(
+            TableName=self.table_name,
+            Key={"cache_key": {"S": key}},
+            UpdateExpression="REMOVE refreshing_until",
+        )
+
+    def record_request(self, key: str):
+        now = int(time.time())
+        self.client.update_item(
+            TableName=self.table_name,
+            Key={"cache_key": {"S": REQUEST_KEY_PREFIX + key}},
+            UpdateExpression=(
+                "ADD request_count :one "
+                "SET request_kind = :k, last_requested = :t, expires_at = :e"
+            ),
+            ExpressionAttributeValues={
+                ":one": {"N": "1"},
+                ":k": {"S": get_key_kind(key)},
+                ":t": {"N": str(now)},
+                ":e": {"N": str(now + ENTRY_RETENTION_S)},
+            },
+        )
+
+    def get_popular_keys(self, prefix: str, since: float, limit: int) -> list[str]:
+        """List the most requested keys of a kind which were requested recently"""
+        items = []
+        query_args = {
+            "TableName": self.table_name,
+            "IndexName": REQUEST_INDEX_NAME,
+            "KeyConditionExpression": "request_kind = :k AND last_requested >= :t",
+            "ExpressionAttributeValues": {
+                ":k": {"S": prefix},
+                ":t": {"N": str(int(since))},
+            },
+        }
+
+        while True:
+            response = self.client.query(**query_args)
+            items.extend(response.get("Items", []))
+
+            if "LastEvaluatedKey" not in response:
+                break
+            query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+        items.sort(key=lambda item: int(item["request_count"]["N"]), reverse=True)
+        return [
+            item["cache_key"]["S"].removeprefix(REQUEST_KEY_PREFIX)
+            for item in items[:limit]
+        ]
+
+
+class MemoryStore:
+    """An in-process stand-in for DynamoDBStore, for local testing"""
+
+    def __init__(self):
+        self.items = {}
+        self.requests = {}
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            item = self.items.get(key, {})
+            if "value" not in item:
+                return None
+            return dict(item)
+
+    def put(self, key, value: bytes, fetched_at, fresh_until, stale_until):
+        with self._lock:
+            self.items[key] = {
+                "value": value,
+                "fetched_at": fetched_at,
+                "fresh_until": fresh_until,
+                "stale_until": stale_until,
+            }
+
+    def try_lease(self, key: str, duration_s: float) -> bool:
+        now = time.time()
+        with self._lock:
+            item = self.items.setdefault(key, {})
+            if item.get("refreshing_until", 0) >= now:
+                return False
+            item["refreshing_until"] = now + duration_s
+            return True
+
+    def release_lease(self, key: str):
+        with self._lock:
+            self.items.get(key, {}).pop("refreshing_until", None)
+
+    def record_request(self, key: str):
+        with self._lock:
+            request = self.requests.setdefault(key, {"request_count": 0})
+            request["request_count"] += 1
+            request["last_requested"] = time.time()
+
+    def get_popular_keys(self, prefix: str, since: float, limit: int) -> list[str]:
+        with self._lock:
+            keys = [
+                (request["request_count"], key)
+                for key, request in self.requests.items()
+                if get_key_kind(key) == prefix and request["last_requested"] >= since
+            ]
+
+        keys.sort(reverse=True)
+        return [key for _, key in keys[:limit]]
+
+
+def get_shared_cache() -> Optional[SharedCache]:
+    """Get the shared cache, or None if no table is configured"""
+    global _shared_cache
+
+    if _shared_cache is None and SHARED_CACHE_TABLE_NAME:
+        # Creating a boto3 client is not thread-safe
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = SharedCache(DynamoDBStore(SHARED_CACHE_TABLE_NAME))
+
+    return _shared_cache
+
+
+def set_shared_cache(cache: Optional[SharedCache]):
+    """Replace the shared cache, for example with one backed by a MemoryStore"""
+    global _shared_cache
+    _shared_cache = cache
+
+
+def get_key_kind(key: str) -> str:
+    return key[: key.find(":") + 1]
+
+
+def encode_value(value: Any) -> bytes:
+    return gzip.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_value(data: bytes) -> Any:
+    return json.loads(gzip.decompress(data))
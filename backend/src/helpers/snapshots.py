@@ -0,0 +1,126 @@
+import os
+import gzip
+import json
+import time
+import shutil
+from itertools import zip_longest
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+# Feed tiles and flight details fetched from FR24 are recorded here, so that guesses
+# can still be made from recent data while FR24 is unavailable. A directory of
+# recorded snapshots is also a fixed dataset for offline load tests (see
+# SNAPSHOT_REPLAY in make_guess.py). Recording is disabled if this is empty.
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "/tmp/flight-snapshots")
+
+# Snapshots are grouped into buckets of this many seconds, and only the most recent
+# buckets are kept
+SNAPSHOT_BUCKET_S = int(os.getenv("SNAPSHOT_BUCKET", "300"))
+SNAPSHOT_MAX_BUCKETS = int(os.getenv("SNAPSHOT_MAX_BUCKETS", "12"))
+
+# The parts of a clickhandler response which are read by make_guess.read_flight_details
+DETAIL_KEYS = ("identification", "airline", "aircraft", "airport", "time")
+
+# Files are written off the request path, one at a time
+WRITE_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+
+
+def record_tile(tile, tile_flights: dict):
+    if SNAPSHOT_DIR:
+        WRITE_EXECUTOR.submit(
+            write_snapshot, get_tile_name(tile), tile_flights, to_columns
+        )
+
+
+def record_details(flight_id: str, flight_details: dict):
+    if SNAPSHOT_DIR and flight_details:
+        WRITE_EXECUTOR.submit(
+            write_snapshot, get_flight_name(flight_id), flight_details, compact_details
+        )
+
+
+def read_tile_snapshot(tile) -> Optional[dict]:
+    """Read the most recent snapshot of a feed tile, or None if there is none"""
+    data = read_snapshot(get_tile_name(tile))
+    return None if data is None else from_columns(data)
+
+
+def read_details_snapshot(flight_id: str) -> Optional[dict]:
+    return read_snapshot(get_flight_name(flight_id))
+
+
+def get_tile_name(tile) -> str:
+    return "tile_" + "_".join(str(i) for i in tile)
+
+
+def get_flight_name(flight_id: str) -> str:
+    return "flight_" + "".join(c for c in flight_id if c.isalnum())
+
+
+def to_columns(tile_flights: dict) -> dict:
+    """
+    Store the rows of a tile as one list per column, which repeats far less than
+    the rows do once compressed. Short rows are padded with None.
+    """
+    return {
+        "keys": list(tile_flights),
+        "columns": [list(column) for column in zip_longest(*tile_flights.values())],
+    }
+
+
+def from_columns(data: dict) -> dict:
+    return {key: list(row) for key, row in zip(data["keys"], zip(*data["columns"]))}
+
+
+def compact_details(flight_details: dict) -> dict:
+    """Keep only what is needed to rebuild the flight, and the latest trail point"""
+    compact = {key: flight_details.get(key) for key in DETAIL_KEYS}
+    compact["trail"] = (flight_details.get("trail") or [])[:1]
+    return compact
+
+
+def write_snapshot(name: str, value: dict, compact: Callable[[dict], dict]):
+    try:
+        data = compact(value)
+        bucket = int(time.time()) // SNAPSHOT_BUCKET_S * SNAPSHOT_BUCKET_S
+        bucket_dir = os.path.join(SNAPSHOT_DIR, str(bucket))
+        if not os.path.isdir(bucket_dir):
+            os.makedirs(bucket_dir, exist_ok=True)
+            prune_buckets()
+
+        # Written to a temporary file first, so that readers never see part of one
+        path = os.path.join(bucket_dir, f"{name}.json.gz")
+        with open(f"{path}.tmp", "wb") as file:
+            file.write(gzip.compress(json.dumps(data, separators=(",", ":")).encode()))
+        os.replace(f"{path}.tmp", path)
+
+    except Exception as e:
+        print(f"[WARNING] Failed to write the {name} snapshot: {e}")
+
+
+def read_snapshot(name: str) -> Optional[dict]:
+    for bucket in list_buckets():
+        path = os.path.join(SNAPSHOT_DIR, str(bucket), f"{name}.json.gz")
+        try:
+            with open(path, "rb") as file:
+                return json.loads(gzip.decompress(file.read()))
+        except FileNotFoundError:
+            continue
+
+    return None
+
+
+def list_buckets() -> list[int]:
+    """List the snapshot buckets, most recent first"""
+    if not SNAPSHOT_DIR or not os.path.isdir(SNAPSHOT_DIR):
+        return []
+
+    return sorted(
+        (int(name) for name in os.listdir(SNAPSHOT_DIR) if name.isdigit()),
+        reverse=True,
+    )
+
+
+def prune_buckets():
+    for bucket in list_buckets()[SNAPSHOT_MAX_BUCKETS:]:
+        shutil.rmtree(os.path.join(SNAPSHOT_DIR, str(bucket)), ignore_errors=True)
@@ -1,7 +1,10 @@
 import json
+import time
 from typing import Any, Union
 from helpers.data_types import Position, GameRules
 
+METRIC_NAMESPACE = "FlightGuesser"
+
 
 class HandledException(Exception):
     def __init__(self, message, status_code=400):
@@ -28,6 +31,27 @@ class HandledException(Exception):
         }
 
 
+def put_metric(name: str, value: float, unit: str = "Count"):
+    """Publish a CloudWatch metric using the embedded metric format"""
+    print(
+        json.dumps(
+            {
+                "_aws": {
+                    "Timestamp": int(time.time() * 1000),
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": METRIC_NAMESPACE,
+                            "Dimensions": [[]],
+                            "Metrics": [{"Name": name, "Unit": unit}],
+                        }
+                    ],
+                },
+                name: value,
+            }
+        )
+    )
+
+
 def read_position(item: dict, item_name: str, allow_missing: bool = False) -> Position:
     try:
         return Position(lon=item.get("lon"), lat=item.get("lat"))
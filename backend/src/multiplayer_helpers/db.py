@@ -1,11 +1,70 @@
 import os
-import boto3
+import time
 
 
-DDB_RESOURCE = boto3.resource("dynamodb")
-
 LOBBY_TABLE_NAME = os.getenv("LOBBY_TABLE_NAME")
-LOBBY_TABLE = DDB_RESOURCE.Table(LOBBY_TABLE_NAME)
-
 PLAYER_TABLE_NAME = os.getenv("PLAYER_TABLE_NAME")
-PLAYER_TABLE = DDB_RESOURCE.Table(PLAYER_TABLE_NAME)
+
+# Lobbies and players are removed after this long without any interaction
+IDLE_EXPIRY_S = int(os.getenv("IDLE_EXPIRY_S", str(7 * 24 * 60 * 60)))
+
+# Lobby queries read this index, which projects only what lobby lists and guesses
+# need. They fall back to the legacy index, which projects every attribute, until it
+# has been built.
+LOBBY_INDEX_NAME = "LobbyPlayersIndex"
+LEGACY_LOBBY_INDEX_NAME = "LobbyIndex"
+MISSING_INDEX_ERRORS = {"ValidationException", "ResourceNotFoundException"}
+
+# Lobbies are listed in this index by the day they expire on, so that the sweeper can
+# find expired lobbies without scanning the table
+LOBBY_EXPIRY_INDEX_NAME = "LobbyExpiryIndex"
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# boto3 takes a large share of the cold start time, so it is only imported and set up
+# by the first request which needs DynamoDB. Warm invocations share the same objects.
+_ddb_resource = None
+_tables = {}
+
+
+def get_lobby_table():
+    return get_table(LOBBY_TABLE_NAME)
+
+
+def get_player_table():
+    return get_table(PLAYER_TABLE_NAME)
+
+
+def get_table(table_name: str):
+    global _ddb_resource
+
+    if table_name not in _tables:
+        if _ddb_resource is None:
+            import boto3
+
+            _ddb_resource = boto3.resource("dynamodb")
+        _tables[table_name] = _ddb_resource.Table(table_name)
+
+    return _tables[table_name]
+
+
+def get_expiry_time() -> int:
+    """Get the value for an item's `expires_at` TTL attribute, following an interaction"""
+    return int(time.time()) + IDLE_EXPIRY_S
+
+
+def get_expiry_day(expires_at: int) -> int:
+    """Get the day an `expires_at` time falls on, which partitions the lobby expiry index"""
+    return expires_at // SECONDS_PER_DAY
+
+
+def query_lobby_index(**query_args) -> dict:
+    """Query the players of a lobby, using the legacy index if the new one is not ready"""
+    table = get_player_table()
+    try:
+        return table.query(IndexName=LOBBY_INDEX_NAME, **query_args)
+    except table.meta.client.exceptions.ClientError as exc:
+        # Missing and backfilling indexes cannot be queried
+        if exc.response["Error"]["Code"] not in MISSING_INDEX_ERRORS:
+            raise
+
+    return table.query(IndexName=LEGACY_LOBBY_INDEX_NAME, **query_args)
@@ -1,17 +1,30 @@
+import os
 import random
 import string
+from typing import Optional
 from datetime import datetime, timezone
 from dataclasses import asdict
 from helpers.data_types import GameRules
-from multiplayer_helpers.db import LOBBY_TABLE, PLAYER_TABLE
+from helpers.utils import HandledException, put_metric
+from multiplayer_helpers.db import (
+    get_lobby_table,
+    get_expiry_day,
+    get_expiry_time,
+    query_lobby_index,
+)
 from multiplayer_helpers.player_type import Player
-from boto3.dynamodb.conditions import Key
+
+# The ID space can be widened if collisions become common
+LOBBY_ID_LENGTH = int(os.getenv("LOBBY_ID_LENGTH", "4"))
+LOBBY_ID_ALPHABET = os.getenv("LOBBY_ID_ALPHABET", string.ascii_uppercase)
+LOBBY_ID_MAX_ATTEMPTS = 10
 
 
 class Lobby:
-    def __init__(self, lobby_id: str, rules: GameRules):
+    def __init__(self, lobby_id: str, rules: GameRules, sequence: int = 0):
         self._id = lobby_id
         self._rules = rules
+        self._sequence = sequence
 
     @property
     def id(self):
@@ -21,31 +34,51 @@ class Lobby:
     def rules(self):
         return self._rules
 
+    @property
+    def sequence(self):
+        """The number of the latest change to the lobby's players"""
+        return self._sequence
+
     @classmethod
     def create(cls, rules: GameRules):
-        is_unique = False
-        while not is_unique:
-            # Generate a random four-letter string
-            lobby_id = "".join(random.choice(string.ascii_uppercase) for i in range(4))
-            # Confirm that this lobby ID is not already in use
-            existing_lobby = Lobby.read(lobby_id)
-            if existing_lobby is None:
-                is_unique = True
-
-        LOBBY_TABLE.put_item(
-            Item={
-                "lobby_id": lobby_id,
-                "last_interaction": datetime.now(timezone.utc).isoformat(),
-                **asdict(rules),
-            }
-        )
+        table = get_lobby_table()
+        expires_at = get_expiry_time()
+        collisions = 0
+        for _ in range(LOBBY_ID_MAX_ATTEMPTS):
+            lobby_id = "".join(
+                random.choice(LOBBY_ID_ALPHABET) for i in range(LOBBY_ID_LENGTH)
+            )
+            try:
+                # The condition guarantees that an existing lobby is never overwritten
+                table.put_item(
+                    Item={
+                        "lobby_id": lobby_id,
+                        "last_interaction": datetime.now(timezone.utc).isoformat(),
+                        "expires_at": expires_at,
+                        "expiry_day": get_expiry_day(expires_at),
+                        "sequence": 0,
+                        **asdict(rules),
+                    },
+                    ConditionExpression="attribute_not_exists(lobby_id)",
+                )
+                break
+            except table.meta.client.exceptions.ConditionalCheckFailedException:
+                collisions += 1
+        else:
+            lobby_id = None
+
+        put_metric("LobbyIdCollisions", collisions)
+
+        if lobby_id is None:
+            raise HandledException("Unable to create a lobby, please try again", 503)
+
         lobby = cls(lobby_id, rules)
 
         return lobby
 
     @classmethod
     def read(cls, lobby_id: str):
-        response = LOBBY_TABLE.get_item(Key={"lobby_id": lobby_id})
+        response = get_lobby_table().get_item(Key={"lobby_id": lobby_id})
         lobby_record = response.get("Item")
 
         if lobby_record is None:
@@ -59,20 +92,99 @@ class Lobby:
             use_destination=use_destination,
         )
 
-        lobby = cls(lobby_id, rules)
+        lobby = cls(lobby_id, rules, int(lobby_record.get("sequence", 0)))
 
         return lobby
 
+    def next_sequence(self) -> int:
+        """Atomically number a new change to the lobby's players"""
+        expires_at = get_expiry_time()
+        response = get_lobby_table().update_item(
+            Key={"lobby_id": self.id},
+            UpdateExpression=(
+                "ADD #seq :one "
+                "SET last_interaction = :t, expires_at = :e, expiry_day = :d"
+            ),
+            ExpressionAttributeNames={"#seq": "sequence"},
+            ExpressionAttributeValues={
+                ":one": 1,
+                ":t": datetime.now(timezone.utc).isoformat(),
+                ":e": expires_at,
+                ":d": get_expiry_day(expires_at),
+            },
+            ReturnValues="UPDATED_NEW",
+        )
+        self._sequence = int(response["Attributes"]["sequence"])
+        return self._sequence
+
     def delete(self):
-        LOBBY_TABLE.delete_item(Key={"lobby_id": self.id})
+        get_lobby_table().delete_item(Key={"lobby_id": self.id})
         return None
 
     def get_players(self):
-        items = PLAYER_TABLE.query(
+        from boto3.dynamodb.conditions import Key
+
+        items = query_lobby_index(
             KeyConditionExpression=Key("lobby_id").eq(self.id),
-            IndexName="LobbyIndex",
         ).get("Items")
 
         players = list(map(Player.from_dict, items))
 
         return players
+
+    def snapshot(self, players: Optional[list[Player]] = None):
+        """
+        Load the lobby's players into a snapshot. If the players are already known then
+        no further reads are made.
+        """
+        if players is None:
+            players = self.get_players()
+
+        return LobbySnapshot(self, players)
+
+
+class LobbySnapshot:
+    """
+    A lobby and its players, read once per invocation. Players are served from the
+    snapshot rather than being read individually, and writes are deferred to `save`.
+    """
+
+    def __init__(self, lobby: Lobby, players: list[Player]):
+        self._lobby = lobby
+        self._players = {player.name: player for player in players}
+
+    @property
+    def lobby(self):
+        return self._lobby
+
+    @property
+    def players(self):
+        return list(self._players.values())
+
+    @classmethod
+    def load(cls, lobby_id: str):
+        lobby = Lobby.read(lobby_id)
+        if lobby is None:
+            return None
+
+        return lobby.snapshot()
+
+    def get_player(self, name: str, connection_id: str) -> Optional[Player]:
+        """Get a player, recording their current connection if it has changed"""
+        player = self._players.get(name)
+        if player is not None:
+            player.set_connection(connection_id)
+
+        return player
+
+    def add_player(self, player: Player):
+        self._players[player.name] = player
+
+    def save(self):
+        """Write any changes which have not already been saved by the players"""
+        for player in self._players.values():
+            if not player.connection_saved:
+                player.save_connection()
+
+    def to_dict(self):
+        return list(map(lambda p: p.to_dict(), self._players.values()))
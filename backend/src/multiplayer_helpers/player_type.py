@@ -1,6 +1,13 @@
+from typing import Optional
 from datetime import datetime, timezone
 from helpers.data_types import GuessResult
-from multiplayer_helpers.db import PLAYER_TABLE
+from multiplayer_helpers.db import get_player_table, get_expiry_time
+
+# A flight cannot be guessed again once it has landed, so guesses only need to be
+# remembered for longer than any flight lasts. New guesses are added to the current
+# generation of the history. Once it is this old, it replaces the previous generation,
+# whose guesses are discarded. Every guess is therefore kept for at least this long.
+GUESS_HISTORY_TTL_S = 2 * 24 * 60 * 60
 
 
 class Player:
@@ -18,8 +25,11 @@ class Player:
         self._lobby = lobby
         self._name = name
         self._connection_id = connection_id
+        self._connection_saved = True
         self.score = int(0)
+        self.guess_count = int(0)
         self.guessed_flights = []
+        self._history_started_at = None
 
     @property
     def id(self):
@@ -37,42 +47,57 @@ class Player:
     def connection_id(self):
         return self._connection_id
 
-    @classmethod
-    def create(cls, name: str, lobby: str, connection_id: str):
-        player = cls(name, lobby, connection_id)
-        PLAYER_TABLE.put_item(
-            Item={
-                "player_id": player.id,
-                "lobby_id": player.lobby,
-                "player_name": player.name,
-                "connection_id": player.connection_id,
-                "score": player.score,
-                "guessed_flights": player.guessed_flights,
-                "last_interaction": datetime.now(timezone.utc).isoformat(),
-            }
-        )
-        return player
+    @property
+    def connection_saved(self):
+        return self._connection_saved
 
-    @classmethod
-    def from_db(cls, name: str, lobby: str, connection_id: str):
-        player_id = Player.get_id(name, lobby)
-        response = PLAYER_TABLE.get_item(Key={"player_id": player_id})
-        player_record = response.get("Item")
+    def set_connection(self, connection_id: str):
+        """Record a new connection for the player, to be saved by the next write"""
+        if connection_id != self._connection_id:
+            self._connection_id = connection_id
+            self._connection_saved = False
 
-        if player_record is None:
-            return None
+    def save_connection(self):
+        get_player_table().update_item(
+            Key={"player_id": self.id},
+            UpdateExpression=(
+                "SET connection_id = :c, last_interaction = :t, expires_at = :e"
+            ),
+            ExpressionAttributeValues={
+                ":c": self.connection_id,
+                ":t": datetime.now(timezone.utc).isoformat(),
+                ":e": get_expiry_time(),
+            },
+        )
+        self._connection_saved = True
 
+    @classmethod
+    def create(cls, name: str, lobby: str, connection_id: str):
+        """
+        Add a new player to a lobby. Lobby queries are eventually consistent, so the
+        player may already exist. If they do, their record is read and returned instead,
+        with the new connection to be saved.
+        """
         player = cls(name, lobby, connection_id)
-        player.score = int(player_record.get("score"))
-        player.guessed_flights = player_record.get("guessed_flights")
-
-        # Update connection_id if it has changed
-        if player_record.get("connection_id") != connection_id:
-            PLAYER_TABLE.update_item(
-                Key={"player_id": player_id},
-                UpdateExpression="SET connection_id = :c",
-                ExpressionAttributeValues={":c": connection_id},
+        table = get_player_table()
+        try:
+            table.put_item(
+                Item={
+                    "player_id": player.id,
+                    "lobby_id": player.lobby,
+                    "player_name": player.name,
+                    "connection_id": player.connection_id,
+                    "score": player.score,
+                    "guess_count": player.guess_count,
+                    "last_interaction": datetime.now(timezone.utc).isoformat(),
+                    "expires_at": get_expiry_time(),
+                },
+                ConditionExpression="attribute_not_exists(player_id)",
             )
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            response = table.get_item(Key={"player_id": player.id}, ConsistentRead=True)
+            player = cls.from_dict(response["Item"])
+            player.set_connection(connection_id)
 
         return player
 
@@ -82,58 +107,174 @@ class Player:
         lobby = player_data.get("lobby_id")
         connection_id = player_data.get("connection_id")
         score = player_data.get("score")
-        guessed_flights = player_data.get("guessed_flights")
 
         player = cls(name, lobby, connection_id)
         player.score = int(score)
-        player.guessed_flights = guessed_flights
+
+        # Both lobby indexes project the guess history, which is bounded to two
+        # generations, so a guess can skip flights the player has already guessed
+        # without reading their record again. Older players without a guess count have
+        # it derived from their legacy list.
+        player.read_history(player_data)
 
         return player
 
-    def update(self):
-        PLAYER_TABLE.update_item(
-            Key={"player_id": self.id},
-            UpdateExpression=(
-                "SET score = :s, guessed_flights = :g, "
-                "last_interaction = :t, connection_id = :c"
-            ),
-            ExpressionAttributeValues={
-                ":s": self.score,
-                ":g": self.guessed_flights,
-                ":t": datetime.now(timezone.utc).isoformat(),
-                ":c": self.connection_id,
-            },
+    def read_history(self, player_data: dict):
+        # Guesses are stored as string sets, one per generation. Older records hold them
+        # in a list instead, which is discarded along with the previous generation.
+        legacy_flights = player_data.get("guessed_flights") or []
+        flight_set = player_data.get("guessed_flight_set") or set()
+        previous_flight_set = player_data.get("previous_flight_set") or set()
+
+        self.guessed_flights = list(legacy_flights) + sorted(
+            (flight_set | previous_flight_set) - set(legacy_flights)
+        )
+        self.guess_count = int(
+            player_data.get("guess_count", len(self.guessed_flights))
         )
+        history_started_at = player_data.get("history_started_at")
+        if history_started_at is not None:
+            self._history_started_at = float(history_started_at)
 
     @classmethod
-    def disconnect(cls, name: str, lobby: str):
+    def disconnect(cls, name: str, lobby: str, connection_id: Optional[str] = None):
+        """
+        Clear the player's connection. If `connection_id` is given then the player is
+        only disconnected if they have not since reconnected with a different one.
+        """
         player_id = Player.get_id(name, lobby)
-        PLAYER_TABLE.update_item(
-            Key={"player_id": player_id},
-            UpdateExpression="SET connection_id = :c",
-            ExpressionAttributeValues={":c": ""},
-        )
+        # The attribute is removed rather than emptied, since it is a ConnectionIndex key
+        update_args = {
+            "Key": {"player_id": player_id},
+            "UpdateExpression": "REMOVE connection_id",
+        }
+        if connection_id is not None:
+            update_args["ConditionExpression"] = "connection_id = :old"
+            update_args["ExpressionAttributeValues"] = {":old": connection_id}
+
+        table = get_player_table()
+        try:
+            table.update_item(**update_args)
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            pass  # The player has already reconnected
+
+    @classmethod
+    def disconnect_all(cls, connection_id: str):
+        """Disconnect every player who is using the given connection"""
+        from boto3.dynamodb.conditions import Key
+
+        table = get_player_table()
+        items = table.query(
+            KeyConditionExpression=Key("connection_id").eq(connection_id),
+            IndexName="ConnectionIndex",
+        ).get("Items")
+
+        for item in items:
+            Player.disconnect(item["player_name"], item["lobby_id"], connection_id)
 
     def delete(self):
-        PLAYER_TABLE.delete_item(Key={"player_id": self.id})
+        get_player_table().delete_item(Key={"player_id": self.id})
         return None
 
     def already_guessed(self, flight_id: str):
         return flight_id in self.guessed_flights
 
-    def handle_guess(self, result: GuessResult):
+    def handle_guess(self, result: GuessResult) -> bool:
+        """
+        Record a guess and add its points to the player's score, in a single conditional
+        write. Returns True if the flight had already been guessed.
+        """
+        # Only guesses import the flight lookup code, so it is not imported at cold start
+        from helpers.make_guess import BLOCKED_FLIGHT_ID
+
         f_id = result.flight.id
-        isValidId = f_id is not None and f_id != "Blocked-None-None"
+        isValidId = f_id is not None and f_id != BLOCKED_FLIGHT_ID
+
+        if not isValidId:
+            return False
+
+        points = int(result.points.origin) + int(result.points.destination)
+        now = datetime.now(timezone.utc)
+
+        table = get_player_table()
+        try:
+            response = table.update_item(
+                Key={"player_id": self.id},
+                UpdateExpression=(
+                    "ADD score :p, guessed_flight_set :f "
+                    "SET guess_count = if_not_exists(guess_count, :n) + :one, "
+                    "history_started_at = if_not_exists(history_started_at, :now), "
+                    "last_interaction = :t, expires_at = :e, connection_id = :c"
+                ),
+                ConditionExpression=(
+                    "NOT contains(guessed_flight_set, :id) "
+                    "AND NOT contains(previous_flight_set, :id) "
+                    "AND NOT contains(guessed_flights, :id)"
+                ),
+                ExpressionAttributeValues={
+                    ":p": points,
+                    ":f": {f_id},
+                    ":id": f_id,
+                    ":n": self.guess_count,
+                    ":one": 1,
+                    ":now": int(now.timestamp()),
+                    ":t": now.isoformat(),
+                    ":e": get_expiry_time(),
+                    ":c": self.connection_id,
+                },
+                ReturnValues="UPDATED_NEW",
+            )
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            if not self.already_guessed(f_id):
+                self.guessed_flights.append(f_id)
+            return True
+
+        attributes = response["Attributes"]
+        self._connection_saved = True
+        self.score = int(attributes["score"])
+        self.guess_count = int(attributes["guess_count"])
+        # The attribute is only returned if this write was the one which set it
+        if "history_started_at" in attributes or self._history_started_at is None:
+            self._history_started_at = float(
+                attributes.get("history_started_at", now.timestamp())
+            )
+        if not self.already_guessed(f_id):
+            self.guessed_flights.append(f_id)
+
+        if now.timestamp() - self._history_started_at >= GUESS_HISTORY_TTL_S:
+            self.rotate_history()
+
+        return False
+
+    def rotate_history(self):
+        """
+        Start a new generation of the guess history. The current generation becomes the
+        previous one, and the previous generation and any legacy list are discarded.
+        """
+        table = get_player_table()
+        try:
+            # Skip rotation if another guess has been made since this one was recorded
+            table.update_item(
+                Key={"player_id": self.id},
+                UpdateExpression=(
+                    "SET previous_flight_set = guessed_flight_set, "
+                    "history_started_at = :now "
+                    "REMOVE guessed_flight_set, guessed_flights"
+                ),
+                ConditionExpression="guess_count = :n",
+                ExpressionAttributeValues={
+                    ":now": int(datetime.now(timezone.utc).timestamp()),
+                    ":n": self.guess_count,
+                },
+            )
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            return
 
-        if isValidId and not self.already_guessed(result.flight.id):
-            self.score += int(result.points.origin)
-            self.score += int(result.points.destination)
-            self.guessed_flights.append(result.flight.id)
-            self.update()
+        self._history_started_at = None
 
     def to_dict(self):
         return {
             "player_name": self.name,
             "score": self.score,
-            "guess_count": len(self.guessed_flights),
+            "guess_count": self.guess_count,
         }
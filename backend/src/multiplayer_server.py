@@ -5,20 +5,21 @@ WebSocket API for handling multiplayer requests
 import os
 import json
 import traceback
-from dataclasses import asdict
+from concurrent.futures import ThreadPoolExecutor
 from helpers.data_types import GameRules
-from helpers.make_guess import make_guess
+from helpers.serialization import shallow_asdict, to_json_bytes
 from helpers.utils import HandledException, read_position
 from multiplayer_helpers.player_type import Player
-from multiplayer_helpers.lobby_type import Lobby
-import boto3
+from multiplayer_helpers.lobby_type import Lobby, LobbySnapshot
 
 
 MULTIPLAYER_ENDPOINT = os.getenv("MULTIPLAYER_ENDPOINT").replace("wss", "https", 1)
-API_CLIENT = boto3.client(
-    "apigatewaymanagementapi",
-    endpoint_url=MULTIPLAYER_ENDPOINT,
-)
+
+BROADCAST_MAX_WORKERS = 16
+
+# Created by the first request which sends a message, as $connect, $disconnect and
+# ping never do. See multiplayer_helpers/db.py for the DynamoDB equivalent.
+_api_client = None
 
 
 def lambda_handler(event, context):
@@ -29,7 +30,7 @@ def lambda_handler(event, context):
         return {"statusCode": 200}
 
     if route_key == "$disconnect":
-        return {"statusCode": 200}
+        return disconnect(connection_id)
 
     if route_key == "ping":
         return {"statusCode": 200}
@@ -45,6 +46,9 @@ def lambda_handler(event, context):
     if route_key == "handle_guess":
         return handle_guess(connection_id, input_body)
 
+    if route_key == "get_lobby":
+        return get_lobby(connection_id, input_body)
+
     return {"statusCode": 400, "message": "Unsupported route"}
 
 
@@ -60,17 +64,20 @@ def create_lobby(connection_id, input_body):
         lobby = Lobby.create(rules)
         player = Player.create(player_name, lobby.id, connection_id)
 
-        player_data = list(map(lambda p: p.to_dict(), lobby.get_players()))
+        # The new lobby can only contain its creator, so there is no need to query it
+        snapshot = lobby.snapshot(players=[player])
+        player_data = snapshot.to_dict()
 
         post_to_connection(
             connection_id,
             {
                 "event": "lobby_joined",
                 "lobby": lobby.id,
-                "rules": asdict(lobby.rules),
+                "rules": shallow_asdict(lobby.rules),
                 "players": player_data,
                 "player_name": player.name,
                 "score": player.score,
+                "seq": lobby.sequence,
             },
         )
 
@@ -99,39 +106,36 @@ def join_lobby(connection_id, input_body):
         player_name = sanitize_player_name(input_body.get("player_name"))
         lobby_id = input_body.get("lobby_id")
 
-        lobby = Lobby.read(lobby_id)
+        snapshot = LobbySnapshot.load(lobby_id)
+        if snapshot is None:
+            raise HandledException("Lobby does not exist", 404)
+        lobby = snapshot.lobby
 
-        player = Player.from_db(player_name, lobby.id, connection_id)
+        player = snapshot.get_player(player_name, connection_id)
         if player is None:
             player = Player.create(player_name, lobby.id, connection_id)
+            snapshot.add_player(player)
 
-        player_data = list(map(lambda p: p.to_dict(), lobby.get_players()))
+        snapshot.save()
 
+        # The player list is as of the sequence read before it was queried. Changes
+        # made since then, including this join, follow as deltas. The joining player
+        # receives these too, so that they request the full list if they missed any.
         post_to_connection(
             connection_id,
             {
                 "event": "lobby_joined",
                 "lobby": lobby.id,
-                "rules": asdict(lobby.rules),
-                "players": player_data,
+                "rules": shallow_asdict(lobby.rules),
+                "players": snapshot.to_dict(),
                 "player_name": player.name,
                 "score": player.score,
+                "seq": lobby.sequence,
             },
         )
 
-        lobby_players = lobby.get_players()
-        lobby_data = {
-            "event": "lobby_update",
-            "players": list(map(lambda p: p.to_dict(), lobby_players)),
-        }
-
-        for lobby_player in lobby_players:
-            try:
-                post_to_connection(lobby_player.connection_id, lobby_data)
-            except Exception as e:
-                print(
-                    f"[WARNING] Failed to send to connection {lobby_player.connection_id}: {e}"
-                )
+        seq = lobby.next_sequence()
+        broadcast(snapshot.players, get_lobby_delta(seq, player))
 
     except HandledException as exc:
         post_to_connection(
@@ -158,11 +162,12 @@ def handle_guess(connection_id, input_body):
         lobby_id = input_body.get("lobby_id")
         player_name = input_body.get("player_name")
 
-        lobby = Lobby.read(lobby_id)
-        if lobby is None:
+        snapshot = LobbySnapshot.load(lobby_id)
+        if snapshot is None:
             raise HandledException("Lobby does not exist", 404)
+        lobby = snapshot.lobby
 
-        player = Player.from_db(player_name, lobby_id, connection_id)
+        player = snapshot.get_player(player_name, connection_id)
         if player is None:
             raise HandledException("Player does not exist", 404)
 
@@ -188,14 +193,21 @@ def handle_guess(connection_id, input_body):
                 allow_missing=False,
             )
 
+        # The flight lookup code is only needed by this route
+        from helpers.make_guess import make_guess
+
         guess_result = make_guess(
             player_position,
             origin_guess_pos,
             destination_guess_pos,
             lobby.rules,
+            full_details=bool(input_body.get("full_details")),
+            guessed_flights=player.guessed_flights,
         )
 
-        already_guessed = player.already_guessed(guess_result.flight.id)
+        already_guessed = player.handle_guess(guess_result)
+        snapshot.save()
+
         points_available = (
             lobby.rules.use_origin and guess_result.flight.origin is not None
         ) or (
@@ -208,39 +220,22 @@ def handle_guess(connection_id, input_body):
         elif not points_available:
             status = "PointsUnavailable"
 
-        player.handle_guess(guess_result)
-
-        # Since we just updated the guessing player's data, we will instead use this
-        # session's data to avoid any race-conditions.
-        lobby_players = lobby.get_players()
-        for lobby_player in lobby_players:
-            if lobby_player.name == player.name:
-                lobby_player = player
-                break
-
-        lobby_data = {
-            "event": "lobby_update",
-            "players": list(map(lambda p: p.to_dict(), lobby_players)),
-        }
-
-        for lobby_player in lobby_players:
-            try:
-                post_to_connection(lobby_player.connection_id, lobby_data)
-            except Exception as e:
-                print(
-                    f"[WARNING] Failed to send to connection {lobby_player.connection_id}: {e}"
-                )
-
+        # Send the guessing player their result before updating the rest of the lobby
         post_to_connection(
             connection_id,
             {
                 "event": "flight_details",
                 "status": status,
                 "score": player.score,
-                **asdict(guess_result),
+                **shallow_asdict(guess_result),
             },
         )
 
+        # Other players are only sent the guessing player's new score
+        if not already_guessed:
+            seq = lobby.next_sequence()
+            broadcast(snapshot.players, get_lobby_delta(seq, player))
+
     except HandledException as exc:
         post_to_connection(
             connection_id,
@@ -261,6 +256,60 @@ def handle_guess(connection_id, input_body):
     return {"statusCode": 200}
 
 
+def disconnect(connection_id):
+    try:
+        Player.disconnect_all(connection_id)
+    except Exception as exc:
+        print(f"[ERROR] {str(exc)}")
+        print(traceback.format_exc())
+
+    return {"statusCode": 200}
+
+
+def get_lobby(connection_id, input_body):
+    """Send the full list of players, for clients which have missed a lobby_delta"""
+    try:
+        snapshot = LobbySnapshot.load(input_body.get("lobby_id"))
+        if snapshot is None:
+            raise HandledException("Lobby does not exist", 404)
+
+        post_to_connection(
+            connection_id,
+            {
+                "event": "lobby_update",
+                "players": snapshot.to_dict(),
+                "seq": snapshot.lobby.sequence,
+            },
+        )
+
+    except HandledException as exc:
+        post_to_connection(
+            connection_id,
+            exc.to_ws_response("lobby_error"),
+        )
+
+    except Exception as exc:
+        print(f"[ERROR] {str(exc)}")
+        print(traceback.format_exc())
+        post_to_connection(
+            connection_id,
+            {
+                "event": "lobby_error",
+                "message": "The server was unable to process your request",
+            },
+        )
+
+    return {"statusCode": 200}
+
+
+def get_lobby_delta(seq: int, player: Player):
+    return {
+        "event": "lobby_delta",
+        "seq": seq,
+        "player": player.to_dict(),
+    }
+
+
 def sanitize_player_name(name: str) -> str:
     name = name.strip()
 
@@ -273,8 +322,68 @@ def sanitize_player_name(name: str) -> str:
     return name
 
 
+def get_api_client():
+    global _api_client
+
+    if _api_client is None:
+        import boto3
+
+        _api_client = boto3.client(
+            "apigatewaymanagementapi",
+            endpoint_url=MULTIPLAYER_ENDPOINT,
+        )
+
+    return _api_client
+
+
 def post_to_connection(connection_id, body):
-    API_CLIENT.post_to_connection(
+    get_api_client().post_to_connection(
         ConnectionId=connection_id,
-        Data=json.dumps(body).encode("utf-8"),
+        Data=to_json_bytes(body),
     )
+
+
+def broadcast(players: list[Player], body):
+    """
+    Send a message to every connected player concurrently. Players whose connection
+    has gone are marked as disconnected, so that later broadcasts skip them.
+    """
+    data = to_json_bytes(body)
+    connected_players = [p for p in players if p.connection_id]
+    if len(connected_players) == 0:
+        return
+
+    # Creating a boto3 client is not thread-safe, so it must exist before the threads do
+    api_client = get_api_client()
+    max_workers = min(len(connected_players), BROADCAST_MAX_WORKERS)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        is_gone = list(
+            executor.map(
+                lambda p: send_to_player(api_client, p, data), connected_players
+            )
+        )
+
+    # DynamoDB resources are not thread-safe, so gone players are disconnected here
+    for player, gone in zip(connected_players, is_gone):
+        if not gone:
+            continue
+
+        print(f"[INFO] Connection {player.connection_id} has gone, disconnecting")
+        try:
+            Player.disconnect(player.name, player.lobby, player.connection_id)
+        except Exception as e:
+            print(f"[WARNING] Failed to disconnect player {player.id}: {e}")
+
+
+def send_to_player(api_client, player: Player, data: bytes) -> bool:
+    """Send a message to a player, returning whether their connection has gone"""
+    try:
+        api_client.post_to_connection(ConnectionId=player.connection_id, Data=data)
+
+    except api_client.exceptions.GoneException:
+        return True
+
+    except Exception as e:
+        print(f"[WARNING] Failed to send to connection {player.connection_id}: {e}")
+
+    return False
@@ -4,8 +4,8 @@ HTTP API for handling singleplayer requests
 
 import traceback
 import json
-from dataclasses import asdict
 from helpers.make_guess import make_guess
+from helpers.serialization import to_json
 from helpers.utils import HandledException, read_position, read_rules
 
 
@@ -34,11 +34,12 @@ def lambda_handler(event, context):
             origin_guess_pos,
             destination_guess_pos,
             rules,
+            full_details=bool(input_body.get("full_details")),
         )
 
         return {
             "statusCode": 200,
-            "body": json.dumps(asdict(guess_result)),
+            "body": to_json(guess_result),
             "headers": {
                 "Content-Type": "application/json",
                 "Access-Control-Allow-Origin": "*",
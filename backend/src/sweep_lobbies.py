@@ -0,0 +1,160 @@
+"""
+Service for periodically removing idle lobbies along with their players
+"""
+
+import os
+import time
+from datetime import datetime
+from boto3.dynamodb.conditions import Attr, Key
+from multiplayer_helpers.db import (
+    get_lobby_table,
+    get_player_table,
+    get_expiry_day,
+    get_expiry_time,
+    query_lobby_index,
+    IDLE_EXPIRY_S,
+    LOBBY_EXPIRY_INDEX_NAME,
+)
+
+# DynamoDB's TTL deletes expired items itself, usually within a couple of days. Lobbies
+# which expired before this many days ago are left to it.
+SWEEP_LOOKBACK_DAYS = int(os.getenv("SWEEP_LOOKBACK_DAYS", "2"))
+
+
+def lambda_handler(event, context):
+    # Invoked once by hand with {"backfill": true} after deploying the expiry index
+    if event.get("backfill"):
+        return backfill_expiry()
+
+    # TTL deletes lobbies and players some time after they expire, and separately from
+    # each other. This deletes each expired lobby as soon as it is found, together with
+    # every one of its players, including any whose own expiry has not passed yet.
+    # Players who expire in a lobby which is still active are left to TTL.
+    now = int(time.time())
+    lobby_table = get_lobby_table()
+    player_table = get_player_table()
+
+    expired_lobbies = query_expired_lobbies(now)
+    player_ids = [
+        player_id
+        for lobby_id in expired_lobbies
+        for player_id in get_player_ids(lobby_id)
+    ]
+
+    with player_table.batch_writer() as batch:
+        for player_id in player_ids:
+            batch.delete_item(Key={"player_id": player_id})
+
+    with lobby_table.batch_writer() as batch:
+        for lobby_id in expired_lobbies:
+            batch.delete_item(Key={"lobby_id": lobby_id})
+
+    return {
+        "statusCode": 200,
+        "body": f"Removed {len(expired_lobbies)} lobbies and {len(player_ids)} players",
+    }
+
+
+def query_expired_lobbies(now: int) -> list:
+    """List the lobbies whose `expires_at` time passed in the last few days"""
+    table = get_lobby_table()
+    today = get_expiry_day(now)
+    lobby_ids = []
+
+    for day in range(today - SWEEP_LOOKBACK_DAYS, today + 1):
+        key_condition = Key("expiry_day").eq(day) & Key("expires_at").lt(now)
+        query_args = {
+            "IndexName": LOBBY_EXPIRY_INDEX_NAME,
+            "KeyConditionExpression": key_condition,
+            "ProjectionExpression": "lobby_id",
+        }
+
+        while True:
+            response = table.query(**query_args)
+            lobby_ids.extend(item["lobby_id"] for item in response.get("Items", []))
+
+            if "LastEvaluatedKey" not in response:
+                break
+            query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    return lobby_ids
+
+
+def get_player_ids(lobby_id: str) -> list:
+    player_ids = []
+    query_args = {
+        "KeyConditionExpression": Key("lobby_id").eq(lobby_id),
+        "ProjectionExpression": "player_id",
+    }
+
+    while True:
+        response = query_lobby_index(**query_args)
+        player_ids.extend(item["player_id"] for item in response.get("Items", []))
+
+        if "LastEvaluatedKey" not in response:
+            return player_ids
+        query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def backfill_expiry() -> dict:
+    """
+    Give lobbies and players written before they were tracked the attributes which
+    expire them, based on their last interaction. This scans both tables, so it is only
+    run once rather than on every sweep.
+    """
+    lobby_count = backfill_table(
+        get_lobby_table(), "lobby_id", Attr("expiry_day").not_exists(), True
+    )
+    player_count = backfill_table(
+        get_player_table(), "player_id", Attr("expires_at").not_exists(), False
+    )
+
+    return {
+        "statusCode": 200,
+        "body": f"Backfilled {lobby_count} lobbies and {player_count} players",
+    }
+
+
+def backfill_table(table, key_name: str, filter_expression, set_day: bool) -> int:
+    count = 0
+    scan_args = {
+        "FilterExpression": filter_expression,
+        "ProjectionExpression": f"{key_name}, expires_at, last_interaction",
+    }
+
+    while True:
+        response = table.scan(**scan_args)
+        for item in response.get("Items", []):
+            expires_at = get_backfilled_expiry_time(item)
+            update = "SET expires_at = :e"
+            values = {":e": expires_at}
+            if set_day:
+                update += ", expiry_day = :d"
+                values[":d"] = get_expiry_day(expires_at)
+
+            try:
+                # The condition stops items deleted since the scan being recreated
+                table.update_item(
+                    Key={key_name: item[key_name]},
+                    UpdateExpression=update,
+                    ConditionExpression=Attr(key_name).exists(),
+                    ExpressionAttributeValues=values,
+                )
+                count += 1
+            except table.meta.client.exceptions.ConditionalCheckFailedException:
+                pass
+
+        if "LastEvaluatedKey" not in response:
+            return count
+        scan_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def get_backfilled_expiry_time(item: dict) -> int:
+    if "expires_at" in item:
+        return int(item["expires_at"])
+
+    last_interaction = item.get("last_interaction")
+    if last_interaction is None:
+        return get_expiry_time()
+
+    return int(datetime.fromisoformat(last_interaction).timestamp()) + IDLE_EXPIRY_S
@@ -3,12 +3,22 @@ Service for automatically updating the airport data periodically
 """
 
 import os
+import gzip
 import json
-import boto3
 from helpers.fr24_api import get_all_airports
 
 BUCKET_NAME = os.getenv("BUCKET_NAME")
-s3_client = boto3.client("s3")
+
+# The original format, which is still published for older clients and the backend
+AIRPORTS_KEY = "airports.json"
+
+# A smaller format for the frontend, with one array per field. Coordinates are stored
+# as integers in units of 1/COORDINATE_SCALE degrees, which is accurate to about 10 m.
+COMPACT_AIRPORTS_KEY = "airports-compact.json"
+COORDINATE_SCALE = 10_000
+
+# Only created once the airports have been fetched and validated
+_s3_client = None
 
 
 def lambda_handler(event, context):
@@ -16,16 +26,42 @@ def lambda_handler(event, context):
     validate_api_response(data)
     airports = format_airport_data(data)
 
+    s3_client = get_s3_client()
     s3_client.put_object(
         Bucket=BUCKET_NAME,
-        Key="airports.json",
+        Key=AIRPORTS_KEY,
         Body=json.dumps(airports),
         ContentType="application/json",
     )
 
+    # Stored already compressed, and served with a Content-Encoding header so that
+    # browsers decompress it themselves
+    compact_airports = format_compact_airport_data(data)
+    s3_client.put_object(
+        Bucket=BUCKET_NAME,
+        Key=COMPACT_AIRPORTS_KEY,
+        Body=gzip.compress(
+            json.dumps(compact_airports, separators=(",", ":")).encode("utf-8"),
+            compresslevel=9,
+        ),
+        ContentType="application/json",
+        ContentEncoding="gzip",
+    )
+
     return {"statusCode": 200, "body": "Airports were updated successfully"}
 
 
+def get_s3_client():
+    global _s3_client
+
+    if _s3_client is None:
+        import boto3
+
+        _s3_client = boto3.client("s3")
+
+    return _s3_client
+
+
 def format_airport_data(data: list) -> list:
     return [
         {
@@ -43,6 +79,18 @@ def format_airport_data(data: list) -> list:
     ]
 
 
+def format_compact_airport_data(data: list) -> dict:
+    return {
+        "scale": COORDINATE_SCALE,
+        "name": [airport["name"] for airport in data],
+        "iata": [airport["iata"] for airport in data],
+        "icao": [airport["icao"] for airport in data],
+        "country": [airport["country"] for airport in data],
+        "lat": [round(airport["lat"] * COORDINATE_SCALE) for airport in data],
+        "lon": [round(airport["lon"] * COORDINATE_SCALE) for airport in data],
+    }
+
+
 def validate_api_response(data: list):
     if not isinstance(data, list):
         raise ValueError("API response is not a list.")
@@ -0,0 +1,73 @@
+"""
+Service for keeping the most requested feed tiles fresh in the shared cache
+"""
+
+import os
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from helpers.shared_cache import get_shared_cache
+from helpers.fr24_api import (
+    fetch_tile_flights,
+    parse_tile_key,
+    SHARED_TILE_FRESH_S,
+    SHARED_TILE_STALE_S,
+    TILE_KEY_PREFIX,
+)
+
+# Only tiles requested within this window are warmed
+WARM_WINDOW_S = float(os.getenv("WARM_WINDOW", "600"))
+WARM_MAX_TILES = int(os.getenv("WARM_MAX_TILES", "20"))
+
+# Tiles are fetched concurrently, within the FR24 rate limit in fr24_api
+WARM_CONCURRENCY = int(os.getenv("WARM_CONCURRENCY", "5"))
+
+# The warmer is invoked once a minute by EventBridge (see terraform/eventbridge.tf),
+# which cannot schedule it more often. Tiles are only fresh for SHARED_TILE_FRESH_S,
+# so each invocation warms them once per freshness window until the next one starts.
+WARM_SCHEDULE_INTERVAL_S = float(os.getenv("WARM_SCHEDULE_INTERVAL", "60"))
+WARM_PASS_INTERVAL_S = SHARED_TILE_FRESH_S
+WARM_PASSES = math.ceil(WARM_SCHEDULE_INTERVAL_S / WARM_PASS_INTERVAL_S)
+
+
+def lambda_handler(event, context):
+    shared_cache = get_shared_cache()
+    if shared_cache is None:
+        raise ValueError("SHARED_CACHE_TABLE_NAME is not set")
+
+    tile_keys = shared_cache.store.get_popular_keys(
+        TILE_KEY_PREFIX,
+        since=time.time() - WARM_WINDOW_S,
+        limit=WARM_MAX_TILES,
+    )
+
+    def warm_tile(key: str) -> bool:
+        try:
+            tile_flights = fetch_tile_flights(parse_tile_key(key))
+        except Exception as e:
+            print(f"[WARNING] Failed to warm {key}: {e}")
+            return False
+
+        shared_cache.set(key, tile_flights, SHARED_TILE_FRESH_S, SHARED_TILE_STALE_S)
+        return True
+
+    started = time.monotonic()
+    failures = 0
+    with ThreadPoolExecutor(max_workers=WARM_CONCURRENCY) as executor:
+        for i in range(WARM_PASSES):
+            # Passes are scheduled from the start of the invocation, so that a slow
+            # pass does not push the later ones past the tiles' freshness
+            delay_s = started + i * WARM_PASS_INTERVAL_S - time.monotonic()
+            if delay_s > 0:
+                time.sleep(delay_s)
+
+            results = list(executor.map(warm_tile, tile_keys))
+            failures += results.count(False)
+
+    return {
+        "statusCode": 200,
+        "body": (
+            f"Warmed {len(tile_keys)} tiles {WARM_PASSES} times "
+            f"with {failures} failures"
+        ),
+    }
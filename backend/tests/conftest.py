@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import threading
+from typing import Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+# The handlers read their configuration when they are imported, so it is set up before
+# any of them are
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-2")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("MULTIPLAYER_ENDPOINT", "wss://multiplayer.example.com/test")
+os.environ.setdefault("LOBBY_TABLE_NAME", "lobby-table")
+os.environ.setdefault("PLAYER_TABLE_NAME", "player-table")
+os.environ.setdefault("BUCKET_NAME", "host-bucket")
+os.environ.setdefault("AIRPORTS_ENDPOINT", "http://127.0.0.1:9/airports.json")
+# Snapshots are only recorded by the tests which enable them
+os.environ.setdefault("SNAPSHOT_DIR", "")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # Clients which time out close their connection part way through
+
+
+class StubServer:
+    """
+    A local HTTP server for testing clients against. Each test sets `respond` to a
+    function taking the request path and returning a (status, body, headers) tuple.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.connections = set()
+        self.drop_connections = False
+        self.respond = lambda path: (200, b"{}", {})
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.requests.append((self.path, dict(self.headers)))
+                stub.connections.add(self.client_address)
+
+                status, body, headers = stub.respond(self.path)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+                # Closed without a Connection: close header, as an idle server would
+                if stub.drop_connections:
+                    self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        self._server = QuietHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def url(self, path: str = "/") -> str:
+        return f"http://127.0.0.1:{self._server.server_port}{path}"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    yield server
+    server.close()
+
+
+def create_lobby_tables(ddb, lobby_indexes=("LobbyPlayersIndex", "LobbyIndex")):
+    """
+    Create the lobby and player tables as they are defined in terraform. Environments
+    which have not been migrated yet can be set up with fewer lobby indexes.
+    """
+    projections = {
+        "LobbyPlayersIndex": {
+            "ProjectionType": "INCLUDE",
+            "NonKeyAttributes": [
+                "score",
+                "guess_count",
+                "connection_id",
+                "guessed_flights",
+                "guessed_flight_set",
+                "previous_flight_set",
+                "history_started_at",
+            ],
+        },
+        "LobbyIndex": {"ProjectionType": "ALL"},
+    }
+    ddb.create_table(
+        TableName=os.environ["LOBBY_TABLE_NAME"],
+        BillingMode="PAY_PER_REQUEST",
+        AttributeDefinitions=[
+            {"AttributeName": "lobby_id", "AttributeType": "S"},
+            {"AttributeName": "expiry_day", "AttributeType": "N"},
+            {"AttributeName": "expires_at", "AttributeType": "N"},
+        ],
+        KeySchema=[{"AttributeName": "lobby_id", "KeyType": "HASH"}],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "LobbyExpiryIndex",
+                "KeySchema": [
+                    {"AttributeName": "expiry_day", "KeyType": "HASH"},
+                    {"AttributeName": "expires_at", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "KEYS_ONLY"},
+            },
+        ],
+    )
+    ddb.create_table(
+        TableName=os.environ["PLAYER_TABLE_NAME"],
+        BillingMode="PAY_PER_REQUEST",
+        AttributeDefinitions=[
+            {"AttributeName": name, "AttributeType": "S"}
+            for name in ("player_id", "player_name", "lobby_id", "connection_id")
+        ],
+        KeySchema=[{"AttributeName": "player_id", "KeyType": "HASH"}],
+        GlobalSecondaryIndexes=[
+            *(
+                {
+                    "IndexName": index_name,
+                    "KeySchema": [
+                        {"AttributeName": "lobby_id", "KeyType": "HASH"},
+                        {"AttributeName": "player_name", "KeyType": "RANGE"},
+                    ],
+                    "Projection": projections[index_name],
+                }
+                for index_name in lobby_indexes
+            ),
+            {
+                "IndexName": "ConnectionIndex",
+                "KeySchema": [{"AttributeName": "connection_id", "KeyType": "HASH"}],
+                "Projection": {
+                    "ProjectionType": "INCLUDE",
+                    "NonKeyAttributes": ["player_name", "lobby_id"],
+                },
+            },
+        ],
+    )
+
+
+@pytest.fixture
+def lobby_indexes():
+    return ("LobbyPlayersIndex", "LobbyIndex")
+
+
+@pytest.fixture
+def lobby_tables(lobby_indexes):
+    """Mocked lobby and player tables, with the cached DynamoDB resource reset"""
+    moto = pytest.importorskip("moto")
+    import boto3
+    from multiplayer_helpers import db
+
+    with moto.mock_aws():
+        create_lobby_tables(boto3.client("dynamodb"), lobby_indexes)
+        db._ddb_resource = None
+        db._tables.clear()
+        yield db
+        db._ddb_resource = None
+        db._tables.clear()
+
+
+class FakeApiClient:
+    """Records the messages sent to each WebSocket connection"""
+
+    class exceptions:
+        class GoneException(Exception):
+            pass
+
+    def __init__(self):
+        self.sent = []
+        self.gone = set()
+
+    def post_to_connection(self, ConnectionId, Data):
+        if ConnectionId in self.gone:
+            raise FakeApiClient.exceptions.GoneException()
+        self.sent.append((ConnectionId, json.loads(Data)))
+
+    def messages(self, connection_id: str) -> list:
+        return [body for sent_to, body in self.sent if sent_to == connection_id]
+
+
+class MultiplayerClient:
+    """Sends WebSocket events to the multiplayer handler"""
+
+    def __init__(self, server, api_client: FakeApiClient):
+        self._server = server
+        self.api_client = api_client
+
+    def send(self, route_key: str, connection_id: str, body: Optional[dict] = None):
+        return self._server.lambda_handler(
+            {
+                "requestContext": {
+                    "connectionId": connection_id,
+                    "routeKey": route_key,
+                },
+                "body": None if body is None else json.dumps(body),
+            },
+            None,
+        )
+
+    def messages(self, connection_id: str) -> list:
+        return self.api_client.messages(connection_id)
+
+
+@pytest.fixture
+def multiplayer(lobby_tables, monkeypatch):
+    import multiplayer_server
+
+    api_client = FakeApiClient()
+    monkeypatch.setattr(multiplayer_server, "_api_client", api_client)
+    return MultiplayerClient(multiplayer_server, api_client)
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+import pytest
+from helpers import cache
+from helpers.cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A monotonic clock for the cache which only moves when the test advances it"""
+
+    class Clock:
+        now = 1000.0
+
+        def advance(self, seconds: float):
+            self.now += seconds
+
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_entries_expire_after_the_ttl(clock):
+    ttl_cache = TTLCache(max_size=10, ttl_s=60)
+    ttl_cache.set("a", 1)
+
+    clock.advance(59.9)
+    assert ttl_cache.get("a") == 1
+
+    clock.advance(0.1)
+    assert ttl_cache.get("a") is None
+    assert len(ttl_cache) == 0
+
+
+def test_shorter_ttls_are_kept_but_not_longer_ones(clock):
+    ttl_cache = TTLCache(max_size=10, ttl_s=60)
+    ttl_cache.set("short", 1, ttl_s=10)
+    ttl_cache.set("long", 2, ttl_s=600)
+
+    clock.advance(10)
+    assert ttl_cache.get("short") is None
+    assert ttl_cache.get("long") == 2
+
+    clock.advance(50)
+    assert ttl_cache.get("long") is None
+
+
+def test_evicts_the_least_recently_used_entry(clock):
+    ttl_cache = TTLCache(max_size=3, ttl_s=60)
+    for key in ("a", "b", "c"):
+        ttl_cache.set(key, key)
+
+    # Reading "a" makes "b" the least recently used
+    assert ttl_cache.get("a") == "a"
+    ttl_cache.set("d", "d")
+
+    assert len(ttl_cache) == 3
+    assert ttl_cache.get("b") is None
+    assert [ttl_cache.get(key) for key in ("a", "c", "d")] == ["a", "c", "d"]
+
+
+def test_setting_a_key_again_refreshes_it(clock):
+    ttl_cache = TTLCache(max_size=2, ttl_s=60)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+
+    clock.advance(30)
+    ttl_cache.set("a", 3)
+    ttl_cache.set("c", 4)
+
+    assert ttl_cache.get("b") is None
+    clock.advance(45)
+    assert ttl_cache.get("a") == 3
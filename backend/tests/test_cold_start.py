@@ -0,0 +1,52 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), "..", "src")
+
+
+def run_in_new_interpreter(code: str) -> str:
+    """Run `code` where no module has been imported yet, as on a cold start"""
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=SRC_DIR,
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip()
+
+
+@pytest.mark.parametrize("module", ["multiplayer_server", "update_airports"])
+def test_importing_the_handler_does_not_import_boto3(module):
+    output = run_in_new_interpreter(
+        f"import sys, {module}; print('boto3' in sys.modules)"
+    )
+
+    assert output == "False"
+
+
+def test_connect_and_ping_do_not_import_boto3():
+    events = [
+        {"requestContext": {"connectionId": "abc", "routeKey": route_key}}
+        for route_key in ("$connect", "ping")
+    ]
+    output = run_in_new_interpreter(
+        "import sys, json, multiplayer_server\n"
+        f"for event in json.loads({json.dumps(json.dumps(events))}):\n"
+        "    assert multiplayer_server.lambda_handler(event, None)['statusCode'] == 200\n"
+        "print('boto3' in sys.modules)"
+    )
+
+    assert output == "False"
+
+
+def test_tables_share_one_resource(lobby_tables):
+    lobby_table = lobby_tables.get_lobby_table()
+    player_table = lobby_tables.get_player_table()
+
+    assert lobby_tables.get_lobby_table() is lobby_table
+    assert lobby_table.meta.client is player_table.meta.client
@@ -0,0 +1,139 @@
+import json
+from dataclasses import FrozenInstanceError, asdict
+import pytest
+from benchmarks.data_types_memory import make_airport_index, make_feed
+from benchmarks.serialization import make_guess_result
+from helpers import make_guess
+from helpers.data_types import (
+    AirportGuess,
+    AirportInfo,
+    Flight,
+    GameRules,
+    GuessResult,
+    Points,
+    Position,
+)
+
+
+@pytest.fixture
+def guess_result() -> GuessResult:
+    return make_guess_result()
+
+
+@pytest.fixture
+def flight_cache():
+    make_guess.FLIGHT_CACHE.clear()
+    yield make_guess.FLIGHT_CACHE
+    make_guess.FLIGHT_CACHE.clear()
+
+
+def test_instances_have_no_dict(guess_result):
+    flight = guess_result.flight
+    instances = [
+        guess_result,
+        guess_result.points,
+        flight,
+        flight.origin,
+        flight.position,
+        GameRules(use_origin=True, use_destination=True),
+        AirportGuess(position=flight.position, enabled=True),
+    ]
+
+    for instance in instances:
+        assert not hasattr(instance, "__dict__"), type(instance).__name__
+
+
+@pytest.mark.parametrize(
+    "instance, field",
+    [
+        (Position(lat=1.0, lon=2.0), "lat"),
+        (Points(origin=1, destination=2, total=3), "total"),
+        (GameRules(use_origin=True, use_destination=False), "use_origin"),
+        (AirportGuess(position=Position(lat=1.0, lon=2.0), enabled=True), "enabled"),
+    ],
+)
+def test_shared_types_are_frozen(instance, field):
+    with pytest.raises(FrozenInstanceError):
+        setattr(instance, field, None)
+
+
+def test_flights_can_be_updated(guess_result):
+    flight = guess_result.flight
+
+    flight.image_src = None
+    flight.position = Position(lat=0.0, lon=0.0)
+
+    assert flight.position == Position(lat=0.0, lon=0.0)
+    with pytest.raises(FrozenInstanceError):
+        guess_result.flight = flight
+
+
+def test_json_shape_is_unchanged(guess_result):
+    body = json.loads(json.dumps(asdict(guess_result)))
+
+    assert list(body) == ["points", "flight", "approximate"]
+    assert list(body["points"]) == ["origin", "destination", "total"]
+    assert list(body["flight"]) == [
+        "id",
+        "flight_number",
+        "callsign",
+        "airline",
+        "aircraft_type",
+        "aircraft_registration",
+        "image_src",
+        "origin",
+        "destination",
+        "position",
+    ]
+    assert list(body["flight"]["origin"]) == [
+        "name",
+        "city",
+        "iata",
+        "icao",
+        "position",
+    ]
+    assert body["flight"]["position"] == {"lat": 51.52, "lon": -1.12}
+
+
+def test_coordinate_functions_match_the_position_ones():
+    feed = make_feed(count=200)
+    airports = make_airport_index(AirportInfo, Position)
+    guess = Position(lat=51.47, lon=-0.45)
+
+    for row in (row for row in feed.values() if isinstance(row, list)):
+        position = Position(lat=row[1], lon=row[2])
+        assert make_guess.haversine_coords(
+            guess.lat, guess.lon, row[1], row[2]
+        ) == make_guess.haversine(guess, position)
+        assert make_guess.calculate_points_coords(
+            guess.lat, guess.lon, row[1], row[2]
+        ) == make_guess.calculate_points(guess, position)
+
+    lhr = airports["LHR"].position
+    assert make_guess.calculate_points(lhr, lhr) == 100
+
+
+def test_get_flight_copies_the_cached_flight(flight_cache, guess_result):
+    cached = guess_result.flight
+    flight_cache.set(cached.id, cached)
+
+    flight = make_guess.get_flight(cached.id)
+    flight.position = Position(lat=0.0, lon=0.0)
+
+    assert flight is not cached
+    assert flight.origin is cached.origin
+    assert cached.position == Position(lat=51.52, lon=-1.12)
+
+
+def test_reads_feed_rows_into_data_types(monkeypatch):
+    airports = make_airport_index(AirportInfo, Position)
+    monkeypatch.setattr(make_guess, "get_airport", airports.get)
+    key, row = next(
+        (key, row) for key, row in make_feed(count=1).items() if isinstance(row, list)
+    )
+
+    flight = make_guess.read_feed_row(key, row)
+
+    assert isinstance(flight, Flight)
+    assert flight.origin is airports[row[11]]
+    assert flight.position == Position(lat=row[1], lon=row[2])
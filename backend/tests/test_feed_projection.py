@@ -0,0 +1,64 @@
+import pytest
+from benchmarks import feed_extrapolation
+from helpers.fr24_api import FEED_CACHE, FEED_MAX_EXTRAPOLATION_S
+from helpers.make_guess import project_flights
+
+NOW = 1_760_000_000
+
+
+def test_projects_rows_along_their_track():
+    # Heading due east at 360 kt (about 11.1 km per minute) for 30 seconds
+    row = ["", 0.0, 0.0, 90, 35000, 360, "", "", "", "", NOW - 30]
+
+    projected = project_flights({"a": row}, now=NOW)["a"]
+
+    assert projected[1] == pytest.approx(0.0, abs=1e-6)
+    assert projected[2] == pytest.approx(0.05, rel=0.01)
+    assert row[2] == 0.0
+
+
+def test_drops_rows_too_old_to_project():
+    oldest = NOW - FEED_MAX_EXTRAPOLATION_S
+    old_row = ["", 0.0, 0.0, 90, 35000, 360, "", "", "", "", oldest - 1]
+    row = ["", 0.0, 0.0, 90, 35000, 360, "", "", "", "", oldest + 1]
+
+    assert list(project_flights({"old": old_row, "a": row}, now=NOW)) == ["a"]
+
+
+def test_keeps_rows_without_a_timestamp():
+    row = ["", 1.0, 2.0]
+
+    assert project_flights({"a": row}, now=NOW) == {"a": row}
+
+
+@pytest.fixture(scope="module")
+def simulated_feed():
+    tracks = feed_extrapolation.simulate_tracks(count=1000, duration_s=60)
+    return tracks, feed_extrapolation.record_feed(tracks)
+
+
+def test_cached_tiles_are_more_accurate_than_the_unprojected_baseline(simulated_feed):
+    tracks, rows = simulated_feed
+
+    # Feed tiles were previously cached for 10 s and used without projection
+    baseline = feed_extrapolation.measure(tracks, rows, cache_age_s=10)
+    result = feed_extrapolation.measure(tracks, rows, int(FEED_CACHE.ttl_s))
+
+    assert result["dropped"] == 0
+    assert result["projected_mean"] < baseline["raw_mean"]
+    assert result["projected_p95"] < baseline["raw_p95"]
+
+
+def test_cached_tiles_pick_the_nearest_flight_more_often_than_the_baseline(
+    simulated_feed,
+):
+    tracks, rows = simulated_feed
+    players = feed_extrapolation.simulate_players(count=200)
+
+    baseline = feed_extrapolation.measure_picks(tracks, rows, players, cache_age_s=10)
+    result = feed_extrapolation.measure_picks(
+        tracks, rows, players, int(FEED_CACHE.ttl_s)
+    )
+
+    assert result["projected_pick"] > baseline["raw_pick"]
+    assert result["projected_pick"] >= 0.9
@@ -0,0 +1,131 @@
+import threading
+import time
+from unittest import mock
+import pytest
+from helpers import airport_index, make_guess
+
+AIRPORTS = [
+    {
+        "name": "London Heathrow Airport",
+        "city": "London",
+        "iata": "LHR",
+        "icao": "EGLL",
+        "position": {"lat": 51.47, "lon": -0.45},
+    },
+    {
+        "name": "Paris Charles de Gaulle Airport",
+        "city": "Paris",
+        "iata": "CDG",
+        "icao": "LFPG",
+        "position": {"lat": 49.01, "lon": 2.55},
+    },
+]
+
+FEED_ROW = [
+    "4CA7B1", 50.5, 1.0, 140, 36000, 450, "", "F-EST", "A320", "G-EUUA",
+    1760000000, "LHR", "CDG", "BA304", 0, 0, "BAW304",
+]  # fmt: skip
+
+FLIGHT_DETAILS = {
+    "identification": {"callsign": "BAW304", "number": {"default": "BA304"}},
+    "airline": {"name": "British Airways"},
+    "aircraft": {"model": {"text": "Airbus A320"}, "registration": "G-EUUA"},
+    "airport": {"origin": None, "destination": None},
+    "time": {"real": {"departure": 1760000000}},
+    "trail": [{"lat": 50.5, "lng": 1.0}],
+}
+
+
+def test_feed_rows_and_details_give_the_same_id():
+    index = airport_index.build_airport_index(AIRPORTS)
+    with mock.patch.object(airport_index, "_airport_index", index), mock.patch.object(
+        airport_index, "_airport_index_expiry", float("inf")
+    ):
+        row_flight = make_guess.read_feed_row("3c2a1b0f", FEED_ROW)
+    details_flight = make_guess.read_flight_details("3c2a1b0f", FLIGHT_DETAILS)
+
+    assert row_flight.id == details_flight.id == "BAW304-BA304-3c2a1b0f"
+    assert row_flight.destination.iata == "CDG"
+
+
+def test_blocked_flights_keep_their_invalid_id():
+    details = {"identification": {"callsign": "Blocked", "number": {"default": None}}}
+
+    flight = make_guess.read_flight_details("3c2a1b0f", details)
+
+    assert flight.id == make_guess.BLOCKED_FLIGHT_ID
+    assert not make_guess.is_scoreable(flight, rules=None)
+
+
+def test_concurrent_lookups_share_one_airport_download():
+    downloads = []
+
+    def slow_fetch():
+        downloads.append(time.monotonic())
+        time.sleep(0.1)
+        return AIRPORTS
+
+    with mock.patch.object(airport_index, "_airport_index", None), mock.patch.object(
+        airport_index, "_airport_index_expiry", 0.0
+    ), mock.patch.object(airport_index, "fetch_airports", slow_fetch):
+        threads = [
+            threading.Thread(target=airport_index.get_airport, args=("LHR",))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert airport_index.get_airport("CDG").icao == "LFPG"
+
+    assert len(downloads) == 1
+
+
+def test_keeps_the_previous_airports_when_a_reload_fails():
+    def failing_fetch():
+        raise ConnectionRefusedError()
+
+    index = airport_index.build_airport_index(AIRPORTS)
+    with mock.patch.object(airport_index, "_airport_index", index), mock.patch.object(
+        airport_index, "_airport_index_expiry", 0.0
+    ), mock.patch.object(airport_index, "fetch_airports", failing_fetch):
+        assert airport_index.get_airport("LHR").icao == "EGLL"
+        assert airport_index._airport_index_expiry > time.monotonic()
+
+
+def test_backs_off_when_the_airports_cannot_be_loaded():
+    attempts = []
+
+    def failing_fetch():
+        attempts.append(time.monotonic())
+        raise ConnectionRefusedError()
+
+    with mock.patch.object(airport_index, "_airport_index", None), mock.patch.object(
+        airport_index, "_airport_index_expiry", 0.0
+    ), mock.patch.object(airport_index, "fetch_airports", failing_fetch):
+        for _ in range(3):
+            with pytest.raises(ValueError):
+                airport_index.get_airport("LHR")
+
+    assert len(attempts) == 1
+
+
+def test_feed_lookups_fall_back_to_the_details_without_airports(monkeypatch):
+    def failing_fetch():
+        raise ConnectionRefusedError()
+
+    monkeypatch.setattr(airport_index, "_airport_index", None)
+    monkeypatch.setattr(airport_index, "_airport_index_expiry", 0.0)
+    monkeypatch.setattr(airport_index, "fetch_airports", failing_fetch)
+    monkeypatch.setattr(make_guess, "FLIGHT_LOOKUP_MODE", "feed")
+    monkeypatch.setattr(make_guess, "get_flight_details", lambda key: FLIGHT_DETAILS)
+    make_guess.FLIGHT_CACHE.clear()
+
+    try:
+        flight = make_guess.resolve_flight("3c2a1b0f", FEED_ROW)
+    finally:
+        make_guess.FLIGHT_CACHE.clear()
+
+    assert flight.id == "BAW304-BA304-3c2a1b0f"
+    assert flight.airline == "British Airways"
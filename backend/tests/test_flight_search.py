@@ -0,0 +1,161 @@
+import threading
+import time
+from unittest import mock
+import pytest
+from helpers import fr24_api, make_guess
+from helpers.data_types import AirportInfo, Flight, GameRules, Position
+
+PARIS = Position(lat=48.86, lon=2.35)
+RULES = GameRules(use_origin=True, use_destination=True)
+AIRPORT = AirportInfo(
+    name="Paris Charles de Gaulle Airport",
+    city="Paris",
+    iata="CDG",
+    icao="LFPG",
+    position=Position(lat=49.01, lon=2.55),
+)
+
+
+class FakeFeed:
+    """Serves feed tiles from a fixed set of rows, recording each request"""
+
+    def __init__(self, rows: dict, delay_s: float = 0.0):
+        self.rows = rows
+        self.delay_s = delay_s
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def fetch_tile_flights(self, tile):
+        with self._lock:
+            self.requests.append((time.monotonic(), tile))
+        time.sleep(self.delay_s)
+
+        level, lat_idx, lon_idx = tile
+        size = fr24_api.get_tile_size(level)
+        return {
+            key: row
+            for key, row in self.rows.items()
+            if lat_idx * size <= row[1] < (lat_idx + 1) * size
+            and lon_idx * size <= row[2] < (lon_idx + 1) * size
+        }
+
+
+def resolve(flight_key, row, full_details=False):
+    """Flights with "blocked" keys are hidden, and "noroute" keys have no airports"""
+    airport = None if flight_key.startswith("noroute") else AIRPORT
+    return Flight(
+        id=make_guess.get_flight_id(
+            flight_key, "Blocked" if flight_key.startswith("blocked") else "AFR1", None
+        ),
+        flight_number=None,
+        callsign=None,
+        airline=None,
+        aircraft_type=None,
+        aircraft_registration=None,
+        image_src=None,
+        origin=airport,
+        destination=airport,
+        position=Position(lat=row[1], lon=row[2]),
+    )
+
+
+@pytest.fixture
+def feed():
+    fake_feed = FakeFeed({})
+    fr24_api.FEED_CACHE.clear()
+    with mock.patch.object(
+        fr24_api, "fetch_tile_flights", fake_feed.fetch_tile_flights
+    ), mock.patch.object(make_guess, "resolve_flight", resolve):
+        yield fake_feed
+    fr24_api.FEED_CACHE.clear()
+
+
+def count_round_trips(requests, gap_s=0.05):
+    """Group requests which were sent together, as those of one ring are"""
+    times = sorted(sent_at for sent_at, _ in requests)
+    return sum(1 for i, t in enumerate(times) if i == 0 or t - times[i - 1] > gap_s)
+
+
+def test_fetches_the_tiles_of_an_area_concurrently(feed):
+    feed.delay_s = 0.2
+    lat_margin, lon_margin = make_guess.get_search_margins(PARIS, 120)
+
+    started = time.monotonic()
+    fr24_api.get_all_flights(PARIS, lat_margin, lon_margin)
+
+    assert len(feed.requests) > 1
+    assert time.monotonic() - started < 0.2 * len(feed.requests) - 0.1
+
+
+def test_caps_the_round_trips_of_an_empty_search(feed):
+    feed.delay_s = 0.1
+
+    flight, approximate = make_guess.find_closest_flight(PARIS, RULES)
+
+    assert flight is None
+    assert not approximate
+    assert count_round_trips(feed.requests) == make_guess.SEARCH_MAX_ROUND_TRIPS
+
+
+def test_widening_reuses_the_cached_tiles(feed):
+    feed.rows = {"far": ["far", PARIS.lat + 0.9, PARIS.lon]}
+
+    flight, _ = make_guess.find_closest_flight(PARIS, RULES)
+    requests = len(feed.requests)
+    make_guess.find_closest_flight(PARIS, RULES)
+
+    assert flight.id == "AFR1-None-far"
+    assert len(feed.requests) == requests
+
+
+def test_widens_past_unscoreable_candidates(feed):
+    feed.rows = {
+        "blocked": ["blocked", PARIS.lat + 0.01, PARIS.lon],
+        "noroute": ["noroute", PARIS.lat + 0.02, PARIS.lon],
+        "guessed": ["guessed", PARIS.lat + 0.03, PARIS.lon],
+        "near": ["near", PARIS.lat + 0.3, PARIS.lon],
+    }
+
+    flight, _ = make_guess.find_closest_flight(
+        PARIS, RULES, guessed_flights={"AFR1-None-guessed"}
+    )
+
+    assert flight.id == "AFR1-None-near"
+
+
+def test_falls_back_to_the_nearest_flight(feed):
+    feed.rows = {
+        "noroute1": ["noroute1", PARIS.lat + 0.01, PARIS.lon],
+        "noroute2": ["noroute2", PARIS.lat + 0.5, PARIS.lon],
+    }
+
+    flight, _ = make_guess.find_closest_flight(PARIS, RULES)
+
+    assert flight.id == "AFR1-None-noroute1"
+
+
+def test_searches_across_the_antimeridian(feed):
+    fiji = Position(lat=-17.0, lon=179.95)
+    feed.rows = {
+        "east": ["east", -17.0, -179.9],
+        "west": ["west", -17.0, 179.5],
+    }
+
+    flight, _ = make_guess.find_closest_flight(fiji, RULES)
+
+    assert flight.id == "AFR1-None-east"
+    for _, (level, _, lon_idx) in feed.requests:
+        size = fr24_api.get_tile_size(level)
+        assert -180 <= lon_idx * size < 180
+
+
+def test_filters_the_area_across_the_antimeridian(feed):
+    position = Position(lat=-17.0, lon=179.9)
+    feed.rows = {
+        "inside": ["inside", -17.0, -179.95],
+        "outside": ["outside", -17.0, -179.5],
+    }
+
+    all_flights = fr24_api.get_all_flights(position, 0.2, 0.2)
+
+    assert list(all_flights) == ["inside"]
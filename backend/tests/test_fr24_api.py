@@ -0,0 +1,32 @@
+from unittest import mock
+from helpers import fr24_api
+
+
+def test_keeps_only_flight_rows():
+    feed = {
+        "full_count": 2,
+        "version": 4,
+        "stats": {"total": {"ads-b": 2}},
+        "2f1a": ["4CA7B1", 51.0, 0.5],
+        "2f1b": ["4CA7B2", 51.1, 0.6],
+    }
+
+    assert fr24_api.read_feed_rows(feed) == {
+        "2f1a": ["4CA7B1", 51.0, 0.5],
+        "2f1b": ["4CA7B2", 51.1, 0.6],
+    }
+
+
+def test_fetches_tiles_with_the_feed_profile():
+    requested = []
+
+    def make_request(url):
+        requested.append(url)
+        return {"version": 4, "2f1a": ["4CA7B1", 51.2, 0.2]}
+
+    with mock.patch.object(fr24_api, "make_request", make_request):
+        tile_flights = fr24_api.fetch_tile_flights((0, 102, 0))
+
+    assert tile_flights == {"2f1a": ["4CA7B1", 51.2, 0.2]}
+    assert "bounds=51.5%2C51.0%2C0.5%2C0.0" in requested[0]
+    assert f"maxage={fr24_api.FEED_PARAMS['maxage']}" in requested[0]
@@ -0,0 +1,95 @@
+import time
+from unittest import mock
+import pytest
+from helpers.data_types import Flight, GuessResult, Points
+from multiplayer_helpers import player_type
+from multiplayer_helpers.player_type import Player
+
+
+def guess(flight_id: str, points: int = 100) -> GuessResult:
+    flight = Flight(
+        id=flight_id,
+        flight_number=None,
+        callsign=None,
+        airline=None,
+        aircraft_type=None,
+        aircraft_registration=None,
+        image_src=None,
+        origin=None,
+        destination=None,
+        position=None,
+    )
+    return GuessResult(points=Points(points, points, 2 * points), flight=flight)
+
+
+def reload(player: Player) -> Player:
+    item = player_type.get_player_table().get_item(Key={"player_id": player.id})
+    return Player.from_dict(item["Item"])
+
+
+@pytest.fixture
+def player(lobby_tables):
+    return Player.create("alice", "LOBBY1", "conn-1")
+
+
+def test_records_each_flight_once(player):
+    assert player.handle_guess(guess("BAW304-BA304-3c2a1b0f")) is False
+    assert player.handle_guess(guess("BAW304-BA304-3c2a1b0f")) is True
+
+    stored = reload(player)
+    assert stored.score == 200
+    assert stored.guess_count == 1
+    assert stored.guessed_flights == ["BAW304-BA304-3c2a1b0f"]
+
+
+def test_ignores_blocked_flights(player):
+    assert player.handle_guess(guess("Blocked-None-None")) is False
+
+    assert reload(player).guess_count == 0
+
+
+def test_rotates_history_by_generation(player):
+    started = time.time()
+    player.handle_guess(guess("first"))
+
+    # Still within the first generation, so nothing is rotated
+    with mock.patch.object(player_type, "GUESS_HISTORY_TTL_S", 60):
+        player.handle_guess(guess("second"))
+    stored = reload(player)
+    assert stored.guessed_flights == ["first", "second"]
+
+    # The first generation becomes the previous one, and is still checked
+    with mock.patch.object(player_type, "GUESS_HISTORY_TTL_S", 0):
+        player.handle_guess(guess("third"))
+    item = player_type.get_player_table().get_item(Key={"player_id": player.id})["Item"]
+    assert item["previous_flight_set"] == {"first", "second", "third"}
+    assert "guessed_flight_set" not in item
+    assert float(item["history_started_at"]) >= int(started)
+
+    stored = reload(player)
+    assert stored.handle_guess(guess("first")) is True
+
+    # A second rotation discards the oldest generation
+    with mock.patch.object(player_type, "GUESS_HISTORY_TTL_S", 0):
+        stored.handle_guess(guess("fourth"))
+    stored = reload(player)
+    assert stored.guessed_flights == ["fourth"]
+    assert stored.handle_guess(guess("first")) is False
+    assert stored.guess_count == 5
+
+
+def test_moves_legacy_history_out_of_the_list(player):
+    player_type.get_player_table().update_item(
+        Key={"player_id": player.id},
+        UpdateExpression="SET guessed_flights = :f, guess_count = :n",
+        ExpressionAttributeValues={":f": ["old"], ":n": 1},
+    )
+
+    stored = reload(player)
+    assert stored.handle_guess(guess("old")) is True
+    with mock.patch.object(player_type, "GUESS_HISTORY_TTL_S", 0):
+        assert stored.handle_guess(guess("new")) is False
+
+    item = player_type.get_player_table().get_item(Key={"player_id": player.id})["Item"]
+    assert "guessed_flights" not in item
+    assert item["previous_flight_set"] == {"new"}
@@ -0,0 +1,70 @@
+import gzip
+import json
+import time
+from urllib.error import HTTPError
+import pytest
+from helpers.http_client import ConnectionPool
+
+
+def json_response(value, status=200):
+    return status, json.dumps(value).encode(), {"Content-Type": "application/json"}
+
+
+def test_reuses_connections_between_requests(stub_server):
+    stub_server.respond = lambda path: json_response({"path": path})
+    pool = ConnectionPool({"user-agent": "test"})
+
+    results = [pool.get_json(stub_server.url(f"/feed?n={i}")) for i in range(3)]
+
+    assert results == [{"path": f"/feed?n={i}"} for i in range(3)]
+    assert len(stub_server.connections) == 1
+
+
+def test_requests_and_decodes_gzip(stub_server):
+    body = gzip.compress(json.dumps({"rows": [1, 2, 3]}).encode())
+    stub_server.respond = lambda path: (200, body, {"Content-Encoding": "gzip"})
+    pool = ConnectionPool({"user-agent": "test"})
+
+    assert pool.get_json(stub_server.url()) == {"rows": [1, 2, 3]}
+
+    _, headers = stub_server.requests[0]
+    assert headers["accept-encoding"] == "gzip"
+    assert headers["user-agent"] == "test"
+
+
+def test_raises_for_error_statuses(stub_server):
+    stub_server.respond = lambda path: json_response({}, status=404)
+    pool = ConnectionPool({})
+
+    with pytest.raises(HTTPError) as exc_info:
+        pool.get_bytes(stub_server.url("/missing"))
+
+    assert exc_info.value.code == 404
+
+
+def test_retries_once_when_an_idle_connection_was_closed(stub_server):
+    stub_server.respond = lambda path: json_response({"ok": True})
+    stub_server.drop_connections = True
+    pool = ConnectionPool({})
+
+    assert pool.get_json(stub_server.url()) == {"ok": True}
+    # The pooled connection has since been closed by the server
+    time.sleep(0.05)
+    assert pool.get_json(stub_server.url()) == {"ok": True}
+
+    assert len(stub_server.connections) == 2
+
+
+def test_applies_the_read_timeout(stub_server):
+    def respond(path):
+        time.sleep(0.5)
+        return json_response({})
+
+    stub_server.respond = respond
+    pool = ConnectionPool({}, read_timeout_s=0.1)
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.get_bytes(stub_server.url())
+
+    assert time.monotonic() - started < 0.4
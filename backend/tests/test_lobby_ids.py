@@ -0,0 +1,84 @@
+import json
+import pytest
+from helpers.data_types import GameRules
+from helpers.utils import HandledException
+from multiplayer_helpers import lobby_type
+from multiplayer_helpers.lobby_type import Lobby
+
+RULES = GameRules(use_origin=True, use_destination=False)
+
+
+@pytest.fixture
+def generated_ids(monkeypatch):
+    """Makes the lobby ids generated by Lobby.create those appended to the list"""
+    ids = []
+
+    def choice(alphabet):
+        if not characters:
+            characters.extend("".join(ids))
+            ids.clear()
+        return characters.pop(0)
+
+    characters = []
+    monkeypatch.setattr(lobby_type.random, "choice", choice)
+    return ids
+
+
+@pytest.fixture
+def existing_lobby(lobby_tables):
+    lobby_tables.get_lobby_table().put_item(
+        Item={"lobby_id": "AAAA", "sequence": 7, "use_origin": False}
+    )
+    return "AAAA"
+
+
+def read_collision_metrics(output: str) -> list:
+    metrics = [json.loads(line) for line in output.splitlines() if line.startswith("{")]
+    return [m["LobbyIdCollisions"] for m in metrics if "LobbyIdCollisions" in m]
+
+
+def test_creates_a_lobby_with_one_write(lobby_tables, generated_ids, capsys):
+    generated_ids.append("ABCD")
+
+    lobby = Lobby.create(RULES)
+
+    assert lobby.id == "ABCD"
+    assert Lobby.read("ABCD").rules == RULES
+    assert read_collision_metrics(capsys.readouterr().out) == [0]
+
+
+def test_retries_ids_which_are_taken(
+    lobby_tables, existing_lobby, generated_ids, capsys
+):
+    generated_ids.extend([existing_lobby, "BBBB"])
+
+    lobby = Lobby.create(RULES)
+
+    assert lobby.id == "BBBB"
+    # The existing lobby is left as it was
+    assert Lobby.read(existing_lobby).sequence == 7
+    assert read_collision_metrics(capsys.readouterr().out) == [1]
+
+
+def test_gives_up_after_too_many_collisions(
+    lobby_tables, existing_lobby, generated_ids, capsys, monkeypatch
+):
+    monkeypatch.setattr(lobby_type, "LOBBY_ID_MAX_ATTEMPTS", 3)
+    generated_ids.extend([existing_lobby] * 3)
+
+    with pytest.raises(HandledException) as exc_info:
+        Lobby.create(RULES)
+
+    assert exc_info.value.status_code == 503
+    assert Lobby.read(existing_lobby).sequence == 7
+    assert read_collision_metrics(capsys.readouterr().out) == [3]
+
+
+def test_ids_use_the_configured_length_and_alphabet(lobby_tables, monkeypatch):
+    monkeypatch.setattr(lobby_type, "LOBBY_ID_LENGTH", 6)
+    monkeypatch.setattr(lobby_type, "LOBBY_ID_ALPHABET", "XY")
+
+    lobby = Lobby.create(RULES)
+
+    assert len(lobby.id) == 6
+    assert set(lobby.id) <= {"X", "Y"}
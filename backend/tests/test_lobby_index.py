@@ -0,0 +1,59 @@
+import pytest
+from multiplayer_helpers.lobby_type import Lobby, LobbySnapshot
+from multiplayer_helpers.player_type import Player
+from helpers.data_types import Flight, GameRules, GuessResult, Points
+
+RULES = GameRules(use_origin=True, use_destination=True)
+
+
+def guess(flight_id: str) -> GuessResult:
+    flight = Flight(flight_id, None, None, None, None, None, None, None, None, None)
+    return GuessResult(points=Points(100, 0, 100), flight=flight)
+
+
+@pytest.fixture
+def lobby(lobby_tables):
+    lobby = Lobby.create(RULES)
+    Player.create("alice", lobby.id, "conn-a")
+    # A player from before guess_count was stored
+    lobby_tables.get_player_table().put_item(
+        Item={
+            "player_id": Player.get_id("bob", lobby.id),
+            "lobby_id": lobby.id,
+            "player_name": "bob",
+            "connection_id": "conn-b",
+            "score": 300,
+            "guessed_flights": ["BAW304-BA304-1", "AFR1-AF1-2", "EZY1-U21-3"],
+        }
+    )
+    return lobby
+
+
+def test_lists_players_with_their_guess_counts(lobby):
+    snapshot = LobbySnapshot.load(lobby.id)
+
+    assert snapshot.to_dict() == [
+        {"player_name": "alice", "score": 0, "guess_count": 0},
+        {"player_name": "bob", "score": 300, "guess_count": 3},
+    ]
+
+
+@pytest.mark.parametrize(
+    "lobby_indexes", [("LobbyPlayersIndex", "LobbyIndex"), ("LobbyIndex",)]
+)
+def test_lists_players_with_their_guess_history(lobby, lobby_tables):
+    alice = LobbySnapshot.load(lobby.id).get_player("alice", "conn-a")
+    alice.handle_guess(guess("BAW304-BA304-1"))
+
+    snapshot = LobbySnapshot.load(lobby.id)
+
+    assert snapshot.get_player("alice", "conn-a").already_guessed("BAW304-BA304-1")
+    assert snapshot.get_player("bob", "conn-b").already_guessed("AFR1-AF1-2")
+
+
+@pytest.mark.parametrize("lobby_indexes", [("LobbyIndex",)])
+def test_falls_back_to_the_legacy_index(lobby):
+    snapshot = LobbySnapshot.load(lobby.id)
+
+    assert [player.name for player in snapshot.players] == ["alice", "bob"]
+    assert snapshot.get_player("bob", "conn-b").guess_count == 3
@@ -0,0 +1,255 @@
+import pytest
+from helpers import make_guess
+from helpers.data_types import AirportInfo, Flight, GuessResult, Points, Position
+from multiplayer_helpers.lobby_type import Lobby, LobbySnapshot
+from multiplayer_helpers.player_type import Player
+
+RULES = {"use_origin": True, "use_destination": True}
+AIRPORT = AirportInfo(
+    name="London Heathrow Airport",
+    city="London",
+    iata="LHR",
+    icao="EGLL",
+    position=Position(lat=51.47, lon=-0.45),
+)
+GUESS = {
+    "player": {"lat": 51.0, "lon": 0.0},
+    "origin": {"lat": 51.47, "lon": -0.45},
+    "destination": {"lat": 49.01, "lon": 2.55},
+}
+
+
+def guess_result(flight_id: str, points: int = 100) -> GuessResult:
+    flight = Flight(
+        id=flight_id,
+        flight_number="BA304",
+        callsign="BAW304",
+        airline=None,
+        aircraft_type=None,
+        aircraft_registration=None,
+        image_src=None,
+        origin=AIRPORT,
+        destination=AIRPORT,
+        position=Position(lat=51.0, lon=0.0),
+    )
+    return GuessResult(points=Points(points, 0, points), flight=flight)
+
+
+@pytest.fixture
+def lobby_id(multiplayer):
+    multiplayer.send("create_lobby", "conn-a", {"player_name": "alice", "rules": RULES})
+    return multiplayer.messages("conn-a")[-1]["lobby"]
+
+
+@pytest.fixture
+def guessed_flight(monkeypatch):
+    monkeypatch.setattr(
+        make_guess, "make_guess", lambda *args, **kwargs: guess_result("BAW304-BA304-1")
+    )
+
+
+def test_creates_a_lobby(multiplayer, lobby_id):
+    joined = multiplayer.messages("conn-a")[-1]
+
+    assert joined["event"] == "lobby_joined"
+    assert joined["players"] == [{"player_name": "alice", "score": 0, "guess_count": 0}]
+    assert joined["seq"] == 0
+
+
+def test_reports_missing_lobbies(multiplayer):
+    multiplayer.send("join_lobby", "conn-b", {"player_name": "bob", "lobby_id": "NONE"})
+
+    assert multiplayer.messages("conn-b") == [
+        {"event": "lobby_error", "message": "Lobby does not exist"}
+    ]
+
+
+def test_scores_a_guess_once(multiplayer, lobby_id, guessed_flight):
+    body = {"lobby_id": lobby_id, "player_name": "alice", **GUESS}
+
+    multiplayer.send("handle_guess", "conn-a", body)
+    multiplayer.send("handle_guess", "conn-a", body)
+
+    first, second = [
+        message
+        for message in multiplayer.messages("conn-a")
+        if message["event"] == "flight_details"
+    ]
+    assert (first["status"], first["score"]) == ("Success", 100)
+    assert (second["status"], second["score"]) == ("AlreadyGuessed", 100)
+
+
+def test_guesses_with_the_history_from_the_lobby_query(
+    multiplayer, lobby_tables, lobby_id, monkeypatch
+):
+    exclusions = []
+
+    def make_guess_excluding(*args, guessed_flights=(), **kwargs):
+        exclusions.append(list(guessed_flights))
+        return guess_result(f"BAW304-BA304-{len(exclusions)}")
+
+    monkeypatch.setattr(make_guess, "make_guess", make_guess_excluding)
+    operations = []
+    events = lobby_tables.get_player_table().meta.client.meta.events
+    events.register(
+        "before-call.dynamodb.*",
+        lambda model, **kwargs: operations.append(model.name),
+    )
+
+    body = {"lobby_id": lobby_id, "player_name": "alice", **GUESS}
+    multiplayer.send("handle_guess", "conn-a", body)
+    operations.clear()
+    multiplayer.send("handle_guess", "conn-a", body)
+
+    # The lobby, its players with their histories, the guess and the lobby sequence
+    assert operations == ["GetItem", "Query", "UpdateItem", "UpdateItem"]
+    assert exclusions == [[], ["BAW304-BA304-1"]]
+
+
+def test_returning_player_keeps_their_score_when_the_index_lags(
+    multiplayer, lobby_tables, lobby_id, guessed_flight, monkeypatch
+):
+    multiplayer.send(
+        "handle_guess",
+        "conn-a",
+        {"lobby_id": lobby_id, "player_name": "alice", **GUESS},
+    )
+
+    # The lobby index has not caught up, so alice looks like a new player
+    monkeypatch.setattr(Lobby, "get_players", lambda self: [])
+    multiplayer.send(
+        "join_lobby", "conn-a2", {"player_name": "alice", "lobby_id": lobby_id}
+    )
+
+    joined = multiplayer.messages("conn-a2")[0]
+    assert joined["event"] == "lobby_joined"
+    assert joined["score"] == 100
+
+    player_id = Player.get_id("alice", lobby_id)
+    table = lobby_tables.get_player_table()
+    stored = table.get_item(Key={"player_id": player_id})["Item"]
+    assert stored["score"] == 100
+    assert stored["connection_id"] == "conn-a2"
+    assert stored["guessed_flight_set"] == {"BAW304-BA304-1"}
+
+
+def test_create_does_not_overwrite_an_existing_player(lobby_tables):
+    player = Player.create("alice", "LOBBY1", "conn-a")
+    player.handle_guess(guess_result("BAW304-BA304-1"))
+
+    returning = Player.create("alice", "LOBBY1", "conn-a2")
+
+    assert returning.score == 100
+    assert returning.already_guessed("BAW304-BA304-1")
+    assert returning.connection_id == "conn-a2"
+    assert not returning.connection_saved
+
+
+def test_joining_player_catches_up_on_changes_during_the_join(
+    multiplayer, lobby_id, monkeypatch
+):
+    # Another player joins after bob's snapshot is loaded, but before his join is
+    # numbered
+    load_snapshot = LobbySnapshot.load
+
+    def load_then_join(lobby_id):
+        snapshot = load_snapshot(lobby_id)
+        monkeypatch.setattr(LobbySnapshot, "load", load_snapshot)
+        multiplayer.send(
+            "join_lobby", "conn-c", {"player_name": "carol", "lobby_id": lobby_id}
+        )
+        return snapshot
+
+    monkeypatch.setattr(LobbySnapshot, "load", load_then_join)
+    multiplayer.send(
+        "join_lobby", "conn-b", {"player_name": "bob", "lobby_id": lobby_id}
+    )
+
+    joined, delta = multiplayer.messages("conn-b")
+    assert joined["event"] == "lobby_joined"
+    assert [p["player_name"] for p in joined["players"]] == ["alice", "bob"]
+    # carol's join is numbered 1, so bob's client can tell that it missed it
+    assert joined["seq"] == 0
+    assert (delta["event"], delta["seq"]) == ("lobby_delta", 2)
+    assert delta["player"]["player_name"] == "bob"
+
+    alice_deltas = multiplayer.messages("conn-a")[1:]
+    assert [(d["seq"], d["player"]["player_name"]) for d in alice_deltas] == [
+        (1, "carol"),
+        (2, "bob"),
+    ]
+
+
+@pytest.fixture
+def full_lobby(multiplayer, lobby_id):
+    for connection_id, name in [("conn-b", "bob"), ("conn-c", "carol")]:
+        multiplayer.send(
+            "join_lobby", connection_id, {"player_name": name, "lobby_id": lobby_id}
+        )
+    multiplayer.api_client.sent.clear()
+    return lobby_id
+
+
+def stored_connection(lobby_tables, name: str, lobby_id: str):
+    player_id = Player.get_id(name, lobby_id)
+    item = lobby_tables.get_player_table().get_item(Key={"player_id": player_id})
+    return item["Item"].get("connection_id")
+
+
+def test_broadcasts_skip_connections_which_have_gone(
+    multiplayer, lobby_tables, full_lobby, guessed_flight
+):
+    multiplayer.api_client.gone.add("conn-b")
+    body = {"lobby_id": full_lobby, **GUESS}
+
+    multiplayer.send("handle_guess", "conn-a", {**body, "player_name": "alice"})
+
+    # The other players are still sent the update, and bob is disconnected
+    (delta,) = multiplayer.messages("conn-c")
+    assert (delta["event"], delta["player"]["player_name"]) == ("lobby_delta", "alice")
+    assert stored_connection(lobby_tables, "bob", full_lobby) is None
+    assert stored_connection(lobby_tables, "carol", full_lobby) == "conn-c"
+
+    # Later broadcasts are not sent to bob's old connection
+    multiplayer.api_client.gone.clear()
+    multiplayer.send("handle_guess", "conn-c", {**body, "player_name": "carol"})
+
+    assert multiplayer.messages("conn-b") == []
+    assert [m["event"] for m in multiplayer.messages("conn-a")][-1] == "lobby_delta"
+
+
+def test_disconnect_clears_the_connection(multiplayer, lobby_tables, full_lobby):
+    multiplayer.send("$disconnect", "conn-b")
+
+    # bob keeps his place and score in the lobby, for when he reconnects
+    assert stored_connection(lobby_tables, "bob", full_lobby) is None
+    assert stored_connection(lobby_tables, "carol", full_lobby) == "conn-c"
+    index = lobby_tables.get_player_table().query(
+        IndexName="ConnectionIndex",
+        KeyConditionExpression="connection_id = :c",
+        ExpressionAttributeValues={":c": "conn-b"},
+    )
+    assert index["Items"] == []
+
+    snapshot = LobbySnapshot.load(full_lobby)
+    assert [p.name for p in snapshot.players] == ["alice", "bob", "carol"]
+    bob = next(player for player in snapshot.players if player.name == "bob")
+    assert bob.connection_id is None
+
+    # The lobby's next update is only sent to the connected players
+    multiplayer.send(
+        "join_lobby", "conn-d", {"player_name": "dave", "lobby_id": full_lobby}
+    )
+    assert multiplayer.messages("conn-b") == []
+    assert multiplayer.messages("conn-c")[-1]["player"]["player_name"] == "dave"
+
+
+def test_disconnect_keeps_a_newer_connection(multiplayer, lobby_tables, full_lobby):
+    multiplayer.send(
+        "join_lobby", "conn-b2", {"player_name": "bob", "lobby_id": full_lobby}
+    )
+
+    # The old connection closes after bob has reconnected
+    multiplayer.send("$disconnect", "conn-b")
+
+    assert stored_connection(lobby_tables, "bob", full_lobby) == "conn-b2"
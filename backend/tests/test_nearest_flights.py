@@ -0,0 +1,78 @@
+import random
+import pytest
+from helpers.data_types import Position
+from helpers.make_guess import (
+    find_nearest_flights,
+    haversine,
+    haversine_many,
+    read_feed_columns,
+)
+
+
+def make_feed(centre: Position, count: int, spread_deg: float, seed: int = 1) -> dict:
+    rng = random.Random(seed)
+    feed = {"full_count": count, "version": 4, "stats": {"total": {}}}
+    for i in range(count):
+        lon = centre.lon + rng.uniform(-spread_deg, spread_deg)
+        feed[f"{i:08x}"] = [
+            "ABC123",
+            centre.lat + rng.uniform(-spread_deg, spread_deg),
+            (lon + 180) % 360 - 180,
+        ]
+    return feed
+
+
+def nearest_by_reference(position: Position, feed: dict, k: int, max_dist_km: float):
+    """The original approach, with a Position and a scalar haversine per row"""
+    dists = [
+        (haversine(position, Position(lat=data[1], lon=data[2])), key)
+        for key, data in feed.items()
+        if isinstance(data, list)
+    ]
+    return sorted(d for d in dists if d[0] <= max_dist_km)[:k]
+
+
+@pytest.mark.parametrize(
+    "centre",
+    [
+        Position(lat=51.47, lon=-0.45),  # LHR
+        Position(lat=64.13, lon=-21.94),  # High latitude
+        Position(lat=-33.94, lon=151.17),  # Southern hemisphere
+        Position(lat=0.5, lon=179.8),  # Near the antimeridian
+    ],
+)
+def test_matches_the_reference_search(centre):
+    feed = make_feed(centre, count=5000, spread_deg=1.5)
+
+    expected = nearest_by_reference(centre, feed, k=5000, max_dist_km=120)
+    actual = find_nearest_flights(centre, feed, k=5000, max_dist_km=120)
+
+    assert [key for _, key in actual] == [key for _, key in expected]
+    for (dist, _), (expected_dist, _) in zip(actual, expected):
+        assert dist == pytest.approx(expected_dist, abs=1e-6)
+
+
+def test_excludes_flights_beyond_the_radius():
+    centre = Position(lat=51.0, lon=0.0)
+    feed = {"near": ["", 51.05, 0.0], "far": ["", 52.5, 0.0]}
+
+    assert [key for _, key in find_nearest_flights(centre, feed, k=2)] == ["near"]
+    assert find_nearest_flights(centre, feed, k=2, max_dist_km=1) == []
+
+
+def test_skips_metadata_keys():
+    keys, lats, lons = read_feed_columns({"version": 4, "a": ["", 1.0, 2.0]})
+
+    assert (keys, lats, lons) == (["a"], [1.0], [2.0])
+    assert read_feed_columns({"version": 4}) == ([], [], [])
+
+
+def test_haversine_many_matches_haversine():
+    origin = Position(lat=51.47, lon=-0.45)
+    points = [Position(lat=48.86, lon=2.35), Position(lat=-33.94, lon=151.17)]
+
+    dists = haversine_many(
+        origin.lat, origin.lon, [p.lat for p in points], [p.lon for p in points]
+    )
+
+    assert dists == pytest.approx([haversine(origin, p) for p in points])
@@ -0,0 +1,135 @@
+import json
+import time
+from urllib.error import HTTPError
+import pytest
+from helpers import airport_index, fr24_api
+from helpers.resilience import CircuitBreaker, LatencyTracker, TokenBucket
+from helpers.utils import HandledException
+
+
+def respond_ok(path):
+    return 200, b'{"ok": true}', {}
+
+
+def respond_error(status):
+    return lambda path: (status, b"error", {})
+
+
+@pytest.fixture
+def fr24(monkeypatch):
+    """Fresh FR24 resilience state, so that tests cannot affect each other"""
+    monkeypatch.setattr(fr24_api, "FR24_RATE_LIMIT", TokenBucket(rate=100, burst=100))
+    monkeypatch.setattr(
+        fr24_api,
+        "FR24_BREAKER",
+        CircuitBreaker(failure_threshold=5, reset_timeout_s=30),
+    )
+    monkeypatch.setattr(fr24_api, "FR24_LATENCY", LatencyTracker())
+    monkeypatch.setattr(fr24_api, "FR24_HEDGE_PERCENTILE", None)
+    return fr24_api
+
+
+def test_opens_the_circuit_after_repeated_failures(fr24, stub_server):
+    stub_server.respond = respond_error(503)
+
+    errors = []
+    for _ in range(8):
+        with pytest.raises((HTTPError, HandledException)) as exc_info:
+            fr24.make_request(stub_server.url())
+        errors.append(exc_info.type)
+
+    assert errors == [HTTPError] * 5 + [HandledException] * 3
+    assert len(stub_server.requests) == 5
+    assert fr24.FR24_BREAKER.is_open
+
+
+def test_closes_the_circuit_after_a_successful_trial(fr24, stub_server):
+    fr24.FR24_BREAKER.reset_timeout_s = 0.1
+    stub_server.respond = respond_error(503)
+    for _ in range(5):
+        with pytest.raises(HTTPError):
+            fr24.make_request(stub_server.url())
+
+    time.sleep(0.15)
+    stub_server.respond = respond_ok
+
+    assert fr24.make_request(stub_server.url()) == {"ok": True}
+    assert not fr24.FR24_BREAKER.is_open
+
+
+def test_client_errors_do_not_open_the_circuit(fr24, stub_server):
+    stub_server.respond = respond_error(404)
+
+    for _ in range(6):
+        with pytest.raises(HTTPError):
+            fr24.make_request(stub_server.url())
+
+    assert not fr24.FR24_BREAKER.is_open
+
+
+def test_refuses_requests_beyond_the_rate_limit(fr24, stub_server, monkeypatch):
+    monkeypatch.setattr(fr24, "FR24_RATE_LIMIT", TokenBucket(rate=5, burst=2))
+    monkeypatch.setattr(fr24, "FR24_RATE_LIMIT_WAIT_S", 0.1)
+    stub_server.respond = respond_ok
+
+    results = []
+    for _ in range(5):
+        try:
+            fr24.make_request(stub_server.url())
+            results.append("ok")
+        except HandledException as exc:
+            results.append(exc.status_code)
+
+    assert results[:2] == ["ok", "ok"]
+    assert 503 in results
+    assert len(stub_server.requests) == results.count("ok")
+
+
+def test_hedges_slow_requests(fr24, stub_server, monkeypatch):
+    monkeypatch.setattr(fr24, "FR24_HEDGE_PERCENTILE", "95")
+    stub_server.respond = respond_ok
+    for _ in range(25):
+        fr24.make_request(stub_server.url())
+
+    # The first of each pair of requests is slow
+    def respond(path):
+        if len(stub_server.requests) % 2 == 1:
+            time.sleep(1.0)
+            return 200, json.dumps({"ok": "slow"}).encode(), {}
+        return 200, json.dumps({"ok": "fast"}).encode(), {}
+
+    stub_server.requests.clear()
+    stub_server.respond = respond
+
+    started = time.monotonic()
+    assert fr24.make_request(stub_server.url()) == {"ok": "fast"}
+    assert time.monotonic() - started < 0.5
+    assert len(stub_server.requests) == 2
+
+
+def test_airport_data_is_loaded_outside_the_fr24_limits(fr24, stub_server, monkeypatch):
+    stub_server.respond = lambda path: (
+        200,
+        json.dumps(
+            [
+                {
+                    "name": "London Heathrow Airport",
+                    "city": "London",
+                    "iata": "LHR",
+                    "icao": "EGLL",
+                    "position": {"lat": 51.47, "lon": -0.45},
+                }
+            ]
+        ).encode(),
+        {},
+    )
+    monkeypatch.setattr(airport_index, "AIRPORTS_ENDPOINT", stub_server.url())
+    monkeypatch.setattr(airport_index, "_airport_index", None)
+    monkeypatch.setattr(airport_index, "_airport_index_expiry", 0.0)
+    # No FR24 request could be made
+    monkeypatch.setattr(fr24, "FR24_RATE_LIMIT", TokenBucket(rate=0.001, burst=0))
+    for _ in range(5):
+        fr24.FR24_BREAKER.record_failure()
+
+    assert airport_index.get_airport("LHR").icao == "EGLL"
+    assert fr24.FR24_BREAKER.is_open
@@ -0,0 +1,59 @@
+import pytest
+from helpers import fr24_api, make_guess, shared_cache
+from helpers.data_types import Position
+from helpers.shared_cache import MemoryStore, SharedCache
+
+FLIGHT_KEY = "2f1a"
+
+# The details' trail is where the flight was when they were fetched
+FLIGHT_DETAILS = {
+    "identification": {"callsign": "BAW1", "number": {"default": "BA1"}},
+    "trail": [{"lat": 50.0, "lng": -1.0}],
+}
+
+# A projected feed row, with where the flight is now
+FEED_ROW = ["", 51.5, 0.1, 90, 35000, 450, "", "", "B738", "G-ABCD", 0]
+
+
+@pytest.fixture
+def fetched_details(monkeypatch):
+    fetched = []
+
+    def fetch_flight_details(flight_id):
+        fetched.append(flight_id)
+        return FLIGHT_DETAILS
+
+    monkeypatch.setattr(fr24_api, "fetch_flight_details", fetch_flight_details)
+    make_guess.FLIGHT_CACHE.clear()
+    yield fetched
+    make_guess.FLIGHT_CACHE.clear()
+
+
+def test_uses_the_feed_position_for_details_from_the_shared_cache(fetched_details):
+    cache = SharedCache(MemoryStore())
+    cache.set(fr24_api.FLIGHT_KEY_PREFIX + FLIGHT_KEY, FLIGHT_DETAILS, 600, 1800)
+    shared_cache.set_shared_cache(cache)
+    try:
+        flight = make_guess.resolve_flight(FLIGHT_KEY, FEED_ROW)
+    finally:
+        shared_cache.set_shared_cache(None)
+
+    assert fetched_details == []
+    assert flight.id == "BAW1-BA1-2f1a"
+    assert flight.position == Position(lat=51.5, lon=0.1)
+
+
+def test_uses_the_feed_position_for_details_from_the_local_cache(fetched_details):
+    first = make_guess.resolve_flight(FLIGHT_KEY, FEED_ROW, full_details=True)
+    # The flight has moved on by the time the feed is fetched again
+    later_row = [*FEED_ROW[:1], 52.0, 1.0, *FEED_ROW[3:]]
+
+    flight = make_guess.resolve_flight(FLIGHT_KEY, later_row)
+
+    assert fetched_details == [FLIGHT_KEY]
+    assert flight.position == Position(lat=52.0, lon=1.0)
+    # Neither the earlier result nor the cached flight are changed
+    assert first.position == Position(lat=51.5, lon=0.1)
+    assert make_guess.FLIGHT_CACHE.get(FLIGHT_KEY).position == Position(
+        lat=50.0, lon=-1.0
+    )
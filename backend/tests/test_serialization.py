@@ -0,0 +1,89 @@
+import json
+from dataclasses import asdict, replace
+import pytest
+from benchmarks.serialization import make_guess_result
+from helpers.data_types import GameRules, GuessResult
+from helpers.serialization import shallow_asdict, to_json, to_json_bytes
+from multiplayer_helpers.player_type import Player
+
+
+@pytest.fixture
+def guess_result() -> GuessResult:
+    return make_guess_result()
+
+
+@pytest.fixture
+def unknown_route(guess_result) -> GuessResult:
+    """A guess result for a flight whose origin and destination are not known"""
+    flight = replace(guess_result.flight, origin=None, destination=None, image_src=None)
+    return replace(guess_result, flight=flight, approximate=True)
+
+
+def test_matches_asdict(guess_result, unknown_route):
+    for result in (guess_result, unknown_route):
+        assert to_json(result) == json.dumps(asdict(result))
+        assert to_json_bytes(result) == json.dumps(asdict(result)).encode("utf-8")
+
+
+def test_encodes_data_types_nested_in_other_values(guess_result):
+    body = {"event": "flight_details", "results": [guess_result], "rules": None}
+
+    expected = {**body, "results": [asdict(guess_result)]}
+    assert to_json(body) == json.dumps(expected)
+
+
+def test_drops_null_fields_of_data_types_only(unknown_route):
+    body = json.loads(
+        to_json({"result": unknown_route, "lobby": None}, drop_nulls=True)
+    )
+
+    assert body["lobby"] is None
+    assert "origin" not in body["result"]["flight"]
+    assert "image_src" not in body["result"]["flight"]
+    assert body["result"]["flight"]["callsign"] == unknown_route.flight.callsign
+
+
+def test_shallow_asdict_does_not_copy_nested_values(guess_result):
+    fields = shallow_asdict(guess_result)
+
+    assert list(fields) == ["points", "flight", "approximate"]
+    assert fields["flight"] is guess_result.flight
+    assert shallow_asdict(GameRules(use_origin=True, use_destination=False)) == {
+        "use_origin": True,
+        "use_destination": False,
+    }
+
+
+def test_rejects_other_objects():
+    with pytest.raises(TypeError):
+        to_json({"value": object()})
+
+    # The classes themselves are not instances to encode
+    with pytest.raises(TypeError):
+        to_json(GuessResult)
+
+
+def test_broadcast_encodes_the_event_once(monkeypatch):
+    import multiplayer_server
+
+    class RecordingApiClient:
+        class exceptions:
+            class GoneException(Exception):
+                pass
+
+        def __init__(self):
+            self.data = []
+
+        def post_to_connection(self, ConnectionId, Data):
+            self.data.append(Data)
+
+    api_client = RecordingApiClient()
+    monkeypatch.setattr(multiplayer_server, "_api_client", api_client)
+    players = [Player(f"player-{i}", "lobby", f"connection-{i}") for i in range(4)]
+    event = {"event": "lobby_update", "players": [p.to_dict() for p in players]}
+
+    multiplayer_server.broadcast(players, event)
+
+    assert len(api_client.data) == len(players)
+    assert all(data is api_client.data[0] for data in api_client.data)
+    assert json.loads(api_client.data[0]) == event
@@ -0,0 +1,256 @@
+import os
+import re
+import time
+import threading
+import pytest
+import warm_feed_cache
+from helpers import fr24_api, shared_cache
+from helpers.data_types import Position
+from helpers.shared_cache import DynamoDBStore, MemoryStore, SharedCache
+
+TERRAFORM_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "terraform")
+
+
+@pytest.fixture
+def dynamodb_store():
+    """A store backed by a mocked table, as the table is defined in terraform"""
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    with moto.mock_aws():
+        boto3.client("dynamodb").create_table(
+            TableName="feed-cache-table",
+            BillingMode="PAY_PER_REQUEST",
+            AttributeDefinitions=[
+                {"AttributeName": "cache_key", "AttributeType": "S"},
+                {"AttributeName": "request_kind", "AttributeType": "S"},
+                {"AttributeName": "last_requested", "AttributeType": "N"},
+            ],
+            KeySchema=[{"AttributeName": "cache_key", "KeyType": "HASH"}],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "RequestIndex",
+                    "KeySchema": [
+                        {"AttributeName": "request_kind", "KeyType": "HASH"},
+                        {"AttributeName": "last_requested", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {
+                        "ProjectionType": "INCLUDE",
+                        "NonKeyAttributes": ["request_count"],
+                    },
+                }
+            ],
+        )
+        yield DynamoDBStore("feed-cache-table")
+
+
+@pytest.fixture
+def memory_cache():
+    """A shared cache backed by a MemoryStore, with the local feed cache emptied"""
+    cache = SharedCache(MemoryStore())
+    shared_cache.set_shared_cache(cache)
+    fr24_api.FEED_CACHE.clear()
+    yield cache
+    shared_cache.set_shared_cache(None)
+    fr24_api.FEED_CACHE.clear()
+
+
+@pytest.fixture
+def fetched_tiles(monkeypatch):
+    fetched = []
+
+    def fetch_tile_flights(tile):
+        fetched.append(tile)
+        time.sleep(0.05)
+        size = fr24_api.get_tile_size(tile[0])
+        return {
+            f"f{len(fetched)}": ["", (tile[1] + 0.5) * size, (tile[2] + 0.5) * size]
+        }
+
+    monkeypatch.setattr(fr24_api, "fetch_tile_flights", fetch_tile_flights)
+    monkeypatch.setattr(warm_feed_cache, "fetch_tile_flights", fetch_tile_flights)
+    return fetched
+
+
+def test_counts_requests_apart_from_the_cached_values(dynamodb_store):
+    now = time.time()
+    dynamodb_store.put("tile:0:1:2", b"value", now, now + 15, now + 30)
+    for key, count in [("tile:0:1:2", 3), ("tile:0:1:3", 1), ("flight:2f1a", 5)]:
+        for _ in range(count):
+            dynamodb_store.record_request(key)
+    dynamodb_store.put("tile:0:1:2", b"new value", now, now + 15, now + 30)
+
+    assert dynamodb_store.get_popular_keys("tile:", since=now - 60, limit=5) == [
+        "tile:0:1:2",
+        "tile:0:1:3",
+    ]
+    assert dynamodb_store.get_popular_keys("tile:", since=now - 60, limit=1) == [
+        "tile:0:1:2"
+    ]
+    assert dynamodb_store.get_popular_keys("tile:", since=now + 60, limit=5) == []
+    assert dynamodb_store.get("tile:0:1:2")["value"] == b"new value"
+    assert dynamodb_store.get("tile:0:1:3") is None
+
+
+def test_leases_are_exclusive_until_released(dynamodb_store):
+    assert dynamodb_store.try_lease("tile:0:1:2", 10)
+    assert not dynamodb_store.try_lease("tile:0:1:2", 10)
+    assert dynamodb_store.get("tile:0:1:2") is None
+
+    dynamodb_store.release_lease("tile:0:1:2")
+    assert dynamodb_store.try_lease("tile:0:1:2", 10)
+
+
+def test_serves_stale_tiles_while_they_are_refreshed(memory_cache, fetched_tiles):
+    position = Position(lat=51.25, lon=0.25)
+    fr24_api.get_all_flights(position)
+    assert len(fetched_tiles) == 1
+
+    # Another container reads the tile from the shared cache
+    fr24_api.FEED_CACHE.clear()
+    fr24_api.get_all_flights(position)
+    assert len(fetched_tiles) == 1
+
+    for item in memory_cache.store.items.values():
+        item["fresh_until"] = time.time() - 1
+    fr24_api.FEED_CACHE.clear()
+    assert list(fr24_api.get_all_flights(position)) == ["f1"]
+    time.sleep(0.2)
+    assert len(fetched_tiles) == 2
+
+    for item in memory_cache.store.items.values():
+        item["stale_until"] = time.time() - 1
+    fr24_api.FEED_CACHE.clear()
+    assert list(fr24_api.get_all_flights(position)) == ["f3"]
+
+
+def test_warms_popular_tiles_concurrently(memory_cache, fetched_tiles, monkeypatch):
+    monkeypatch.setattr(warm_feed_cache, "WARM_PASSES", 1)
+    tile_keys = [fr24_api.get_tile_key((0, 102, i)) for i in range(10)]
+    for key in tile_keys:
+        memory_cache.store.record_request(key)
+
+    started = time.monotonic()
+    response = warm_feed_cache.lambda_handler({}, None)
+
+    assert response["body"] == "Warmed 10 tiles 1 times with 0 failures"
+    assert time.monotonic() - started < 0.05 * len(tile_keys) / 2
+    assert sorted(memory_cache.store.items) == sorted(tile_keys)
+
+
+def test_keeps_warmed_tiles_fresh_between_invocations(
+    memory_cache, fetched_tiles, monkeypatch
+):
+    monkeypatch.setattr(warm_feed_cache, "WARM_PASS_INTERVAL_S", 0.2)
+    monkeypatch.setattr(warm_feed_cache, "WARM_PASSES", 3)
+    tile_key = fr24_api.get_tile_key((0, 102, 0))
+    memory_cache.store.record_request(tile_key)
+
+    started = time.time()
+    response = warm_feed_cache.lambda_handler({}, None)
+
+    assert response["body"] == "Warmed 1 tiles 3 times with 0 failures"
+    assert len(fetched_tiles) == 3
+    # The last pass starts two intervals after the first
+    assert memory_cache.store.items[tile_key]["fetched_at"] >= started + 0.4
+
+
+def read_warm_schedule_s() -> float:
+    """The warmer's EventBridge schedule, which is a rate in minutes"""
+    path = os.path.join(TERRAFORM_DIR, "eventbridge.tf")
+    with open(path) as f:
+        match = re.search(
+            r'"warm_feed_cache"\s*{.*?rate\((\d+) minutes?\)', f.read(), re.S
+        )
+    return int(match.group(1)) * 60
+
+
+def read_warm_timeout_s() -> float:
+    path = os.path.join(TERRAFORM_DIR, "lambda_warm_feed_cache.tf")
+    with open(path) as f:
+        match = re.search(
+            r'"aws_lambda_function" "warm_feed_cache"\s*{.*?timeout\s*=\s*(\d+)',
+            f.read(),
+            re.S,
+        )
+    return int(match.group(1))
+
+
+def test_warmed_tiles_stay_fresh_until_the_next_invocation():
+    schedule_s = read_warm_schedule_s()
+    interval_s = warm_feed_cache.WARM_PASS_INTERVAL_S
+
+    assert warm_feed_cache.WARM_SCHEDULE_INTERVAL_S == schedule_s
+    # Each pass is made before the previous one's tiles stop being fresh, and the last
+    # one's tiles are fresh until the next invocation's first pass
+    assert interval_s <= fr24_api.SHARED_TILE_FRESH_S
+    assert warm_feed_cache.WARM_PASSES * interval_s >= schedule_s
+    # The lambda must live long enough to start its last pass
+    assert read_warm_timeout_s() > (warm_feed_cache.WARM_PASSES - 1) * interval_s
+
+
+@pytest.fixture(params=["memory", "dynamodb"])
+def store(request):
+    if request.param == "memory":
+        return MemoryStore()
+    return request.getfixturevalue("dynamodb_store")
+
+
+def test_containers_coalesce_a_missing_value(store):
+    # Two containers sharing one table
+    first, second = SharedCache(store), SharedCache(store)
+    fetched = []
+
+    def fetch():
+        fetched.append(None)
+        time.sleep(0.3)
+        return {"rows": len(fetched)}
+
+    results = []
+    leader = threading.Thread(
+        target=lambda: results.append(first.get_or_fetch("tile:0:1:2", fetch, 15, 30))
+    )
+    leader.start()
+    time.sleep(0.05)
+    value, age_s = second.get_or_fetch("tile:0:1:2", fetch, 15, 30)
+    leader.join()
+
+    assert len(fetched) == 1
+    assert value == results[0][0] == {"rows": 1}
+    assert 0 <= age_s < 15
+
+
+def test_fetches_a_missing_value_when_the_leader_is_too_slow(monkeypatch, store):
+    monkeypatch.setattr(shared_cache, "COALESCE_WAIT_S", 0.2)
+    cache = SharedCache(store)
+    assert store.try_lease("tile:0:1:2", 10)
+
+    started = time.monotonic()
+    value, _ = cache.get_or_fetch("tile:0:1:2", lambda: {"rows": 1}, 15, 30)
+
+    assert value == {"rows": 1}
+    assert time.monotonic() - started >= 0.2
+
+
+def test_failed_fetches_release_their_lease(store):
+    cache = SharedCache(store)
+
+    def fetch():
+        raise RuntimeError("FR24 is unavailable")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_fetch("tile:0:1:2", fetch, 15, 30)
+
+    # Nobody waits for a value that is not coming
+    assert store.try_lease("tile:0:1:2", 10)
+
+
+def test_values_too_large_to_store_release_their_lease(monkeypatch, store):
+    monkeypatch.setattr(shared_cache, "MAX_VALUE_BYTES", 16)
+    cache = SharedCache(store)
+
+    value, _ = cache.get_or_fetch("tile:0:1:2", lambda: {"rows": "x" * 64}, 15, 30)
+
+    assert value == {"rows": "x" * 64}
+    assert cache.get_retained("tile:0:1:2") is None
+    assert store.try_lease("tile:0:1:2", 10)
@@ -0,0 +1,129 @@
+import time
+import threading
+import pytest
+from helpers import fr24_api
+from helpers.single_flight import SingleFlight
+
+
+def call_concurrently(fn, count: int = 8) -> tuple[list, list]:
+    """Call `fn` from `count` threads at once, returning the results and exceptions"""
+    results, errors = [], []
+    barrier = threading.Barrier(count)
+
+    def call():
+        barrier.wait()
+        try:
+            results.append(fn())
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results, errors
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Slow stand-ins for the upstream requests, recording what they are asked for"""
+    requested = []
+
+    def fetch_tile_flights(tile):
+        requested.append(tile)
+        time.sleep(0.2)
+        size = fr24_api.get_tile_size(tile[0])
+        return {"a": ["", (tile[1] + 0.5) * size, (tile[2] + 0.5) * size]}
+
+    def fetch_flight_details(flight_id):
+        requested.append(flight_id)
+        time.sleep(0.2)
+        if flight_id == "missing":
+            raise RuntimeError("Flight not found")
+        return {"identification": {"id": flight_id}}
+
+    monkeypatch.setattr(fr24_api, "fetch_tile_flights", fetch_tile_flights)
+    monkeypatch.setattr(fr24_api, "fetch_flight_details", fetch_flight_details)
+    fr24_api.FEED_CACHE.clear()
+    yield requested
+    fr24_api.FEED_CACHE.clear()
+
+
+def test_concurrent_callers_share_one_call():
+    single_flight = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(None)
+        time.sleep(0.1)
+        return object()
+
+    results, errors = call_concurrently(lambda: single_flight.do("key", fn))
+
+    assert errors == []
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert len(single_flight) == 0
+
+
+def test_concurrent_callers_share_the_exception():
+    single_flight = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(None)
+        time.sleep(0.1)
+        raise ValueError("failed")
+
+    results, errors = call_concurrently(lambda: single_flight.do("key", fn))
+
+    assert results == []
+    assert len(calls) == 1
+    assert len(errors) == 8
+    assert all(isinstance(exc, ValueError) for exc in errors)
+    assert len(single_flight) == 0
+
+
+def test_later_and_other_calls_are_not_coalesced():
+    single_flight = SingleFlight()
+    calls = []
+
+    for key in ("a", "a", "b"):
+        single_flight.do(key, lambda: calls.append(key))
+
+    assert calls == ["a", "a", "b"]
+
+
+def test_concurrent_tile_requests_make_one_fetch(upstream):
+    tile = (0, 102, 0)
+
+    results, errors = call_concurrently(lambda: fr24_api.get_tile_flights(tile))
+
+    assert errors == []
+    assert upstream == [tile]
+    assert all(result == results[0] for result in results)
+    assert fr24_api.FEED_CACHE.get(tile) == results[0]
+
+
+def test_concurrent_flight_requests_make_one_fetch(upstream):
+    results, errors = call_concurrently(lambda: fr24_api.get_flight_details("2f1a"))
+
+    assert errors == []
+    assert upstream == ["2f1a"]
+    assert all(result is results[0] for result in results)
+
+
+def test_concurrent_flight_requests_share_a_failure(upstream):
+    results, errors = call_concurrently(lambda: fr24_api.get_flight_details("missing"))
+
+    assert results == []
+    assert upstream == ["missing"]
+    assert len(errors) == 8
+    assert len(fr24_api.IN_FLIGHT) == 0
+
+    # The failure is not cached, so the next request tries again
+    with pytest.raises(RuntimeError):
+        fr24_api.get_flight_details("missing")
+    assert len(upstream) == 2
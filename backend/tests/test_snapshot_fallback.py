@@ -0,0 +1,136 @@
+import time
+from urllib.error import HTTPError
+import pytest
+from helpers import airport_index, fr24_api, make_guess, snapshots
+from helpers.data_types import GameRules, Position
+from helpers.resilience import CircuitBreaker, TokenBucket
+from helpers.utils import HandledException
+
+RULES = GameRules(use_origin=True, use_destination=True)
+HEATHROW = Position(lat=51.47, lon=-0.45)
+CDG = Position(lat=49.01, lon=2.55)
+
+
+def feed_row(lat: float, lon: float, callsign: str) -> list:
+    return [
+        "4CA7B1", lat, lon, 90, 35000, 450, "", "F-EGLL", "A320", "G-EUUA",
+        int(time.time()), "LHR", "CDG", callsign.replace("BAW", "BA"), 0, 0, callsign,
+    ]  # fmt: skip
+
+
+def flight_details(callsign: str, lat: float, lon: float) -> dict:
+    airport = {
+        "name": "London Heathrow Airport",
+        "code": {"iata": "LHR", "icao": "EGLL"},
+        "position": {"latitude": HEATHROW.lat, "longitude": HEATHROW.lon},
+    }
+    return {
+        "identification": {
+            "callsign": callsign,
+            "number": {"default": callsign.replace("BAW", "BA")},
+        },
+        "airport": {"origin": airport, "destination": None},
+        "trail": [{"lat": lat, "lng": lon}],
+    }
+
+
+class FakeFR24:
+    """Serves the feed and flight details until it is made unavailable"""
+
+    def __init__(self):
+        self.available = True
+        self.feed = {
+            "2f1a": feed_row(51.01, 0.01, "BAW1"),
+            "2f1b": feed_row(51.06, 0.06, "BAW2"),
+        }
+
+    def get_json(self, url: str):
+        if not self.available:
+            raise HTTPError(url, 503, "Service Unavailable", {}, None)
+
+        if "feed.js" in url:
+            return {"version": 4, **self.feed}
+
+        flight_key = url.rsplit("=", 1)[-1]
+        row = self.feed[flight_key]
+        return flight_details(row[16], row[1], row[2])
+
+
+@pytest.fixture
+def fr24(tmp_path, monkeypatch):
+    fake = FakeFR24()
+    monkeypatch.setattr(fr24_api, "HTTP_POOL", fake)
+    monkeypatch.setattr(fr24_api, "FR24_RATE_LIMIT", TokenBucket(rate=100, burst=100))
+    monkeypatch.setattr(
+        fr24_api,
+        "FR24_BREAKER",
+        CircuitBreaker(failure_threshold=2, reset_timeout_s=30),
+    )
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", str(tmp_path))
+    # The airport data cannot be loaded either
+    monkeypatch.setattr(airport_index, "_airport_index", None)
+    monkeypatch.setattr(airport_index, "_airport_index_expiry", 0.0)
+    fr24_api.FEED_CACHE.clear()
+    make_guess.FLIGHT_CACHE.clear()
+    yield fake
+    fr24_api.FEED_CACHE.clear()
+    make_guess.FLIGHT_CACHE.clear()
+
+
+def wait_for_snapshots():
+    # Snapshots are written one at a time, in order
+    snapshots.WRITE_EXECUTOR.submit(lambda: None).result()
+
+
+def guess(position: Position):
+    return make_guess.make_guess(position, HEATHROW, CDG, RULES)
+
+
+def go_offline(fr24):
+    wait_for_snapshots()
+    fr24.available = False
+    fr24_api.FEED_CACHE.clear()
+    make_guess.FLIGHT_CACHE.clear()
+
+
+def test_guesses_from_snapshots_while_fr24_is_unavailable(fr24, monkeypatch):
+    monkeypatch.setattr(make_guess, "CANDIDATE_COUNT", 1)
+    live = guess(Position(lat=51.0, lon=0.0))
+    assert not live.approximate
+    assert live.flight.id == "BAW1-BA1-2f1a"
+
+    go_offline(fr24)
+    results = [guess(Position(lat=51.0, lon=0.0)) for _ in range(4)]
+
+    assert fr24_api.FR24_BREAKER.is_open
+    for result in results:
+        assert result.approximate
+        assert result.flight.id == "BAW1-BA1-2f1a"
+        assert result.flight.origin.iata == "LHR"
+        assert result.points.origin > 0
+
+
+def test_uses_feed_rows_without_details_or_airports(fr24, monkeypatch):
+    monkeypatch.setattr(make_guess, "CANDIDATE_COUNT", 1)
+    guess(Position(lat=51.0, lon=0.0))
+
+    go_offline(fr24)
+    # Only BAW1's details were recorded, and the airport data cannot be loaded
+    result = guess(Position(lat=51.07, lon=0.07))
+
+    assert result.approximate
+    assert result.flight.id == "BAW2-BA2-2f1b"
+    assert result.flight.origin is None
+    assert result.points.total == 0
+
+
+def test_reports_the_outage_where_there_are_no_snapshots(fr24):
+    go_offline(fr24)
+
+    with pytest.raises(HTTPError):
+        guess(Position(lat=10.0, lon=10.0))
+
+    with pytest.raises(HandledException) as exc_info:
+        for _ in range(3):
+            guess(Position(lat=10.0, lon=10.0))
+    assert exc_info.value.status_code == 503
@@ -0,0 +1,136 @@
+import time
+import pytest
+import sweep_lobbies
+from helpers.data_types import GameRules
+from multiplayer_helpers import db
+from multiplayer_helpers.db import SECONDS_PER_DAY, get_expiry_day
+from multiplayer_helpers.lobby_type import Lobby
+
+LEGACY_INTERACTION = "2020-01-01T00:00:00+00:00"
+
+
+@pytest.fixture
+def operations(lobby_tables):
+    """The names of the DynamoDB operations which are called"""
+    operations = []
+    events = lobby_tables.get_lobby_table().meta.client.meta.events
+    events.register(
+        "before-call.dynamodb.*",
+        lambda model, **kwargs: operations.append(model.name),
+    )
+    return operations
+
+
+def put_lobby(lobby_tables, lobby_id: str, expires_at: int):
+    lobby_tables.get_lobby_table().put_item(
+        Item={
+            "lobby_id": lobby_id,
+            "expires_at": expires_at,
+            "expiry_day": get_expiry_day(expires_at),
+        }
+    )
+
+
+def put_player(lobby_tables, name: str, lobby_id: str, **attributes):
+    lobby_tables.get_player_table().put_item(
+        Item={
+            "player_id": f"{name}@{lobby_id}",
+            "lobby_id": lobby_id,
+            "player_name": name,
+            **attributes,
+        }
+    )
+
+
+def test_removes_idle_lobbies_with_their_players(lobby_tables, operations):
+    lobby_table = lobby_tables.get_lobby_table()
+    player_table = lobby_tables.get_player_table()
+    now = int(time.time())
+
+    put_lobby(lobby_tables, "IDLE", now - 10)
+    put_lobby(lobby_tables, "ACTIVE", now + 100)
+    # Every player of an idle lobby is removed, whenever they expire themselves
+    for i in range(30):
+        put_player(lobby_tables, f"player{i}", "IDLE", expires_at=now + 100)
+    put_player(lobby_tables, "active", "ACTIVE", expires_at=now + 100)
+    # Players who expire in an active lobby are left to DynamoDB's TTL
+    put_player(lobby_tables, "idle", "ACTIVE", expires_at=now - 1)
+    operations.clear()
+
+    response = sweep_lobbies.lambda_handler({}, None)
+    sweep_operations = set(operations)
+
+    assert response["body"] == "Removed 1 lobbies and 30 players"
+    # Neither table is scanned
+    assert sweep_operations == {"Query", "BatchWriteItem"}
+    assert [item["lobby_id"] for item in lobby_table.scan()["Items"]] == ["ACTIVE"]
+    assert sorted(item["player_id"] for item in player_table.scan()["Items"]) == [
+        "active@ACTIVE",
+        "idle@ACTIVE",
+    ]
+
+
+def test_finds_lobbies_by_their_latest_expiry(lobby_tables, monkeypatch):
+    rules = GameRules(use_origin=True, use_destination=False)
+    monkeypatch.setattr(db, "IDLE_EXPIRY_S", -10)
+    idle = Lobby.create(rules)
+    active = Lobby.create(rules)
+    monkeypatch.setattr(db, "IDLE_EXPIRY_S", 100)
+    active.next_sequence()
+
+    assert sweep_lobbies.query_expired_lobbies(int(time.time())) == [idle.id]
+
+
+def test_leaves_lobbies_which_expired_long_ago_to_ttl(lobby_tables):
+    now = int(time.time())
+    put_lobby(lobby_tables, "RECENT", now - SECONDS_PER_DAY)
+    put_lobby(
+        lobby_tables,
+        "OLD",
+        now - (sweep_lobbies.SWEEP_LOOKBACK_DAYS + 1) * SECONDS_PER_DAY,
+    )
+
+    assert sweep_lobbies.query_expired_lobbies(now) == ["RECENT"]
+
+
+def test_backfills_the_expiry_of_older_items(lobby_tables):
+    lobby_table = lobby_tables.get_lobby_table()
+    player_table = lobby_tables.get_player_table()
+    now = int(time.time())
+
+    lobby_table.put_item(
+        Item={"lobby_id": "LEGACY", "last_interaction": LEGACY_INTERACTION}
+    )
+    # Written with an expiry before the index was added
+    lobby_table.put_item(Item={"lobby_id": "UNINDEXED", "expires_at": now - 10})
+    put_player(lobby_tables, "legacy", "LEGACY", last_interaction=LEGACY_INTERACTION)
+    put_lobby(lobby_tables, "CURRENT", now + 100)
+
+    response = sweep_lobbies.lambda_handler({"backfill": True}, None)
+
+    assert response["body"] == "Backfilled 2 lobbies and 1 players"
+    legacy_expiry = 1577836800 + sweep_lobbies.IDLE_EXPIRY_S
+    legacy = lobby_table.get_item(Key={"lobby_id": "LEGACY"})["Item"]
+    assert legacy["expires_at"] == legacy_expiry
+    assert legacy["expiry_day"] == get_expiry_day(legacy_expiry)
+    player = player_table.get_item(Key={"player_id": "legacy@LEGACY"})["Item"]
+    assert player["expires_at"] == legacy_expiry
+
+    # Lobbies which have only just expired are then swept as any other
+    assert sweep_lobbies.query_expired_lobbies(now) == ["UNINDEXED"]
+
+
+def test_pages_through_lobby_players(lobby_tables, monkeypatch):
+    for i in range(5):
+        put_player(lobby_tables, f"player{i}", "IDLE")
+
+    query_lobby_index = sweep_lobbies.query_lobby_index
+    monkeypatch.setattr(
+        sweep_lobbies,
+        "query_lobby_index",
+        lambda **query_args: query_lobby_index(Limit=2, **query_args),
+    )
+
+    assert sorted(sweep_lobbies.get_player_ids("IDLE")) == [
+        f"player{i}@IDLE" for i in range(5)
+    ]
@@ -0,0 +1,95 @@
+import gzip
+import json
+import pytest
+import update_airports
+
+AIRPORTS = [
+    {
+        "name": "London Heathrow Airport",
+        "iata": "LHR",
+        "icao": "EGLL",
+        "lat": 51.4706,
+        "lon": -0.461941,
+        "country": "United Kingdom",
+    },
+    {
+        "name": "Auckland International Airport",
+        "iata": "AKL",
+        "icao": "NZAA",
+        "lat": -37.008057,
+        "lon": 174.791667,
+        "country": "New Zealand",
+    },
+]
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    """A mocked S3 bucket, with the airports API returning AIRPORTS"""
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    monkeypatch.setattr(update_airports, "get_all_airports", lambda: {"rows": AIRPORTS})
+    with moto.mock_aws():
+        s3_client = boto3.client("s3")
+        s3_client.create_bucket(
+            Bucket=update_airports.BUCKET_NAME,
+            CreateBucketConfiguration={"LocationConstraint": "eu-west-2"},
+        )
+        monkeypatch.setattr(update_airports, "_s3_client", None)
+        yield s3_client
+        update_airports._s3_client = None
+
+
+def test_publishes_the_original_format(bucket):
+    assert update_airports.lambda_handler({}, None)["statusCode"] == 200
+
+    response = bucket.get_object(
+        Bucket=update_airports.BUCKET_NAME, Key=update_airports.AIRPORTS_KEY
+    )
+
+    assert response["ContentType"] == "application/json"
+    assert json.loads(response["Body"].read()) == update_airports.format_airport_data(
+        AIRPORTS
+    )
+
+
+def test_publishes_the_compact_format_compressed(bucket):
+    update_airports.lambda_handler({}, None)
+
+    response = bucket.get_object(
+        Bucket=update_airports.BUCKET_NAME, Key=update_airports.COMPACT_AIRPORTS_KEY
+    )
+
+    assert response["ContentType"] == "application/json"
+    assert response["ContentEncoding"] == "gzip"
+    compact = json.loads(gzip.decompress(response["Body"].read()))
+    assert compact == update_airports.format_compact_airport_data(AIRPORTS)
+
+
+def test_compact_format_round_trips_to_the_airports():
+    compact = json.loads(
+        json.dumps(update_airports.format_compact_airport_data(AIRPORTS))
+    )
+
+    airports = [
+        {
+            "name": compact["name"][i],
+            "iata": compact["iata"][i],
+            "icao": compact["icao"][i],
+            "lat": compact["lat"][i] / compact["scale"],
+            "lon": compact["lon"][i] / compact["scale"],
+            "country": compact["country"][i],
+        }
+        for i in range(len(compact["iata"]))
+    ]
+
+    assert len(airports) == len(AIRPORTS)
+    for airport, expected in zip(airports, AIRPORTS):
+        for key in ("name", "iata", "icao", "country"):
+            assert airport[key] == expected[key]
+        # Accurate to within half a unit of the scale
+        for key in ("lat", "lon"):
+            assert airport[key] == pytest.approx(
+                expected[key], abs=0.5 / update_airports.COORDINATE_SCALE
+            )
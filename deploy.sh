@@ -15,12 +15,12 @@ pushd ./backend > /dev/null || exit 1
 
 # Create a fresh build directory
 rm -rf ./build
-mkdir -p ./build ./build/singleplayer_src ./build/multiplayer_src ./build/update_airports_src
+mkdir -p ./build ./build/singleplayer_src ./build/multiplayer_src ./build/update_airports_src ./build/sweep_lobbies_src ./build/warm_feed_cache_src
 
 # Build singleplayer server
 cp -r ./src/* ./build/singleplayer_src
 pushd ./build/singleplayer_src > /dev/null || exit 1
-rm -rf ./multiplayer_server.py ./multiplayer_helpers ./update_airports.py ./__pycache__
+rm -rf ./multiplayer_server.py ./multiplayer_helpers ./update_airports.py ./sweep_lobbies.py ./warm_feed_cache.py ./__pycache__
 # Spoof the timestamps so that the zip file is deterministic.
 # This prevent terraform from replacing the files unless they change.
 TZ=UTC find . -exec touch --no-dereference -a -m -t 198002010000.00 {} +
@@ -31,7 +31,7 @@ popd > /dev/null
 # Build multiplayer server
 cp -r ./src/* ./build/multiplayer_src
 pushd ./build/multiplayer_src > /dev/null || exit 1
-rm -rf ./singleplayer_server.py ./update_airports.py ./__pycache__
+rm -rf ./singleplayer_server.py ./update_airports.py ./sweep_lobbies.py ./warm_feed_cache.py ./__pycache__
 # Spoof the timestamps so that the zip file is deterministic.
 # This prevent terraform from replacing the files unless they change.
 TZ=UTC find . -exec touch --no-dereference -a -m -t 198002010000.00 {} +
@@ -42,7 +42,7 @@ popd > /dev/null
 # Build update aiports
 cp -r ./src/* ./build/update_airports_src
 pushd ./build/update_airports_src > /dev/null || exit 1
-rm -rf ./singleplayer_server.py ./multiplayer_server.py ./multiplayer_helpers ./__pycache__
+rm -rf ./singleplayer_server.py ./multiplayer_server.py ./multiplayer_helpers ./sweep_lobbies.py ./warm_feed_cache.py ./__pycache__
 # Spoof the timestamps so that the zip file is deterministic.
 # This prevent terraform from replacing the files unless they change.
 TZ=UTC find . -exec touch --no-dereference -a -m -t 198002010000.00 {} +
@@ -50,6 +50,28 @@ TZ=UTC zip -q --move --recurse-paths --symlinks -X ../update_airports.zip .
 TZ=UTC touch -a -m -t 198002010000.00 ../update_airports.zip
 popd > /dev/null
 
+# Build sweep lobbies
+cp -r ./src/* ./build/sweep_lobbies_src
+pushd ./build/sweep_lobbies_src > /dev/null || exit 1
+rm -rf ./singleplayer_server.py ./multiplayer_server.py ./update_airports.py ./warm_feed_cache.py ./__pycache__
+# Spoof the timestamps so that the zip file is deterministic.
+# This prevent terraform from replacing the files unless they change.
+TZ=UTC find . -exec touch --no-dereference -a -m -t 198002010000.00 {} +
+TZ=UTC zip -q --move --recurse-paths --symlinks -X ../sweep_lobbies.zip .
+TZ=UTC touch -a -m -t 198002010000.00 ../sweep_lobbies.zip
+popd > /dev/null
+
+# Build warm feed cache
+cp -r ./src/* ./build/warm_feed_cache_src
+pushd ./build/warm_feed_cache_src > /dev/null || exit 1
+rm -rf ./singleplayer_server.py ./multiplayer_server.py ./multiplayer_helpers ./update_airports.py ./sweep_lobbies.py ./__pycache__
+# Spoof the timestamps so that the zip file is deterministic.
+# This prevent terraform from replacing the files unless they change.
+TZ=UTC find . -exec touch --no-dereference -a -m -t 198002010000.00 {} +
+TZ=UTC zip -q --move --recurse-paths --symlinks -X ../warm_feed_cache.zip .
+TZ=UTC touch -a -m -t 198002010000.00 ../warm_feed_cache.zip
+popd > /dev/null
+
 echo "[INFO] Deploying the backend..."
 pushd ../terraform > /dev/null || exit 1
 terraform init -upgrade -reconfigure -backend-config="./environments/${STAGE}/backend.conf"
@@ -58,10 +80,18 @@ terraform apply -var-file="./environments/${STAGE}/terraform.tfvars"
 CLOUDFRONT_DIST=$(terraform output -raw cloudfront_distribution)
 BUCKET_NAME=$(terraform output -raw bucket_name)
 AIRPORTS_ENDPOINT=$(terraform output -raw airports_endpoint)
+COMPACT_AIRPORTS_ENDPOINT=$(terraform output -raw compact_airports_endpoint)
 SINGLEPLAYER_ENDPOINT=$(terraform output -raw singleplayer_endpoint)
 MULTIPLAYER_ENDPOINT=$(terraform output -raw multiplayer_endpoint)
+UPDATE_AIRPORTS_FUNCTION=$(terraform output -raw update_airports_function)
 popd > /dev/null
 
+# The airport data is otherwise only published by the daily schedule, so a new stage
+# would have none until it first runs
+echo "[INFO] Publishing the airport data..."
+aws lambda invoke --function-name "$UPDATE_AIRPORTS_FUNCTION" /dev/null \
+  || echo "[WARNING] Unable to publish the airport data, it will be published by the daily schedule"
+
 echo "[INFO] Backend deployed successfully"
 popd > /dev/null
 
@@ -69,12 +99,14 @@ popd > /dev/null
 echo "[INFO] Building the frontend..."
 pushd ./frontend > /dev/null || exit 1
 cp ../CHANGELOG.md ./src/assets/CHANGELOG.md
+sed -i "s&COMPACT_AIRPORTS_ENDPOINT_PLACEHOLDER&${COMPACT_AIRPORTS_ENDPOINT}&g" ./src/utils/endpoints.ts
 sed -i "s&AIRPORTS_ENDPOINT_PLACEHOLDER&${AIRPORTS_ENDPOINT}&g" ./src/utils/endpoints.ts
 sed -i "s&SINGLEPLAYER_ENDPOINT_PLACEHOLDER&${SINGLEPLAYER_ENDPOINT}&g" ./src/utils/endpoints.ts
 sed -i "s&MULTIPLAYER_ENDPOINT_PLACEHOLDER&${MULTIPLAYER_ENDPOINT}&g" ./src/utils/endpoints.ts
 
 npm run build
 
+sed -i "s&${COMPACT_AIRPORTS_ENDPOINT}&COMPACT_AIRPORTS_ENDPOINT_PLACEHOLDER&g" ./src/utils/endpoints.ts
 sed -i "s&${AIRPORTS_ENDPOINT}&AIRPORTS_ENDPOINT_PLACEHOLDER&g" ./src/utils/endpoints.ts
 sed -i "s&${SINGLEPLAYER_ENDPOINT}&SINGLEPLAYER_ENDPOINT_PLACEHOLDER&g" ./src/utils/endpoints.ts
 sed -i "s&${MULTIPLAYER_ENDPOINT}&MULTIPLAYER_ENDPOINT_PLACEHOLDER&g" ./src/utils/endpoints.ts
@@ -1,8 +1,11 @@
 import { FC, ReactElement, ReactNode, useEffect, useState } from "react";
 import AirportContext from "./AirportContext";
 import LoadingSpinner from "../LoadingSpinner/LoadingSpinner";
-import { AIRPORTS_ENDPOINT } from "../../utils/endpoints";
-import { Airport } from "../../utils/types";
+import {
+  AIRPORTS_ENDPOINT,
+  COMPACT_AIRPORTS_ENDPOINT,
+} from "../../utils/endpoints";
+import { Airport, CompactAirports } from "../../utils/types";
 import "./AirportProvider.css";
 
 interface AirportProviderProps {
@@ -17,14 +20,15 @@ const AirportProvider: FC<AirportProviderProps> = ({
   const [airports, setAirports] = useState<Airport[]>([]);
 
   useEffect(() => {
-    fetch(AIRPORTS_ENDPOINT)
-      .then((response) => {
-        if (!response.ok) {
-          throw new Error("The server was unable to process the request");
-        }
-        return response.json();
+    fetchJson(COMPACT_AIRPORTS_ENDPOINT)
+      .then((response: CompactAirports) => expandAirports(response))
+      .catch((error) => {
+        // The compact data is only published once update_airports has run, so the
+        // full data is used until then
+        console.warn("Falling back to the full airport data", error);
+        return fetchJson(AIRPORTS_ENDPOINT);
       })
-      .then((response) => {
+      .then((response: Airport[]) => {
         setAirports(response);
         setLoading(false);
       })
@@ -54,4 +58,25 @@ const AirportProvider: FC<AirportProviderProps> = ({
   );
 };
 
+const fetchJson = (url: string) =>
+  fetch(url).then((response) => {
+    if (!response.ok) {
+      throw new Error("The server was unable to process the request");
+    }
+    return response.json();
+  });
+
+const expandAirports = (airports: CompactAirports): Airport[] =>
+  airports.name.map((name, i) => ({
+    name,
+    city: null,
+    country: airports.country[i],
+    iata: airports.iata[i],
+    icao: airports.icao[i],
+    position: {
+      lat: airports.lat[i] / airports.scale,
+      lon: airports.lon[i] / airports.scale,
+    },
+  }));
+
 export default AirportProvider;
@@ -59,6 +59,7 @@ const FlightDisplay: FC<FlightDisplayProps> = ({ onClose }): ReactElement => {
           points={response.value.points}
           status={response.status}
           rules={rules}
+          approximate={response.value.approximate}
         />
       </HideMenu>
       <HideMenu isHidden={currentView !== 1}>
@@ -6,12 +6,14 @@ interface PointsDisplayProps {
   points: Points;
   status: SuccessStatus;
   rules: Rules;
+  approximate?: boolean;
 }
 
 const PointsDisplay: FC<PointsDisplayProps> = ({
   points,
   status,
   rules,
+  approximate,
 }): ReactElement => {
   if (status === "AlreadyGuessed") {
     return (
@@ -43,6 +45,11 @@ const PointsDisplay: FC<PointsDisplayProps> = ({
       {rules.useDestination && (
         <h4>Destination guess: {points.destination}/100</h4>
       )}
+      {approximate && (
+        <h4>
+          Live data was unavailable, so this result uses recent data
+        </h4>
+      )}
     </div>
   );
 };
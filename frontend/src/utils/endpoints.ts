@@ -1,5 +1,8 @@
 export const AIRPORTS_ENDPOINT = "AIRPORTS_ENDPOINT_PLACEHOLDER";
 
+export const COMPACT_AIRPORTS_ENDPOINT =
+  "COMPACT_AIRPORTS_ENDPOINT_PLACEHOLDER";
+
 export const SINGLEPLAYER_ENDPOINT = "SINGLEPLAYER_ENDPOINT_PLACEHOLDER";
 
 export const MULTIPLAYER_ENDPOINT = "MULTIPLAYER_ENDPOINT_PLACEHOLDER";
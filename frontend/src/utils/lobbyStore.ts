@@ -11,8 +11,10 @@ import {
   FlightMessageResponse,
   GuessResponse,
   LobbyApiResponse,
+  LobbyDeltaResponse,
   LobbyResponse,
   LobbyStatus,
+  LobbyUpdateResponse,
   Message,
   PlayerData,
   Rules,
@@ -25,6 +27,7 @@ type LobbyStore = {
   score: number;
   rules: Rules | null;
   players: PlayerData[];
+  seq: number;
   guessResponse: GuessResponse;
   lobbyResponse: LobbyResponse;
 
@@ -47,7 +50,8 @@ type LobbyStore = {
   setLobbyError: (message: Message) => void;
   initLobby: (lobbyId: string, rules: Rules) => void;
   onJoinLobby: (response: LobbyApiResponse) => void;
-  onUpdateLobby: (response: LobbyApiResponse) => void;
+  onUpdateLobby: (response: LobbyUpdateResponse) => void;
+  onLobbyDelta: (response: LobbyDeltaResponse) => void;
   onLeaveLobby: () => void;
 };
 
@@ -60,6 +64,7 @@ export const useLobbyStore = create<LobbyStore>()(
       score: 0,
       rules: defaultRules,
       players: [],
+      seq: 0,
       guessResponse: { status: "Ready", value: null, error: null },
       lobbyResponse: { status: "NotInLobby", error: null },
 
@@ -75,6 +80,7 @@ export const useLobbyStore = create<LobbyStore>()(
               useDestination: response.rules.use_destination,
             },
             players: response.players,
+            seq: response.seq,
             lobbyResponse: { status: "Ready", error: null },
           };
         }),
@@ -83,6 +89,31 @@ export const useLobbyStore = create<LobbyStore>()(
         set(() => {
           return {
             players: response.players,
+            seq: response.seq,
+          };
+        }),
+
+      onLobbyDelta: (response) =>
+        set((state) => {
+          if (response.seq <= state.seq) {
+            // Already included in the current player list
+            return {};
+          }
+
+          if (response.seq !== state.seq + 1) {
+            // An update has been missed, so request the full player list
+            state.ws?.send(
+              JSON.stringify({ action: "get_lobby", lobby_id: state.lobbyId }),
+            );
+            return {};
+          }
+
+          const otherPlayers = state.players.filter(
+            (player) => player.player_name !== response.player.player_name,
+          );
+          return {
+            players: [...otherPlayers, response.player],
+            seq: response.seq,
           };
         }),
 
@@ -103,6 +134,7 @@ export const useLobbyStore = create<LobbyStore>()(
             score: 0,
             rules: null,
             players: [],
+            seq: 0,
             lobbyResponse: { status: "NotInLobby", error: null },
           };
         }),
@@ -256,6 +288,7 @@ export const useLobbyStore = create<LobbyStore>()(
             setLobbyLoading,
             onJoinLobby,
             onUpdateLobby,
+            onLobbyDelta,
             handleGuessResult,
             setGuessError,
             setLobbyError,
@@ -316,6 +349,10 @@ export const useLobbyStore = create<LobbyStore>()(
                   onUpdateLobby(response);
                   break;
 
+                case "lobby_delta":
+                  onLobbyDelta(response);
+                  break;
+
                 case "flight_details":
                   handleGuessResult(response);
                   break;
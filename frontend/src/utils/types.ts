@@ -20,6 +20,16 @@ export type Airport = {
   position: Position | null;
 };
 
+export type CompactAirports = {
+  scale: number;
+  name: string[];
+  iata: string[];
+  icao: string[];
+  country: string[];
+  lat: number[];
+  lon: number[];
+};
+
 export type Points = {
   origin: number;
   destination: number;
@@ -42,11 +52,13 @@ export type Flight = {
 export type FlightApiResponse = {
   points: Points;
   flight: Flight;
+  approximate?: boolean;
 };
 
 export type FlightMessageResponse = {
   points: Points;
   flight: Flight;
+  approximate?: boolean;
   status: SuccessStatus;
   score: number;
 };
@@ -130,4 +142,17 @@ export type LobbyApiResponse = {
   player_name: string;
   score: number;
   players: PlayerData[];
+  seq: number;
+};
+
+export type LobbyUpdateResponse = {
+  event: "lobby_update";
+  players: PlayerData[];
+  seq: number;
+};
+
+export type LobbyDeltaResponse = {
+  event: "lobby_delta";
+  player: PlayerData;
+  seq: number;
 };
@@ -48,6 +48,12 @@ resource "aws_apigatewayv2_route" "handle_guess_route" {
   target    = "integrations/${aws_apigatewayv2_integration.handle_guess_integration.id}"
 }
 
+resource "aws_apigatewayv2_route" "get_lobby_route" {
+  api_id    = aws_apigatewayv2_api.multiplayer_api.id
+  route_key = "get_lobby"
+  target    = "integrations/${aws_apigatewayv2_integration.get_lobby_integration.id}"
+}
+
 resource "aws_apigatewayv2_integration" "connect_integration" {
   api_id             = aws_apigatewayv2_api.multiplayer_api.id
   integration_type   = "AWS_PROXY"
@@ -83,6 +89,13 @@ resource "aws_apigatewayv2_integration" "handle_guess_integration" {
   integration_method = "POST"
 }
 
+resource "aws_apigatewayv2_integration" "get_lobby_integration" {
+  api_id             = aws_apigatewayv2_api.multiplayer_api.id
+  integration_type   = "AWS_PROXY"
+  integration_uri    = aws_lambda_function.multiplayer_server.arn
+  integration_method = "POST"
+}
+
 resource "aws_lambda_permission" "connect_permission" {
   statement_id  = "AllowAPIGatewayConnect"
   action        = "lambda:InvokeFunction"
@@ -123,6 +136,14 @@ resource "aws_lambda_permission" "handle_guess_permission" {
   source_arn    = "${aws_apigatewayv2_api.multiplayer_api.execution_arn}/*"
 }
 
+resource "aws_lambda_permission" "get_lobby_permission" {
+  statement_id  = "AllowAPIGatewayGetLobby"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.multiplayer_server.arn
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_apigatewayv2_api.multiplayer_api.execution_arn}/*"
+}
+
 output "multiplayer_endpoint" {
   value = "${aws_apigatewayv2_api.multiplayer_api.api_endpoint}/${aws_apigatewayv2_stage.multiplayer_stage.name}"
 }
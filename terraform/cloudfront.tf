@@ -24,7 +24,7 @@ resource "aws_cloudfront_distribution" "cdn" {
   }
 
   ordered_cache_behavior {
-    path_pattern               = "/airports.json"
+    path_pattern               = "/airports*.json"
     target_origin_id           = "${var.app-name}-cloudfront"
     allowed_methods            = ["GET", "HEAD"]
     cached_methods             = ["GET", "HEAD"]
@@ -111,3 +111,7 @@ output "cloudfront_distribution" {
 output "airports_endpoint" {
   value = "https://${var.full_domain}/airports.json"
 }
+
+output "compact_airports_endpoint" {
+  value = "https://${var.full_domain}/airports-compact.json"
+}
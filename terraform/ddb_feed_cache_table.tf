@@ -0,0 +1,41 @@
+resource "aws_dynamodb_table" "feed-cache-table" {
+  name         = "flight-guesser-feed-cache-table-${var.environment}"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "cache_key"
+
+  attribute {
+    name = "cache_key"
+    type = "S"
+  }
+
+  attribute {
+    name = "request_kind"
+    type = "S"
+  }
+
+  attribute {
+    name = "last_requested"
+    type = "N"
+  }
+
+  # Only the request counter items have a request_kind, so the warmer can query them
+  # without reading the cached values
+  global_secondary_index {
+    name               = "RequestIndex"
+    hash_key           = "request_kind"
+    range_key          = "last_requested"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["request_count"]
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  tags = {
+    Name        = "flight-guesser-feed-cache-table-${var.environment}"
+    Description = "DynamoDB table to share flightradar24 responses between the flight-guesser lambdas"
+    Environment = var.environment
+  }
+}
@@ -18,6 +18,35 @@ resource "aws_dynamodb_table" "player-table" {
     type = "S"
   }
 
+  attribute {
+    name = "connection_id"
+    type = "S"
+  }
+
+  # Lobby lists only need the score, guess count and connection. The guess history is
+  # also projected, so that guesses can skip flights which were already guessed without
+  # reading the player again. It is bounded to two generations (see player_type.py).
+  # guessed_flights is only set on older players, whose guess count is derived from it.
+  global_secondary_index {
+    name            = "LobbyPlayersIndex"
+    hash_key        = "lobby_id"
+    range_key       = "player_name"
+    projection_type = "INCLUDE"
+    non_key_attributes = [
+      "score",
+      "guess_count",
+      "connection_id",
+      "guessed_flights",
+      "guessed_flight_set",
+      "previous_flight_set",
+      "history_started_at",
+    ]
+  }
+
+  # Changing an index's projection deletes and rebuilds it, so LobbyPlayersIndex is
+  # added alongside this one instead. Lobby queries fall back to it while the new index
+  # is backfilling (see multiplayer_helpers/db.py), and it can be removed once that
+  # has finished in every environment.
   global_secondary_index {
     name            = "LobbyIndex"
     hash_key        = "lobby_id"
@@ -25,6 +54,18 @@ resource "aws_dynamodb_table" "player-table" {
     projection_type = "ALL"
   }
 
+  global_secondary_index {
+    name               = "ConnectionIndex"
+    hash_key           = "connection_id"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["player_name", "lobby_id"]
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
   tags = {
     Name        = "flight-guesser-player-table-${var.environment}"
     Description = "DynamoDB table to store player data for the flight-guesser application"
@@ -43,6 +84,30 @@ resource "aws_dynamodb_table" "lobby-table" {
     type = "S"
   }
 
+  attribute {
+    name = "expiry_day"
+    type = "N"
+  }
+
+  attribute {
+    name = "expires_at"
+    type = "N"
+  }
+
+  # Lets sweep_lobbies query the lobbies which expired on each day rather than scan the
+  # table. expiry_day is the day expires_at falls on (see multiplayer_helpers/db.py).
+  global_secondary_index {
+    name            = "LobbyExpiryIndex"
+    hash_key        = "expiry_day"
+    range_key       = "expires_at"
+    projection_type = "KEYS_ONLY"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
   tags = {
     Name        = "flight-guesser-lobby-table-${var.environment}"
     Description = "DynamoDB table to store lobby data for the flight-guesser application"
@@ -16,3 +16,43 @@ resource "aws_cloudwatch_event_target" "invoke_lambda" {
   target_id = "UpdateAirportsLambda"
   arn       = aws_lambda_function.update_airports.arn
 }
+
+resource "aws_cloudwatch_event_rule" "sweep_lobbies" {
+  name                = "${var.app-name}-sweep-lobbies"
+  schedule_expression = "rate(1 hour)"
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_sweep_lobbies" {
+  statement_id  = "AllowExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.sweep_lobbies.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.sweep_lobbies.arn
+}
+
+resource "aws_cloudwatch_event_target" "invoke_sweep_lobbies_lambda" {
+  rule      = aws_cloudwatch_event_rule.sweep_lobbies.name
+  target_id = "SweepLobbiesLambda"
+  arn       = aws_lambda_function.sweep_lobbies.arn
+}
+
+# Must match WARM_SCHEDULE_INTERVAL in warm_feed_cache.py, which warms the tiles
+# several times per invocation to keep them fresh until the next one
+resource "aws_cloudwatch_event_rule" "warm_feed_cache" {
+  name                = "${var.app-name}-warm-feed-cache"
+  schedule_expression = "rate(1 minute)"
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_warm_feed_cache" {
+  statement_id  = "AllowExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.warm_feed_cache.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.warm_feed_cache.arn
+}
+
+resource "aws_cloudwatch_event_target" "invoke_warm_feed_cache_lambda" {
+  rule      = aws_cloudwatch_event_rule.warm_feed_cache.name
+  target_id = "WarmFeedCacheLambda"
+  arn       = aws_lambda_function.warm_feed_cache.arn
+}
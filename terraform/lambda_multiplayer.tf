@@ -44,7 +44,11 @@ resource "aws_iam_policy" "multiplayer_execution_policy" {
       {
         Effect   = "Allow"
         Action   = ["dynamodb:Query"]
-        Resource = "${aws_dynamodb_table.player-table.arn}/index/LobbyIndex"
+        Resource = [
+          "${aws_dynamodb_table.player-table.arn}/index/LobbyPlayersIndex",
+          "${aws_dynamodb_table.player-table.arn}/index/LobbyIndex",
+          "${aws_dynamodb_table.player-table.arn}/index/ConnectionIndex"
+        ]
       },
       {
         Effect = "Allow"
@@ -56,6 +60,15 @@ resource "aws_iam_policy" "multiplayer_execution_policy" {
         ]
         Resource = aws_dynamodb_table.lobby-table.arn
       },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:PutItem",
+          "dynamodb:UpdateItem"
+        ]
+        Resource = aws_dynamodb_table.feed-cache-table.arn
+      },
       {
         Effect   = "Allow"
         Action   = ["execute-api:ManageConnections"]
@@ -82,9 +95,11 @@ resource "aws_lambda_function" "multiplayer_server" {
 
   environment {
     variables = {
-      MULTIPLAYER_ENDPOINT = "${aws_apigatewayv2_api.multiplayer_api.api_endpoint}/${aws_apigatewayv2_stage.multiplayer_stage.name}"
-      PLAYER_TABLE_NAME    = aws_dynamodb_table.player-table.name
-      LOBBY_TABLE_NAME     = aws_dynamodb_table.lobby-table.name
+      MULTIPLAYER_ENDPOINT    = "${aws_apigatewayv2_api.multiplayer_api.api_endpoint}/${aws_apigatewayv2_stage.multiplayer_stage.name}"
+      PLAYER_TABLE_NAME       = aws_dynamodb_table.player-table.name
+      LOBBY_TABLE_NAME        = aws_dynamodb_table.lobby-table.name
+      AIRPORTS_ENDPOINT       = "https://${var.full_domain}/airports.json"
+      SHARED_CACHE_TABLE_NAME = aws_dynamodb_table.feed-cache-table.name
     }
   }
 }
@@ -29,6 +29,15 @@ resource "aws_iam_policy" "singleplayer_execution_policy" {
           "logs:PutLogEvents"
         ]
         Resource = "arn:aws:logs:*:*:*"
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:PutItem",
+          "dynamodb:UpdateItem"
+        ]
+        Resource = aws_dynamodb_table.feed-cache-table.arn
       }
     ]
   })
@@ -48,4 +57,11 @@ resource "aws_lambda_function" "singleplayer" {
   memory_size      = 256
   filename         = "${path.module}/../backend/build/singleplayer_server.zip"
   source_code_hash = filebase64sha256("${path.module}/../backend/build/singleplayer_server.zip")
+
+  environment {
+    variables = {
+      AIRPORTS_ENDPOINT       = "https://${var.full_domain}/airports.json"
+      SHARED_CACHE_TABLE_NAME = aws_dynamodb_table.feed-cache-table.name
+    }
+  }
 }
@@ -0,0 +1,79 @@
+resource "aws_iam_role" "sweep_lobbies_execution_role" {
+  name = "${var.app-name}_sweep_lobbies_execution_role_${var.environment}"
+
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Action = "sts:AssumeRole"
+        Effect = "Allow"
+        Principal = {
+          Service = "lambda.amazonaws.com"
+        }
+      }
+    ]
+  })
+}
+
+resource "aws_iam_policy" "sweep_lobbies_execution_policy" {
+  name = "${var.app-name}_sweep_lobbies-lambda-execution-policy_${var.environment}"
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "logs:CreateLogGroup",
+          "logs:CreateLogStream",
+          "logs:PutLogEvents"
+        ]
+        Resource = "arn:aws:logs:*:*:*"
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:Scan",
+          "dynamodb:UpdateItem",
+          "dynamodb:BatchWriteItem"
+        ]
+        Resource = [
+          aws_dynamodb_table.player-table.arn,
+          aws_dynamodb_table.lobby-table.arn
+        ]
+      },
+      {
+        Effect   = "Allow"
+        Action   = ["dynamodb:Query"]
+        Resource = [
+          "${aws_dynamodb_table.lobby-table.arn}/index/LobbyExpiryIndex",
+          "${aws_dynamodb_table.player-table.arn}/index/LobbyPlayersIndex",
+          "${aws_dynamodb_table.player-table.arn}/index/LobbyIndex"
+        ]
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "sweep_lobbies_execution_policy_attachment" {
+  role       = aws_iam_role.sweep_lobbies_execution_role.name
+  policy_arn = aws_iam_policy.sweep_lobbies_execution_policy.arn
+}
+
+resource "aws_lambda_function" "sweep_lobbies" {
+  function_name    = "${var.app-name}-sweep_lobbies-${var.environment}"
+  runtime          = "python3.13"
+  role             = aws_iam_role.sweep_lobbies_execution_role.arn
+  handler          = "sweep_lobbies.lambda_handler"
+  timeout          = 60
+  memory_size      = 256
+  filename         = "${path.module}/../backend/build/sweep_lobbies.zip"
+  source_code_hash = filebase64sha256("${path.module}/../backend/build/sweep_lobbies.zip")
+
+  environment {
+    variables = {
+      PLAYER_TABLE_NAME = aws_dynamodb_table.player-table.name
+      LOBBY_TABLE_NAME  = aws_dynamodb_table.lobby-table.name
+    }
+  }
+}
@@ -33,7 +33,10 @@ resource "aws_iam_policy" "update_airports_execution_policy" {
       {
         Effect   = "Allow"
         Action   = ["s3:PutObject"]
-        Resource = "${aws_s3_bucket.host-bucket.arn}/airports.json"
+        Resource = [
+          "${aws_s3_bucket.host-bucket.arn}/airports.json",
+          "${aws_s3_bucket.host-bucket.arn}/airports-compact.json",
+        ]
       },
     ]
   })
@@ -60,3 +63,7 @@ resource "aws_lambda_function" "update_airports" {
     }
   }
 }
+
+output "update_airports_function" {
+  value = aws_lambda_function.update_airports.function_name
+}
@@ -0,0 +1,67 @@
+resource "aws_iam_role" "warm_feed_cache_execution_role" {
+  name = "${var.app-name}_warm_feed_cache_execution_role_${var.environment}"
+
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Action = "sts:AssumeRole"
+        Effect = "Allow"
+        Principal = {
+          Service = "lambda.amazonaws.com"
+        }
+      }
+    ]
+  })
+}
+
+resource "aws_iam_policy" "warm_feed_cache_execution_policy" {
+  name = "${var.app-name}_warm_feed_cache-lambda-execution-policy_${var.environment}"
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "logs:CreateLogGroup",
+          "logs:CreateLogStream",
+          "logs:PutLogEvents"
+        ]
+        Resource = "arn:aws:logs:*:*:*"
+      },
+      {
+        Effect   = "Allow"
+        Action   = ["dynamodb:PutItem"]
+        Resource = aws_dynamodb_table.feed-cache-table.arn
+      },
+      {
+        Effect   = "Allow"
+        Action   = ["dynamodb:Query"]
+        Resource = "${aws_dynamodb_table.feed-cache-table.arn}/index/RequestIndex"
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "warm_feed_cache_execution_policy_attachment" {
+  role       = aws_iam_role.warm_feed_cache_execution_role.name
+  policy_arn = aws_iam_policy.warm_feed_cache_execution_policy.arn
+}
+
+resource "aws_lambda_function" "warm_feed_cache" {
+  function_name    = "${var.app-name}-warm_feed_cache-${var.environment}"
+  runtime          = "python3.13"
+  role             = aws_iam_role.warm_feed_cache_execution_role.arn
+  handler          = "warm_feed_cache.lambda_handler"
+  timeout          = 60
+  memory_size      = 256
+  filename         = "${path.module}/../backend/build/warm_feed_cache.zip"
+  source_code_hash = filebase64sha256("${path.module}/../backend/build/warm_feed_cache.zip")
+
+  environment {
+    variables = {
+      SHARED_CACHE_TABLE_NAME = aws_dynamodb_table.feed-cache-table.name
+    }
+  }
+}